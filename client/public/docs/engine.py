@@ -0,0 +1,527 @@
+"""
+戦略レジストリとシミュレーションエンジン
+
+概要:
+    各戦略を「選択レッグ（ユニバース×top_n）・レジームスイッチ・
+    VolScale目標・取引コスト」の組み合わせとして宣言し、
+    エンジンが月ごとに共有ノードを1回だけ評価する。
+
+    共有ノード（月ごと）:
+        - 選択レッグ: 選択銘柄・ウェイト・実現ポートフォリオVol（SelectionCache）
+        - レッグのグロスリターン: 選択ポートフォリオの月次リターン
+    戦略ごとの計算:
+        - ターンオーバー（前月ウェイトとの差分）、コスト控除、VolScale
+
+    既存の選択を再利用する戦略（例: 別の目標Volを持つVolScale版）を
+    レジストリに追加しても、増えるのは戦略ごとの軽い計算のみ。
+
+実行モード:
+    - run_backtest: 月次ループ（Selection・辞書ウェイトによる参照実装）
+    - run_backtest_matrix: 各戦略を月数×銘柄数のウェイト行列で表し、
+      リターン・ターンオーバーを行列演算で一括計算（月次ループなし）
+    - BacktestContext: 価格マトリクスから事前計算一式を構築し、
+      標準13戦略をパラメータ指定で実行（sweep.run_sweepのワーカーでも使用）
+
+使用例:
+    >>> strategies = standard_strategies(5, 5, 3, VOLSCALE_TARGETS)
+    >>> strategies.append(Strategy('D3_VolScale12', bull=Leg('sp500', 5), target_vol=0.12))
+    >>> results, months = run_backtest(strategies, selections, prices, monthly_indices,
+    ...                                bull_regime, MOMENTUM_PERIOD, TRANSACTION_COST)
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+import kernels
+from selection import SelectionCache
+from signals import MomentumCube, RankCache, regime_series, rolling_volatility
+
+
+class Leg(namedtuple('Leg', ['universe', 'top_n'])):
+    """
+    選択レッグ（ユニバースのモメンタム上位top_n、リスク逆数ウェイト）
+
+    Attributes:
+        universe (str): ユニバース名（RankCacheのキー）
+        top_n (int): 選択銘柄数
+    """
+
+    __slots__ = ()
+
+
+class Strategy:
+    """
+    戦略定義
+
+    Attributes:
+        name (str): 戦略名（結果辞書のキー）
+        bull (Leg): Bull時（またはスイッチなしの場合は常に）保有するレッグ
+        bear (Leg): Bear時に保有するレッグ（Noneの場合はレジームスイッチなし）
+        target_vol (float): VolScale目標ボラティリティ（NoneはVolScaleなし）
+        cost (bool): 取引コスト（ターンオーバー×コスト率）を控除するか
+        benchmark (str): バイ＆ホールドする銘柄（指定時はbull/bearを使わない）
+    """
+
+    def __init__(self, name, bull=None, bear=None, target_vol=None, cost=True, benchmark=None):
+        self.name = name
+        self.bull = bull
+        self.bear = bear
+        self.target_vol = target_vol
+        self.cost = cost
+        self.benchmark = benchmark
+
+    @property
+    def legs(self):
+        """参照する選択レッグ"""
+        return [leg for leg in (self.bull, self.bear) if leg is not None]
+
+    def leg(self, bull):
+        """当月に保有するレッグ"""
+        if self.bear is None or bull:
+            return self.bull
+        return self.bear
+
+
+def standard_strategies(attack_top_n, defense_top_n_5, defense_top_n_3, volscale_targets):
+    """
+    標準13戦略のレジストリ
+
+    Args:
+        attack_top_n (int): 攻撃型（D2/D3）の銘柄数
+        defense_top_n_5 (int): 防御型TOP5の銘柄数
+        defense_top_n_3 (int): 防御型TOP3の銘柄数（+防御型のBear時にも使用）
+        volscale_targets (dict): {基本戦略名: 目標Vol}（'D2', 'D3', '防御型TOP5', ...）
+
+    Returns:
+        list: Strategyのリスト（通常版7戦略 → VolScale版6戦略の順）
+    """
+    d2 = Leg('sp100', attack_top_n)
+    d3 = Leg('sp500', attack_top_n)
+    def5 = Leg('defense', defense_top_n_5)
+    def3 = Leg('defense', defense_top_n_3)
+    base = [
+        ('D2', d2, None),
+        ('D3', d3, None),
+        ('防御型TOP5', def5, None),
+        ('防御型TOP3', def3, None),
+        ('D2+防御型', d2, def3),
+        ('D3+防御型', d3, def3),
+    ]
+    strategies = [Strategy(name, bull, bear) for name, bull, bear in base]
+    strategies.append(Strategy('SPY', cost=False, benchmark='SPY'))
+    strategies += [
+        Strategy(f'{name}_VolScale', bull, bear, target_vol=volscale_targets[name])
+        for name, bull, bear in base
+    ]
+    return strategies
+
+
+def calc_turnover(prev_weights, curr_weights):
+    """
+    ターンオーバー率（片道ベース = ウェイト変化の絶対値合計 / 2）
+
+    Args:
+        prev_weights (dict): 前月のウェイト
+        curr_weights (dict): 今月のウェイト
+
+    Returns:
+        float: ターンオーバー率
+    """
+    all_symbols = set(prev_weights.keys()) | set(curr_weights.keys())
+    turnover = 0.0
+    for symbol in all_symbols:
+        prev_w = prev_weights.get(symbol, 0)
+        curr_w = curr_weights.get(symbol, 0)
+        turnover += abs(curr_w - prev_w)
+    return turnover / 2
+
+
+def turnover_matrix(weights):
+    """
+    calc_turnoverのウェイト行列版
+
+    Args:
+        weights (np.ndarray): 保有月ごとのウェイト（M×N）
+
+    Returns:
+        np.ndarray: 片道ターンオーバー（長さM、先頭月は前月ウェイト0との差分）
+
+    Note:
+        kernels.ENABLEDの場合はNumbaカーネル
+    """
+    if kernels.ENABLED:
+        return kernels.turnover_matrix(weights)
+    return np.abs(np.diff(weights, axis=0, prepend=0.0)).sum(axis=1) / 2
+
+
+def selection_return(close, selection, start_idx, end_idx):
+    """
+    選択ポートフォリオのコスト控除前月次リターン
+
+    Args:
+        close (np.ndarray): 終値行列（T×N）
+        selection (Selection): 銘柄選択結果
+        start_idx (int): 月初のインデックス
+        end_idx (int): 月末のインデックス
+
+    Returns:
+        float: 月次リターン（欠損・非正の開始価格の銘柄は寄与0）
+    """
+    start_prices = close[start_idx, selection.cols]
+    end_prices = close[end_idx, selection.cols]
+    valid = ~np.isnan(start_prices) & ~np.isnan(end_prices) & (start_prices > 0)
+    weight_arr = selection.weight_arr
+    return float(np.sum(((end_prices[valid] / start_prices[valid]) - 1) * weight_arr[valid]))
+
+
+def volscale_factor(realized_vol, target_vol, scale_min, scale_max):
+    """
+    VolScaleファクター（target_vol / realized_vol をクリップ）
+
+    Args:
+        realized_vol (float): 実現ポートフォリオVol
+        target_vol (float): 目標ボラティリティ
+        scale_min (float): 最小スケール
+        scale_max (float): 最大スケール
+
+    Returns:
+        float: スケールファクター
+    """
+    scale = target_vol / realized_vol if realized_vol > 0 else 1.0
+    return np.clip(scale, scale_min, scale_max)
+
+
+def _empty_result(strategy):
+    if strategy.benchmark is not None:
+        return {'returns': [], 'turnovers': []}
+    result = {'returns': [], 'gross_returns': [], 'scale_factors': [], 'turnovers': []}
+    if strategy.target_vol is not None:
+        result['realized_vols'] = []
+    return result
+
+
+def run_backtest(strategies, selections, prices, indices, regime, momentum_period,
+                 transaction_cost, scale_bounds=(0.5, 1.5), rebalance_offset=0,
+                 require_all_legs=False, benchmark_fill=None):
+    """
+    レジストリの全戦略を月次でシミュレーション
+
+    Args:
+        strategies (list): Strategyのリスト
+        selections (SelectionCache): 銘柄選択キャッシュ
+        prices (PriceMatrix): 終値マトリクス
+        indices (list): 月次インデックス [(first_idx, timestamp), ...]
+        regime (np.ndarray): Bull判定（長さT、bool）
+        momentum_period (int): モメンタム期間（日数）
+        transaction_cost (float): 取引コスト率（往復）
+        scale_bounds (tuple): VolScaleのクリップ範囲 (最小, 最大)
+        rebalance_offset (int): リバランス日オフセット（0=月初）
+        require_all_legs (bool): Trueの場合、いずれかのレッグが空の月は全戦略をスキップ
+        benchmark_fill (float): ベンチマーク価格が欠損した月のリターン（Noneはその月を記録しない）
+
+    Returns:
+        tuple: (results, months)
+            - results (dict): {戦略名: {'returns', 'gross_returns', 'turnovers',
+              'scale_factors', 'realized_vols'(VolScaleのみ)}}（ベンチマークはreturns/turnoversのみ）
+            - months (list): 評価した月 [(i, month_start, bull), ...]（iはindicesの位置）
+
+    Note:
+        - 選択日はリバランス日の前営業日（selection_idx = start_idx - 1）
+        - 選択レッグとそのグロスリターンは月ごとに1回だけ計算し、全戦略で共有
+        - net = (gross - cost × turnover) × scale（VolScaleなしはscaleを掛けない）
+    """
+    legs = list(dict.fromkeys(leg for strategy in strategies for leg in strategy.legs))
+    close = prices.close
+    benchmark_prices = {
+        strategy.benchmark: prices.series(strategy.benchmark)
+        for strategy in strategies if strategy.benchmark is not None
+    }
+    scale_min, scale_max = scale_bounds
+
+    results = {strategy.name: _empty_result(strategy) for strategy in strategies}
+    prev_weights = {strategy.name: {} for strategy in strategies}
+    months = []
+
+    for i in range(len(indices) - 1):
+        start_idx, month_start = indices[i]
+        end_idx, _ = indices[i + 1]
+
+        start_idx = min(start_idx + rebalance_offset, end_idx - 1)
+        end_idx -= 1
+
+        selection_idx = start_idx - 1
+        if selection_idx < momentum_period:
+            continue
+
+        bull = bool(regime[selection_idx])
+
+        # 共有ノード: 選択レッグ（全戦略で1回だけ）
+        chosen = {leg: selections.get(leg.universe, selection_idx, leg.top_n, momentum_period) for leg in legs}
+        if require_all_legs and not all(chosen.values()):
+            continue
+        months.append((i, month_start, bull))
+
+        # 共有ノード: レッグのグロスリターン（必要になった時に1回だけ）
+        leg_returns = {}
+
+        for strategy in strategies:
+            result = results[strategy.name]
+
+            if strategy.benchmark is not None:
+                series = benchmark_prices[strategy.benchmark]
+                bench_start = series[start_idx]
+                bench_end = series[end_idx]
+                if not np.isnan(bench_start) and not np.isnan(bench_end) and bench_start > 0:
+                    ret = (bench_end / bench_start) - 1
+                elif benchmark_fill is not None:
+                    ret = benchmark_fill
+                else:
+                    continue
+                result['returns'].append(ret)
+                result['turnovers'].append(0)
+                continue
+
+            leg = strategy.leg(bull)
+            selection = chosen[leg]
+            if not selection:
+                continue
+
+            if leg not in leg_returns:
+                leg_returns[leg] = selection_return(close, selection, start_idx, end_idx)
+            gross_ret = leg_returns[leg]
+            turnover = calc_turnover(prev_weights[strategy.name], selection.weights)
+            net_ret = gross_ret - transaction_cost * turnover if strategy.cost else gross_ret
+
+            if strategy.target_vol is not None:
+                scale = volscale_factor(selection.realized_vol, strategy.target_vol, scale_min, scale_max)
+                net_ret = net_ret * scale
+                result['realized_vols'].append(selection.realized_vol)
+            else:
+                scale = 1.0
+
+            result['returns'].append(net_ret)
+            result['gross_returns'].append(gross_ret)
+            result['scale_factors'].append(scale)
+            result['turnovers'].append(turnover)
+            prev_weights[strategy.name] = selection.weights
+
+    return results, months
+
+
+def month_bounds(indices, rebalance_offset=0):
+    """
+    月ごとのリバランス日・月末・選択日（run_backtestと同じ規則の配列版）
+
+    Args:
+        indices (list): 月次インデックス [(first_idx, timestamp), ...]
+        rebalance_offset (int): リバランス日オフセット
+
+    Returns:
+        tuple: (start, end, selection)（各長さ len(indices) - 1 のint64配列）
+    """
+    first = np.array([idx for idx, _ in indices], dtype=np.int64)
+    end = first[1:] - 1
+    start = np.minimum(first[:-1] + rebalance_offset, end)
+    return start, end, start - 1
+
+
+def price_relatives(close, start, end):
+    """
+    月次の価格変化率行列
+
+    Args:
+        close (np.ndarray): 終値行列（T×N）
+        start (np.ndarray): 月初インデックス（長さM）
+        end (np.ndarray): 月末インデックス（長さM）
+
+    Returns:
+        np.ndarray: close[end] / close[start] - 1（M×N、欠損・非正の開始価格は0）
+    """
+    start_prices = close[start]
+    end_prices = close[end]
+    valid = ~np.isnan(start_prices) & ~np.isnan(end_prices) & (start_prices > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        relatives = end_prices / start_prices - 1
+    return np.where(valid, relatives, 0.0)
+
+
+def run_backtest_matrix(strategies, selections, prices, indices, regime, momentum_period,
+                        transaction_cost, scale_bounds=(0.5, 1.5), rebalance_offset=0,
+                        require_all_legs=False, benchmark_fill=None):
+    """
+    run_backtestのベクトル化版（ウェイト行列による一括計算）
+
+    各戦略を月数×銘柄数のウェイト行列Wで表し、月次のPythonループなしで計算する。
+
+    Args:
+        run_backtestと同じ
+
+    Returns:
+        tuple: (results, months)（run_backtestと同じ形式）
+
+    Note:
+        - レッグのウェイト: SelectionCache.matrix（全月一括の選択・リスク逆数ウェイト）
+        - グロスリターン: W と価格変化率行列の行ごとの内積
+        - ターンオーバー: turnover_matrix（abs(diff(W)).sum(axis=1) / 2、先頭月は前月ウェイト0）
+        - 選択なしの月は戦略ごとに除外し、前月ウェイトは直前の保有月を引き継ぐ
+        - 結果はrun_backtestと浮動小数点の丸め誤差の範囲で一致
+    """
+    start, end, selection_idx = month_bounds(indices, rebalance_offset)
+    months_pos = np.flatnonzero(selection_idx >= momentum_period)
+    legs = list(dict.fromkeys(leg for strategy in strategies for leg in strategy.legs))
+    chosen = {
+        leg: selections.matrix(leg.universe, selection_idx[months_pos], leg.top_n, momentum_period)
+        for leg in legs
+    }
+    if require_all_legs and legs:
+        keep = np.logical_and.reduce([chosen[leg].valid for leg in legs])
+        months_pos = months_pos[keep]
+        chosen = {leg: chosen[leg].take(keep) for leg in legs}
+
+    start, end, selection_idx = start[months_pos], end[months_pos], selection_idx[months_pos]
+    bull = np.asarray(regime, dtype=bool)[selection_idx]
+    months = [(int(i), indices[i][1], bool(b)) for i, b in zip(months_pos, bull)]
+
+    # 共有ノード: レッグのウェイト行列とグロスリターン（全月一括）
+    relatives = price_relatives(prices.close, start, end)
+    leg_weights = {leg: chosen[leg].dense(prices.n_symbols) for leg in legs}
+    leg_returns = {leg: np.einsum('mn,mn->m', leg_weights[leg], relatives) for leg in legs}
+    scale_min, scale_max = scale_bounds
+
+    results = {}
+    for strategy in strategies:
+        if strategy.benchmark is not None:
+            series = prices.series(strategy.benchmark)
+            bench_start = series[start]
+            bench_end = series[end]
+            valid = ~np.isnan(bench_start) & ~np.isnan(bench_end) & (bench_start > 0)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                returns = bench_end / bench_start - 1
+            if benchmark_fill is None:
+                returns = returns[valid]
+            else:
+                returns = np.where(valid, returns, benchmark_fill)
+            results[strategy.name] = {'returns': returns.tolist(), 'turnovers': [0] * len(returns)}
+            continue
+
+        use_bull = bull if strategy.bear is not None else np.ones(len(bull), dtype=bool)
+        bear = strategy.bear if strategy.bear is not None else strategy.bull
+        held = np.where(use_bull, chosen[strategy.bull].valid, chosen[bear].valid)
+
+        weights = np.where(use_bull[:, None], leg_weights[strategy.bull], leg_weights[bear])[held]
+        gross = np.where(use_bull, leg_returns[strategy.bull], leg_returns[bear])[held]
+        turnovers = turnover_matrix(weights)
+        net = gross - transaction_cost * turnovers if strategy.cost else gross
+
+        result = {'returns': None, 'gross_returns': gross.tolist()}
+        if strategy.target_vol is not None:
+            realized = np.where(use_bull, chosen[strategy.bull].realized_vol, chosen[bear].realized_vol)[held]
+            scales = np.clip(strategy.target_vol / realized, scale_min, scale_max)
+            net = net * scales
+            result['realized_vols'] = realized.tolist()
+        else:
+            scales = np.ones(len(net))
+        result['returns'] = net.tolist()
+        result['scale_factors'] = scales.tolist()
+        result['turnovers'] = turnovers.tolist()
+        results[strategy.name] = result
+
+    return results, months
+
+
+class BacktestContext:
+    """
+    シミュレーションの事前計算一式（ボラ行列・モメンタム・順位・選択キャッシュ・レジーム）
+
+    価格マトリクスと設定値だけから決定的に構築できるため、
+    sweep.run_sweepのワーカープロセスでも同じものを再構築して使える。
+
+    Attributes:
+        prices (PriceMatrix): 価格マトリクス
+        vol_matrix (np.ndarray): 銘柄別ボラティリティ（T×N）
+        momentum (MomentumCube): モメンタム（期間×日数×銘柄数）
+        ranks (RankCache): モメンタム順位キャッシュ
+        selections (SelectionCache): 銘柄選択キャッシュ
+        bull_regime (np.ndarray): レジーム判定（長さT、Bull=True）
+        monthly_indices (list): [(月初インデックス, 月初日), ...]
+    """
+
+    def __init__(self, prices, universes, momentum_horizons, vol_params, ma_period, regime_threshold,
+                 weight_cap, volscale_lookback, scale_bounds=(0.5, 1.5), defense_top_n=(5, 3),
+                 attack_vol_multiplier=1.0, regime_symbol='SPY'):
+        """
+        Args:
+            prices (PriceMatrix): 価格マトリクス
+            universes (dict): {ユニバース名: 銘柄シンボルのリスト}
+            momentum_horizons (list): 事前計算するモメンタム期間（日数）
+            vol_params (tuple): (短期期間, 長期期間, 短期重み, 長期重み, フロア)
+            ma_period (int): レジーム判定の移動平均期間
+            regime_threshold (float): レジーム判定閾値
+            weight_cap (float): 単一銘柄ウェイト上限
+            volscale_lookback (int): 実現ポートフォリオVolの計算期間（日数）
+            scale_bounds (tuple): VolScaleの(最小, 最大)スケール
+            defense_top_n (tuple): (防御型TOP5, 防御型TOP3)の銘柄数
+            attack_vol_multiplier (float): 攻撃型D2/D3の目標Vol倍率
+            regime_symbol (str): レジーム判定に使う銘柄
+        """
+        short_period, long_period, short_weight, long_weight, vol_floor = vol_params
+        self.prices = prices
+        self.vol_matrix = rolling_volatility(
+            prices.close, short_period, long_period, short_weight, long_weight, floor=vol_floor
+        )
+        self.momentum = MomentumCube(prices.close, momentum_horizons)
+        self.ranks = RankCache(
+            self.momentum, {name: prices.cols(symbols) for name, symbols in universes.items()}
+        )
+        self.selections = SelectionCache(
+            self.ranks, self.vol_matrix, prices.close, prices.symbols, weight_cap,
+            volscale_lookback, vol_floor,
+        )
+        self.bull_regime = regime_series(prices.series(regime_symbol), ma_period, regime_threshold)
+        self.monthly_indices = prices.month_starts()
+        self.scale_bounds = scale_bounds
+        self.defense_top_n = defense_top_n
+        self.attack_vol_multiplier = attack_vol_multiplier
+
+    def volscale_targets(self, target_vol):
+        """戦略別目標Vol（攻撃型D2/D3はtarget_vol × attack_vol_multiplier、その他はtarget_vol）"""
+        attack = target_vol * self.attack_vol_multiplier
+        return {
+            'D2': attack,
+            'D3': attack,
+            '防御型TOP5': target_vol,
+            '防御型TOP3': target_vol,
+            'D2+防御型': target_vol,
+            'D3+防御型': target_vol,
+        }
+
+    def strategies(self, top_n, target_vol):
+        """標準13戦略（攻撃型の銘柄数と目標Volを指定）"""
+        return standard_strategies(top_n, *self.defense_top_n, self.volscale_targets(target_vol))
+
+    def run(self, momentum_period, top_n, transaction_cost, target_vol, rebalance_offset=0,
+            indices=None, bull_series=None):
+        """
+        標準13戦略のシミュレーション（run_backtest_matrix）
+
+        Args:
+            momentum_period (int): モメンタム計算期間（日数）
+            top_n (int): 攻撃型の選択銘柄数
+            transaction_cost (float): 取引コスト率
+            target_vol (float): 目標ボラティリティ
+            rebalance_offset (int): リバランス日オフセット
+            indices (list): カスタム月次インデックス（省略時はmonthly_indices）
+            bull_series (np.ndarray): カスタムレジーム判定（省略時はbull_regime）
+
+        Returns:
+            dict: {戦略名: 結果}（run_backtest_matrixと同じ形式）
+        """
+        results, _ = run_backtest_matrix(
+            self.strategies(top_n, target_vol), self.selections, self.prices,
+            indices if indices else self.monthly_indices,
+            self.bull_regime if bull_series is None else bull_series,
+            momentum_period, transaction_cost,
+            scale_bounds=self.scale_bounds, rebalance_offset=rebalance_offset,
+        )
+        return results
@@ -11,6 +11,7 @@ Holy Grail シミュレーション v4: 評価エラー修正版
 
 出力:
     grail.json: シミュレーション結果（指標、月次リターン、累積リターン系列）
+    grail.feather: 全戦略の全精度の月次系列（リターン・ターンオーバー・スケール・レジーム・評価月）
 
 v4変更点:
     1. 取引コスト（往復0.2%）を織り込み
@@ -47,7 +48,15 @@ v4変更点:
 依存ライブラリ:
     - numpy
     - pandas
+    - pyarrow（parquetの列射影読み込み）
     - json
+    - price_matrix.py（同ディレクトリ、終値マトリクス共通データ層）
+    - signals.py（同ディレクトリ、指標の一括事前計算）
+    - selection.py（同ディレクトリ、銘柄選択キャッシュ）
+    - engine.py（同ディレクトリ、戦略レジストリとシミュレーションエンジン）
+    - sidecar.py（同ディレクトリ、月次系列のFeatherサイドカー）
+    - kernels.py（同ディレクトリ、Numba JITカーネル）
+    - numba（オプション、インストールされていればkernels.pyのカーネルを使用）
 
 作成者: Portfolio Advisor System
 バージョン: v4.0
@@ -55,10 +64,16 @@ v4変更点:
 """
 
 import json
+import os
 import numpy as np
-import pandas as pd
 from datetime import datetime
 
+from price_matrix import format_io_report, load_price_matrix
+from engine import run_backtest_matrix, standard_strategies
+from selection import SelectionCache
+from signals import MomentumCube, RankCache, regime_series, rolling_volatility
+from sidecar import SIDECAR_FORMAT_VERSION, write_sidecar
+
 # =============================================================================
 # パラメータ
 # =============================================================================
@@ -104,13 +119,17 @@ print("=" * 80)
 print()
 print("データ読み込み中...")
 PARQUET_PATH = '/home/ubuntu/portfolio-advisor/analysis/holygrail.parquet'
-df = pd.read_parquet(PARQUET_PATH)
-print(f"データ期間: {df.index.min()} 〜 {df.index.max()}")
-print(f"行数: {len(df):,}, 列数: {len(df.columns):,}")
-
-# シンボルリスト取得
-close_cols = [c for c in df.columns if '_Close' in c and 'Adj' not in c]
-ALL_SYMBOLS = list(set([c.split('_')[0] for c in close_cols]))
+CACHE_DIR = '/home/ubuntu/portfolio-advisor/analysis/.holygrail_cache'
+
+# 価格マトリクス（日数×銘柄数、parquet変更時のみ再構築するmemmapキャッシュ）
+prices = load_price_matrix(PARQUET_PATH, cache_dir=CACHE_DIR)
+print(f"データ期間: {prices.dates.min()} 〜 {prices.dates.max()}")
+print(f"行数: {prices.n_days:,}, 銘柄数: {prices.n_symbols:,}")
+print(f"価格キャッシュ: {prices.cache_status}")
+if prices.io_report:
+    print(f"列射影: {format_io_report(prices.io_report)}")
+close = prices.close
+ALL_SYMBOLS = prices.symbols
 
 # 防御型ETFリスト（13種）
 DEFENSE_ETFS = ['GLD', 'EEM', 'IWM', 'QQQ', 'SPY', 'EFA', 'DBC', 'LQD', 'AGG', 'SHY', 'TLT', 'TIP', 'IYR']
@@ -131,384 +150,47 @@ D2_UNIVERSE_FIXED = [
 ]
 
 # S&P500銘柄（D3ユニバース）
-sp500_symbols = [s for s in ALL_SYMBOLS if s not in DEFENSE_ETFS and f'{s}_Close' in df.columns]
-sp100_symbols = [s for s in D2_UNIVERSE_FIXED if f'{s}_Close' in df.columns]
+sp500_symbols = [s for s in ALL_SYMBOLS if s not in DEFENSE_ETFS]
+sp100_symbols = [s for s in D2_UNIVERSE_FIXED if s in prices]
 
 print(f"S&P100銘柄数: {len(sp100_symbols)}")
 print(f"S&P500銘柄数: {len(sp500_symbols)}")
 print(f"防御型ETF数: {len(DEFENSE_ETFS)}")
 
-# 価格データ取得
-price_data = {}
-for symbol in ALL_SYMBOLS:
-    col = f'{symbol}_Close'
-    if col in df.columns:
-        price_data[symbol] = df[col].values
+# ユニバースの列番号
+sp100_cols = prices.cols(sp100_symbols)
+sp500_cols = prices.cols(sp500_symbols)
+defense_cols = prices.cols(DEFENSE_ETFS)
 
 # SPY価格
-spy_prices = price_data.get('SPY', np.full(len(df), np.nan))
+spy_prices = prices.series('SPY')
 
-# 月次インデックス
-df['YearMonth'] = df.index.to_period('M')
-monthly_indices = []
-for ym, group in df.groupby('YearMonth'):
-    first_idx = df.index.get_loc(group.index[0])
-    monthly_indices.append((first_idx, group.index[0]))
-
-print(f"月数: {len(monthly_indices)}")
-print()
-
-# =============================================================================
-# 計算関数
-# =============================================================================
+# 改善版ボラティリティ（全銘柄×全日を一括計算し、以降は添字参照のみ）
+vol_matrix = rolling_volatility(
+    close, VOL_SHORT_PERIOD, VOL_LONG_PERIOD, VOL_SHORT_WEIGHT, VOL_LONG_WEIGHT, floor=VOL_FLOOR
+)
 
-def calc_momentum(symbol, idx):
-    """
-    モメンタム計算（6ヶ月リターン）
-    
-    Args:
-        symbol (str): 銘柄シンボル（例: 'AAPL'）
-        idx (int): 現在のインデックス（日次データの行番号）
-    
-    Returns:
-        float: 6ヶ月リターン（小数、例: 0.15 = 15%）
-               データ不足の場合はnp.nan
-    
-    Note:
-        MOMENTUM_PERIOD（126日 = 6ヶ月）前の価格と現在価格の比率を計算
-    """
-    if symbol not in price_data:
-        return np.nan
-    prices = price_data[symbol]
-    if idx < MOMENTUM_PERIOD:
-        return np.nan
-    current = prices[idx]
-    past = prices[idx - MOMENTUM_PERIOD]
-    if np.isnan(current) or np.isnan(past) or past <= 0:
-        return np.nan
-    return (current / past) - 1
-
-
-def calc_volatility_improved(symbol, idx):
-    """
-    改善版ボラティリティ計算（v4）
-    
-    短期Vol（21日）と長期Vol（60日）の加重平均を計算し、
-    ボラティリティフロア（5%）を適用。
-    
-    Args:
-        symbol (str): 銘柄シンボル
-        idx (int): 現在のインデックス
-    
-    Returns:
-        float: 年率ボラティリティ（小数、例: 0.20 = 20%）
-               最低VOL_FLOOR（5%）以上を保証
-    
-    Note:
-        - 短期Vol: 21日間の日次リターンの標準偏差×√252
-        - 長期Vol: 60日間の日次リターンの標準偏差×√252
-        - 加重平均: 短期70% + 長期30%（急変への追随性重視）
-    """
-    if symbol not in price_data:
-        return VOL_FLOOR
-    prices = price_data[symbol]
-    
-    # 短期Vol（21日）
-    if idx >= VOL_SHORT_PERIOD:
-        short_prices = prices[idx - VOL_SHORT_PERIOD:idx + 1]
-        short_returns = np.diff(short_prices) / short_prices[:-1]
-        short_returns = short_returns[~np.isnan(short_returns)]
-        short_vol = np.std(short_returns) * np.sqrt(252) if len(short_returns) >= 10 else np.nan
-    else:
-        short_vol = np.nan
-    
-    # 長期Vol（60日）
-    if idx >= VOL_LONG_PERIOD:
-        long_prices = prices[idx - VOL_LONG_PERIOD:idx + 1]
-        long_returns = np.diff(long_prices) / long_prices[:-1]
-        long_returns = long_returns[~np.isnan(long_returns)]
-        long_vol = np.std(long_returns) * np.sqrt(252) if len(long_returns) >= 20 else np.nan
-    else:
-        long_vol = np.nan
-    
-    # 加重平均
-    if not np.isnan(short_vol) and not np.isnan(long_vol):
-        vol = VOL_SHORT_WEIGHT * short_vol + VOL_LONG_WEIGHT * long_vol
-    elif not np.isnan(short_vol):
-        vol = short_vol
-    elif not np.isnan(long_vol):
-        vol = long_vol
-    else:
-        vol = 0.20  # デフォルト
-    
-    # フロア適用
-    return max(vol, VOL_FLOOR)
-
-
-def select_attack_stocks(universe, idx, top_n):
-    """
-    攻撃型銘柄選択（リスク逆数ウェイト、ウェイト上限付き）
-    
-    ユニバースからモメンタム上位N銘柄を選択し、
-    リスク（ボラティリティ）の逆数でウェイト付け。
-    
-    Args:
-        universe (list): 選択対象銘柄リスト（例: sp100_symbols）
-        idx (int): 現在のインデックス
-        top_n (int): 選択銘柄数（通常は5）
-    
-    Returns:
-        tuple: (selected, weights)
-            - selected (list): 選択された銘柄シンボルのリスト
-            - weights (dict): {symbol: weight} の辞書、合計=1.0
-    
-    Note:
-        - ウェイト上限: WEIGHT_CAP（40%）を適用後、再正規化
-        - ボラティリティは改善版（calc_volatility_improved）を使用
-    """
-    momentum_scores = []
-    for symbol in universe:
-        mom = calc_momentum(symbol, idx)
-        if not np.isnan(mom):
-            momentum_scores.append((symbol, mom))
-    
-    if len(momentum_scores) < top_n:
-        return [], {}
-    
-    momentum_scores.sort(key=lambda x: x[1], reverse=True)
-    selected = [s[0] for s in momentum_scores[:top_n]]
-    
-    # リスク逆数ウェイト（改善版Vol使用）
-    inv_vols = []
-    for symbol in selected:
-        vol = calc_volatility_improved(symbol, idx)
-        inv_vols.append(1 / vol)
-    
-    total_inv = sum(inv_vols)
-    weights = {s: min(iv / total_inv, WEIGHT_CAP) for s, iv in zip(selected, inv_vols)}
-    
-    # ウェイト再正規化
-    total_weight = sum(weights.values())
-    weights = {s: w / total_weight for s, w in weights.items()}
-    
-    return selected, weights
+# モメンタム（期間×日数×銘柄数、全銘柄×全日を一括計算）
+momentum = MomentumCube(close, [MOMENTUM_PERIOD])
 
+# レジーム判定（累積和MA200で全日を一括計算）
+bull_regime = regime_series(spy_prices, MA_PERIOD, REGIME_THRESHOLD)
 
-def select_defense_etfs(etfs, idx, top_n):
-    """
-    防御型ETF選択（リスク逆数ウェイト、ウェイト上限付き）
-    
-    13種の防御型ETFからモメンタム上位N銘柄を選択。
-    
-    Args:
-        etfs (list): 防御型ETFリスト（DEFENSE_ETFS）
-        idx (int): 現在のインデックス
-        top_n (int): 選択銘柄数（3または5）
-    
-    Returns:
-        tuple: (selected, weights)
-            - selected (list): 選択されたETFシンボルのリスト
-            - weights (dict): {symbol: weight} の辞書、合計=1.0
-    
-    Note:
-        防御型ETFリスト: GLD, EEM, IWM, QQQ, SPY, EFA, DBC, LQD, AGG, SHY, TLT, TIP, IYR
-    """
-    momentum_scores = []
-    for symbol in etfs:
-        mom = calc_momentum(symbol, idx)
-        if not np.isnan(mom):
-            momentum_scores.append((symbol, mom))
-    
-    if len(momentum_scores) < top_n:
-        return [], {}
-    
-    momentum_scores.sort(key=lambda x: x[1], reverse=True)
-    selected = [s[0] for s in momentum_scores[:top_n]]
-    
-    # リスク逆数ウェイト（改善版Vol使用）
-    inv_vols = []
-    for symbol in selected:
-        vol = calc_volatility_improved(symbol, idx)
-        inv_vols.append(1 / vol)
-    
-    total_inv = sum(inv_vols)
-    weights = {s: min(iv / total_inv, WEIGHT_CAP) for s, iv in zip(selected, inv_vols)}
-    
-    # ウェイト再正規化
-    total_weight = sum(weights.values())
-    weights = {s: w / total_weight for s, w in weights.items()}
-    
-    return selected, weights
+# モメンタム順位（ユニバースごとに全日付を一括ソート、top_nは先頭スライス）
+ranks = RankCache(momentum, {'sp100': sp100_cols, 'sp500': sp500_cols, 'defense': defense_cols})
 
+# 銘柄選択キャッシュ（選択銘柄・ウェイト・実現ポートフォリオVolを月×ユニバース×top_nごとに1回だけ計算）
+selections = SelectionCache(ranks, vol_matrix, close, ALL_SYMBOLS, WEIGHT_CAP, VOLSCALE_LOOKBACK, VOL_FLOOR)
 
-def calc_portfolio_volatility(selected, weights, idx):
-    """
-    ポートフォリオボラティリティ計算（VolScale用）
-    
-    ポートフォリオ全体の実現ボラティリティを計算。
-    VolScaleファクターの算出に使用。
-    
-    Args:
-        selected (list): 選択銘柄リスト
-        weights (dict): 銘柄別ウェイト
-        idx (int): 現在のインデックス
-    
-    Returns:
-        float: ポートフォリオの年率ボラティリティ
-    
-    Note:
-        - VOLSCALE_LOOKBACK（21日）のリターンを使用
-        - ウェイト加重平均リターンの標準偏差×√252
-    """
-    if idx < VOLSCALE_LOOKBACK:
-        return 0.15
-    
-    returns_matrix = []
-    weight_list = []
-    
-    for symbol in selected:
-        if symbol not in price_data:
-            continue
-        prices = price_data[symbol]
-        period_prices = prices[idx - VOLSCALE_LOOKBACK:idx + 1]
-        if len(period_prices) < VOLSCALE_LOOKBACK:
-            continue
-        returns = np.diff(period_prices) / period_prices[:-1]
-        if np.any(np.isnan(returns)):
-            continue
-        returns_matrix.append(returns)
-        weight_list.append(weights.get(symbol, 0))
-    
-    if len(returns_matrix) == 0:
-        return 0.15
-    
-    returns_matrix = np.array(returns_matrix)
-    weight_arr = np.array(weight_list)
-    weight_arr = weight_arr / weight_arr.sum()
-    
-    portfolio_returns = np.dot(weight_arr, returns_matrix)
-    vol = np.std(portfolio_returns) * np.sqrt(252)
-    
-    return max(vol, VOL_FLOOR) if vol > 0 else 0.15
+# 戦略レジストリ（選択レッグ × レジームスイッチ × VolScale目標 × 取引コストの組み合わせ）
+# 戦略を追加する場合はSTRATEGIESにStrategyを追加する（既存レッグを使う戦略は選択計算を共有）
+STRATEGIES = standard_strategies(ATTACK_TOP_N, DEFENSE_TOP_N_5, DEFENSE_TOP_N_3, VOLSCALE_TARGETS)
 
+# 月次インデックス（各月の最初の営業日）
+monthly_indices = prices.month_starts()
 
-def calc_volscale_factor(selected, weights, idx, strategy_name):
-    """
-    VolScaleファクター計算
-    
-    目標ボラティリティと実現ボラティリティの比率から
-    ポジションサイズのスケールファクターを算出。
-    
-    Args:
-        selected (list): 選択銘柄リスト
-        weights (dict): 銘柄別ウェイト
-        idx (int): 現在のインデックス
-        strategy_name (str): 戦略名（VOLSCALE_TARGETSのキー）
-    
-    Returns:
-        tuple: (scale, realized_vol)
-            - scale (float): スケールファクター（0.5～1.5にクリップ）
-            - realized_vol (float): 実現ボラティリティ
-    
-    Note:
-        scale = target_vol / realized_vol
-        クリップ範囲: VOLSCALE_MIN(0.5) ～ VOLSCALE_MAX(1.5)
-    """
-    target_vol = VOLSCALE_TARGETS.get(strategy_name, 0.12)
-    realized_vol = calc_portfolio_volatility(selected, weights, idx)
-    
-    scale = target_vol / realized_vol if realized_vol > 0 else 1.0
-    scale = np.clip(scale, VOLSCALE_MIN, VOLSCALE_MAX)
-    
-    return scale, realized_vol
-
-
-def calc_turnover(prev_weights, curr_weights):
-    """
-    ターンオーバー率計算（売買回転率）
-    
-    前月と今月のポートフォリオウェイトの差分から
-    ターンオーバー率を計算。取引コストの算出に使用。
-    
-    Args:
-        prev_weights (dict): 前月のウェイト
-        curr_weights (dict): 今月のウェイト
-    
-    Returns:
-        float: ターンオーバー率（片道ベース、例: 0.30 = 30%）
-    
-    Note:
-        片道ベース = ウェイト変化の絶対値合計 / 2
-    """
-    all_symbols = set(prev_weights.keys()) | set(curr_weights.keys())
-    turnover = 0.0
-    for symbol in all_symbols:
-        prev_w = prev_weights.get(symbol, 0)
-        curr_w = curr_weights.get(symbol, 0)
-        turnover += abs(curr_w - prev_w)
-    return turnover / 2  # 片道ベース
-
-
-def calc_monthly_return_with_cost(selected, weights, start_idx, end_idx, prev_weights, transaction_cost):
-    """
-    月次リターン計算（取引コスト込み）
-    
-    ポートフォリオの月次リターンを計算し、
-    ターンオーバー率に応じた取引コストを控除。
-    
-    Args:
-        selected (list): 選択銘柄リスト
-        weights (dict): 銘柄別ウェイト
-        start_idx (int): 月初のインデックス
-        end_idx (int): 月末のインデックス
-        prev_weights (dict): 前月のウェイト
-        transaction_cost (float): 取引コスト率（往復）
-    
-    Returns:
-        tuple: (month_return, turnover)
-            - month_return (float): コスト控除後の月次リターン
-            - turnover (float): ターンオーバー率
-    
-    Note:
-        コスト = turnover * transaction_cost（片道ベース）
-    """
-    # 基本リターン
-    month_return = 0.0
-    for symbol in selected:
-        if symbol not in price_data:
-            continue
-        start_price = price_data[symbol][start_idx]
-        end_price = price_data[symbol][end_idx]
-        if np.isnan(start_price) or np.isnan(end_price) or start_price <= 0:
-            continue
-        ret = (end_price / start_price) - 1
-        month_return += ret * weights[symbol]
-    
-    # ターンオーバー率計算
-    turnover = calc_turnover(prev_weights, weights)
-    
-    # 取引コスト控除（往復コスト × ターンオーバー率）
-    cost = transaction_cost * turnover
-    
-    return month_return - cost, turnover
-
-
-def calc_monthly_return_volscale_with_cost(selected, weights, start_idx, end_idx, scale_factor, prev_weights, transaction_cost):
-    """月次リターン計算（VolScale + 取引コスト込み）"""
-    base_return, turnover = calc_monthly_return_with_cost(selected, weights, start_idx, end_idx, prev_weights, transaction_cost)
-    return base_return * scale_factor, turnover
-
-
-def is_bull_regime(idx):
-    """レジーム判定"""
-    if idx < MA_PERIOD:
-        return True
-    spy_price = spy_prices[idx]
-    ma200 = np.mean(spy_prices[idx - MA_PERIOD + 1:idx + 1])
-    if np.isnan(spy_price) or np.isnan(ma200):
-        return True
-    return spy_price >= ma200 * REGIME_THRESHOLD
-
+print(f"月数: {len(monthly_indices)}")
+print()
 
 # =============================================================================
 # シミュレーション実行
@@ -524,230 +206,42 @@ print(f"  3. ボラティリティフロア: {VOL_FLOOR*100:.0f}%")
 print(f"  4. ウェイト上限: {WEIGHT_CAP*100:.0f}%")
 print()
 
+backtest, evaluated_months = run_backtest_matrix(
+    STRATEGIES, selections, prices, monthly_indices, bull_regime, MOMENTUM_PERIOD, TRANSACTION_COST,
+    scale_bounds=(VOLSCALE_MIN, VOLSCALE_MAX),
+    require_all_legs=True,  # D2/D3/防御型TOP5/TOP3のいずれかが選択できない月は全戦略スキップ
+    benchmark_fill=0,       # SPY価格が欠損した月はリターン0
+)
+
 # 結果格納（cumulative_seriesを追加して月次累積リターン系列を保存）
-results = {
-    'D2': {'returns': [], 'cumulative': 1.0, 'cumulative_series': [], 'turnovers': []},
-    'D3': {'returns': [], 'cumulative': 1.0, 'cumulative_series': [], 'turnovers': []},
-    '防御型TOP5': {'returns': [], 'cumulative': 1.0, 'cumulative_series': [], 'turnovers': []},
-    '防御型TOP3': {'returns': [], 'cumulative': 1.0, 'cumulative_series': [], 'turnovers': []},
-    'D2+防御型': {'returns': [], 'cumulative': 1.0, 'cumulative_series': [], 'turnovers': []},
-    'D3+防御型': {'returns': [], 'cumulative': 1.0, 'cumulative_series': [], 'turnovers': []},
-    'SPY': {'returns': [], 'cumulative': 1.0, 'cumulative_series': [], 'turnovers': []},
-    'D2_VolScale': {'returns': [], 'cumulative': 1.0, 'cumulative_series': [], 'turnovers': [], 'scale_factors': []},
-    'D3_VolScale': {'returns': [], 'cumulative': 1.0, 'cumulative_series': [], 'turnovers': [], 'scale_factors': []},
-    '防御型TOP5_VolScale': {'returns': [], 'cumulative': 1.0, 'cumulative_series': [], 'turnovers': [], 'scale_factors': []},
-    '防御型TOP3_VolScale': {'returns': [], 'cumulative': 1.0, 'cumulative_series': [], 'turnovers': [], 'scale_factors': []},
-    'D2+防御型_VolScale': {'returns': [], 'cumulative': 1.0, 'cumulative_series': [], 'turnovers': [], 'scale_factors': []},
-    'D3+防御型_VolScale': {'returns': [], 'cumulative': 1.0, 'cumulative_series': [], 'turnovers': [], 'scale_factors': []},
-}
+results = {}
+for name, data in backtest.items():
+    cumulative_series = np.cumprod(1 + np.array(data['returns'], dtype=np.float64)).tolist()
+    results[name] = dict(data, cumulative=cumulative_series[-1] if cumulative_series else 1.0,
+                         cumulative_series=cumulative_series)
 
 # 月次データ（チャート用）
-months_list = []
-regimes_list = []
-
-# 前月のウェイト（ターンオーバー計算用）
-prev_weights = {
-    'D2': {}, 'D3': {}, '防御型TOP5': {}, '防御型TOP3': {},
-    'D2+防御型': {}, 'D3+防御型': {},
-    'D2_VolScale': {}, 'D3_VolScale': {},
-    '防御型TOP5_VolScale': {}, '防御型TOP3_VolScale': {},
-    'D2+防御型_VolScale': {}, 'D3+防御型_VolScale': {},
-}
+months_list = [month_start.strftime('%Y-%m') for _, month_start, _ in evaluated_months]
+regimes_list = ['Bull' if bull else 'Bear' for _, _, bull in evaluated_months]
 
 # 年次リターン
 yearly_returns = {k: {} for k in results.keys()}
-
-# メインループ
-for i in range(len(monthly_indices) - 1):
-    start_idx, month_start = monthly_indices[i]
-    end_idx, month_end = monthly_indices[i + 1]
-    end_idx -= 1
-    
-    selection_idx = start_idx - 1
-    if selection_idx < MOMENTUM_PERIOD:
-        continue
-    
-    # 月次データ記録
-    month_str = month_start.strftime('%Y-%m')
-    months_list.append(month_str)
-    
-    is_bull = is_bull_regime(selection_idx)
-    regimes_list.append('Bull' if is_bull else 'Bear')
-    
-    # 銘柄選択
-    d2_selected, d2_weights = select_attack_stocks(sp100_symbols, selection_idx, ATTACK_TOP_N)
-    d3_selected, d3_weights = select_attack_stocks(sp500_symbols, selection_idx, ATTACK_TOP_N)
-    def5_selected, def5_weights = select_defense_etfs(DEFENSE_ETFS, selection_idx, DEFENSE_TOP_N_5)
-    def3_selected, def3_weights = select_defense_etfs(DEFENSE_ETFS, selection_idx, DEFENSE_TOP_N_3)
-    
-    if not d2_selected or not d3_selected or not def5_selected or not def3_selected:
-        continue
-    
-    # VolScaleファクター計算
-    d2_scale, _ = calc_volscale_factor(d2_selected, d2_weights, selection_idx, 'D2')
-    d3_scale, _ = calc_volscale_factor(d3_selected, d3_weights, selection_idx, 'D3')
-    def5_scale, _ = calc_volscale_factor(def5_selected, def5_weights, selection_idx, '防御型TOP5')
-    def3_scale, _ = calc_volscale_factor(def3_selected, def3_weights, selection_idx, '防御型TOP3')
-    d2_regime_scale, _ = calc_volscale_factor(d2_selected, d2_weights, selection_idx, 'D2+防御型')
-    d3_regime_scale, _ = calc_volscale_factor(d3_selected, d3_weights, selection_idx, 'D3+防御型')
-    def3_regime_scale_d2, _ = calc_volscale_factor(def3_selected, def3_weights, selection_idx, 'D2+防御型')
-    def3_regime_scale_d3, _ = calc_volscale_factor(def3_selected, def3_weights, selection_idx, 'D3+防御型')
-    
-    # === 通常版（取引コスト込み） ===
-    
-    # D2
-    ret, turnover = calc_monthly_return_with_cost(d2_selected, d2_weights, start_idx, end_idx, prev_weights['D2'], TRANSACTION_COST)
-    results['D2']['returns'].append(ret)
-    results['D2']['cumulative'] *= (1 + ret)
-    results['D2']['cumulative_series'].append(results['D2']['cumulative'])
-    results['D2']['turnovers'].append(turnover)
-    prev_weights['D2'] = d2_weights.copy()
-    
-    # D3
-    ret, turnover = calc_monthly_return_with_cost(d3_selected, d3_weights, start_idx, end_idx, prev_weights['D3'], TRANSACTION_COST)
-    results['D3']['returns'].append(ret)
-    results['D3']['cumulative'] *= (1 + ret)
-    results['D3']['cumulative_series'].append(results['D3']['cumulative'])
-    results['D3']['turnovers'].append(turnover)
-    prev_weights['D3'] = d3_weights.copy()
-    
-    # 防御型TOP5
-    ret, turnover = calc_monthly_return_with_cost(def5_selected, def5_weights, start_idx, end_idx, prev_weights['防御型TOP5'], TRANSACTION_COST)
-    results['防御型TOP5']['returns'].append(ret)
-    results['防御型TOP5']['cumulative'] *= (1 + ret)
-    results['防御型TOP5']['cumulative_series'].append(results['防御型TOP5']['cumulative'])
-    results['防御型TOP5']['turnovers'].append(turnover)
-    prev_weights['防御型TOP5'] = def5_weights.copy()
-    
-    # 防御型TOP3
-    ret, turnover = calc_monthly_return_with_cost(def3_selected, def3_weights, start_idx, end_idx, prev_weights['防御型TOP3'], TRANSACTION_COST)
-    results['防御型TOP3']['returns'].append(ret)
-    results['防御型TOP3']['cumulative'] *= (1 + ret)
-    results['防御型TOP3']['cumulative_series'].append(results['防御型TOP3']['cumulative'])
-    results['防御型TOP3']['turnovers'].append(turnover)
-    prev_weights['防御型TOP3'] = def3_weights.copy()
-    
-    # D2+防御型
-    if is_bull:
-        curr_weights = d2_weights.copy()
-        ret, turnover = calc_monthly_return_with_cost(d2_selected, d2_weights, start_idx, end_idx, prev_weights['D2+防御型'], TRANSACTION_COST)
-    else:
-        curr_weights = def3_weights.copy()
-        ret, turnover = calc_monthly_return_with_cost(def3_selected, def3_weights, start_idx, end_idx, prev_weights['D2+防御型'], TRANSACTION_COST)
-    results['D2+防御型']['returns'].append(ret)
-    results['D2+防御型']['cumulative'] *= (1 + ret)
-    results['D2+防御型']['cumulative_series'].append(results['D2+防御型']['cumulative'])
-    results['D2+防御型']['turnovers'].append(turnover)
-    prev_weights['D2+防御型'] = curr_weights
-    
-    # D3+防御型
-    if is_bull:
-        curr_weights = d3_weights.copy()
-        ret, turnover = calc_monthly_return_with_cost(d3_selected, d3_weights, start_idx, end_idx, prev_weights['D3+防御型'], TRANSACTION_COST)
-    else:
-        curr_weights = def3_weights.copy()
-        ret, turnover = calc_monthly_return_with_cost(def3_selected, def3_weights, start_idx, end_idx, prev_weights['D3+防御型'], TRANSACTION_COST)
-    results['D3+防御型']['returns'].append(ret)
-    results['D3+防御型']['cumulative'] *= (1 + ret)
-    results['D3+防御型']['cumulative_series'].append(results['D3+防御型']['cumulative'])
-    results['D3+防御型']['turnovers'].append(turnover)
-    prev_weights['D3+防御型'] = curr_weights
-    
-    # SPY（取引コストなし）
-    spy_start = spy_prices[start_idx]
-    spy_end = spy_prices[end_idx]
-    if not np.isnan(spy_start) and not np.isnan(spy_end) and spy_start > 0:
-        ret = (spy_end / spy_start) - 1
-    else:
-        ret = 0
-    results['SPY']['returns'].append(ret)
-    results['SPY']['cumulative'] *= (1 + ret)
-    results['SPY']['cumulative_series'].append(results['SPY']['cumulative'])
-    results['SPY']['turnovers'].append(0)
-    
-    # === VolScale版（取引コスト込み） ===
-    
-    # D2_VolScale
-    ret, turnover = calc_monthly_return_volscale_with_cost(d2_selected, d2_weights, start_idx, end_idx, d2_scale, prev_weights['D2_VolScale'], TRANSACTION_COST)
-    results['D2_VolScale']['returns'].append(ret)
-    results['D2_VolScale']['cumulative'] *= (1 + ret)
-    results['D2_VolScale']['cumulative_series'].append(results['D2_VolScale']['cumulative'])
-    results['D2_VolScale']['turnovers'].append(turnover)
-    results['D2_VolScale']['scale_factors'].append(d2_scale)
-    prev_weights['D2_VolScale'] = d2_weights.copy()
-    
-    # D3_VolScale
-    ret, turnover = calc_monthly_return_volscale_with_cost(d3_selected, d3_weights, start_idx, end_idx, d3_scale, prev_weights['D3_VolScale'], TRANSACTION_COST)
-    results['D3_VolScale']['returns'].append(ret)
-    results['D3_VolScale']['cumulative'] *= (1 + ret)
-    results['D3_VolScale']['cumulative_series'].append(results['D3_VolScale']['cumulative'])
-    results['D3_VolScale']['turnovers'].append(turnover)
-    results['D3_VolScale']['scale_factors'].append(d3_scale)
-    prev_weights['D3_VolScale'] = d3_weights.copy()
-    
-    # 防御型TOP5_VolScale
-    ret, turnover = calc_monthly_return_volscale_with_cost(def5_selected, def5_weights, start_idx, end_idx, def5_scale, prev_weights['防御型TOP5_VolScale'], TRANSACTION_COST)
-    results['防御型TOP5_VolScale']['returns'].append(ret)
-    results['防御型TOP5_VolScale']['cumulative'] *= (1 + ret)
-    results['防御型TOP5_VolScale']['cumulative_series'].append(results['防御型TOP5_VolScale']['cumulative'])
-    results['防御型TOP5_VolScale']['turnovers'].append(turnover)
-    results['防御型TOP5_VolScale']['scale_factors'].append(def5_scale)
-    prev_weights['防御型TOP5_VolScale'] = def5_weights.copy()
-    
-    # 防御型TOP3_VolScale
-    ret, turnover = calc_monthly_return_volscale_with_cost(def3_selected, def3_weights, start_idx, end_idx, def3_scale, prev_weights['防御型TOP3_VolScale'], TRANSACTION_COST)
-    results['防御型TOP3_VolScale']['returns'].append(ret)
-    results['防御型TOP3_VolScale']['cumulative'] *= (1 + ret)
-    results['防御型TOP3_VolScale']['cumulative_series'].append(results['防御型TOP3_VolScale']['cumulative'])
-    results['防御型TOP3_VolScale']['turnovers'].append(turnover)
-    results['防御型TOP3_VolScale']['scale_factors'].append(def3_scale)
-    prev_weights['防御型TOP3_VolScale'] = def3_weights.copy()
-    
-    # D2+防御型_VolScale
-    if is_bull:
-        curr_weights = d2_weights.copy()
-        ret, turnover = calc_monthly_return_volscale_with_cost(d2_selected, d2_weights, start_idx, end_idx, d2_regime_scale, prev_weights['D2+防御型_VolScale'], TRANSACTION_COST)
-        results['D2+防御型_VolScale']['scale_factors'].append(d2_regime_scale)
-    else:
-        curr_weights = def3_weights.copy()
-        ret, turnover = calc_monthly_return_volscale_with_cost(def3_selected, def3_weights, start_idx, end_idx, def3_regime_scale_d2, prev_weights['D2+防御型_VolScale'], TRANSACTION_COST)
-        results['D2+防御型_VolScale']['scale_factors'].append(def3_regime_scale_d2)
-    results['D2+防御型_VolScale']['returns'].append(ret)
-    results['D2+防御型_VolScale']['cumulative'] *= (1 + ret)
-    results['D2+防御型_VolScale']['cumulative_series'].append(results['D2+防御型_VolScale']['cumulative'])
-    results['D2+防御型_VolScale']['turnovers'].append(turnover)
-    prev_weights['D2+防御型_VolScale'] = curr_weights
-    
-    # D3+防御型_VolScale
-    if is_bull:
-        curr_weights = d3_weights.copy()
-        ret, turnover = calc_monthly_return_volscale_with_cost(d3_selected, d3_weights, start_idx, end_idx, d3_regime_scale, prev_weights['D3+防御型_VolScale'], TRANSACTION_COST)
-        results['D3+防御型_VolScale']['scale_factors'].append(d3_regime_scale)
-    else:
-        curr_weights = def3_weights.copy()
-        ret, turnover = calc_monthly_return_volscale_with_cost(def3_selected, def3_weights, start_idx, end_idx, def3_regime_scale_d3, prev_weights['D3+防御型_VolScale'], TRANSACTION_COST)
-        results['D3+防御型_VolScale']['scale_factors'].append(def3_regime_scale_d3)
-    results['D3+防御型_VolScale']['returns'].append(ret)
-    results['D3+防御型_VolScale']['cumulative'] *= (1 + ret)
-    results['D3+防御型_VolScale']['cumulative_series'].append(results['D3+防御型_VolScale']['cumulative'])
-    results['D3+防御型_VolScale']['turnovers'].append(turnover)
-    prev_weights['D3+防御型_VolScale'] = curr_weights
-    
-    # 年次リターン集計
+for m, (i, month_start, _) in enumerate(evaluated_months):
     year = month_start.year
     for key in results.keys():
         if year not in yearly_returns[key]:
             yearly_returns[key][year] = 1.0
-        yearly_returns[key][year] *= (1 + results[key]['returns'][-1])
+        yearly_returns[key][year] *= (1 + results[key]['returns'][m])
     
-    # 進捗表示
+    # 推移表示（24ヶ月ごと）
     if (i + 1) % 24 == 0:
-        print(f"  {month_start.strftime('%Y-%m')}: D3={results['D3']['cumulative']*100-100:.0f}%, "
-              f"D3_VolScale={results['D3_VolScale']['cumulative']*100-100:.0f}%")
+        print(f"  {month_start.strftime('%Y-%m')}: D3={results['D3']['cumulative_series'][m]*100-100:.0f}%, "
+              f"D3_VolScale={results['D3_VolScale']['cumulative_series'][m]*100-100:.0f}%")
 
 print()
 print("=" * 80)
 print("シミュレーション完了")
+print(f"選択キャッシュ: 計算 {selections.misses}回 / 再利用 {selections.hits}回")
 print()
 
 # =============================================================================
@@ -916,6 +410,9 @@ for i in range(1, len(regimes_list)):
             'to': regimes_list[i]
         })
 
+# 全精度の月次系列（リターン・ターンオーバー・スケール等）はサイドカーに保存し、JSONは要約・チャート用
+sidecar_path = '/home/ubuntu/portfolio-advisor/analysis/grail.feather'
+
 output = {
     'metadata': {
         'generated_at': datetime.now().isoformat(),
@@ -955,7 +452,12 @@ output = {
                 'maxdd_underestimation': '約14%'
             },
             'conservative_adjustment': survivorship_adjustment
-        }
+        },
+        'sidecar': {
+            'file': os.path.basename(sidecar_path),
+            'format': 'feather',
+            'format_version': SIDECAR_FORMAT_VERSION,
+        },
     },
     'summary': summary_for_json,
     'yearly_returns': {k: {str(y): (v - 1) * 100 for y, v in yearly.items()} for k, yearly in yearly_returns.items()},
@@ -976,5 +478,8 @@ output_path = '/home/ubuntu/portfolio-advisor/analysis/grail.json'
 with open(output_path, 'w') as f:
     json.dump(output, f, indent=2, ensure_ascii=False)
 
+sidecar_layout = write_sidecar(sidecar_path, months_list, regimes_list, results)
+
 print()
 print(f"結果を {output_path} に保存しました")
+print(f"月次系列（全精度、{len(sidecar_layout['strategies'])}戦略 × {len(months_list)}ヶ月）を {sidecar_path} に保存しました")
@@ -0,0 +1,124 @@
+"""
+Numba JITカーネル（オプション）
+
+概要:
+    ホットパスの計算をNumbaでコンパイルしたループカーネルとして提供する。
+    Numbaがインストールされていれば各モジュールの関数が自動的にカーネルを使い、
+    インストールされていなければ従来のNumPy実装のまま動作する。
+
+    対象（NumPy実装 → カーネル）:
+        - signals.rolling_return_std → rolling_return_std（改善版Volの短期/長期成分）
+        - signals.momentum_cube → momentum（MomentumCubeの1期間分）
+        - selection.inverse_vol_weight_matrix → inverse_vol_weight_matrix（WEIGHT_CAP適用後に再正規化）
+        - engine.turnover_matrix → turnover_matrix（calc_turnoverのウェイト行列版）
+
+    NaNの扱い・ボラティリティフロア・ウェイト上限はNumPy実装と同じ規則。
+    ローリング標準偏差はNumPy版（累積和の差分）と異なり窓ごとの2パス計算のため、
+    一致は丸め誤差の範囲（それ以外のカーネルは同じ演算順序）。
+
+切り替え:
+    ENABLED = False にすると、Numbaがあっても全関数がNumPy実装を使う。
+
+等価性の検証:
+    $ python -m pytest test_kernels.py
+
+    ENABLED = False / True の両方で、各関数をベクトル化前の元実装
+    （calc_momentum / calc_volatility_improved / calc_turnover 等の要素ループ）と
+    比較する（相対誤差1e-12以内、NaNの位置は完全一致。Numba未インストールの場合は
+    カーネルをPythonのまま実行して同じ比較を行う）。
+"""
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+HAS_NUMBA = numba is not None
+
+# 各モジュールの関数がカーネルを使うか（Numbaがある場合のみ既定でTrue）
+ENABLED = HAS_NUMBA
+
+
+def _jit(func):
+    """Numbaがあればコンパイル（ゼロ除算はNumPyと同じくinf/NaN）、なければそのまま"""
+    if numba is None:
+        return func
+    return numba.njit(cache=True, error_model='numpy')(func)
+
+
+@_jit
+def rolling_return_std(returns, period, min_obs):
+    n_days, n_symbols = returns.shape
+    vol = np.full((n_days, n_symbols), np.nan)
+    annualize = np.sqrt(252.0)
+    for j in range(n_symbols):
+        for t in range(period, n_days):
+            n = 0
+            total = 0.0
+            has_inf = False
+            for i in range(t - period + 1, t + 1):
+                r = returns[i, j]
+                if np.isnan(r):
+                    continue
+                if np.isinf(r):
+                    has_inf = True
+                n += 1
+                total += r
+            if n == 0 or n < min_obs or has_inf:
+                continue
+            mean = total / n
+            squares = 0.0
+            for i in range(t - period + 1, t + 1):
+                r = returns[i, j]
+                if not np.isnan(r):
+                    squares += (r - mean) * (r - mean)
+            vol[t, j] = np.sqrt(squares / n) * annualize
+    return vol
+
+
+@_jit
+def momentum(close, horizon):
+    n_days, n_symbols = close.shape
+    mom = np.full((n_days, n_symbols), np.nan)
+    for t in range(horizon, n_days):
+        for j in range(n_symbols):
+            past = close[t - horizon, j]
+            if past > 0:
+                mom[t, j] = close[t, j] / past - 1
+    return mom
+
+
+@_jit
+def inverse_vol_weight_matrix(vols, weight_cap):
+    n_rows, k = vols.shape
+    weights = np.empty((n_rows, k))
+    for m in range(n_rows):
+        inv_total = 0.0
+        for i in range(k):
+            inv_total += 1 / vols[m, i]
+        total = 0.0
+        for i in range(k):
+            w = (1 / vols[m, i]) / inv_total
+            if w > weight_cap:
+                w = weight_cap
+            weights[m, i] = w
+            total += w
+        for i in range(k):
+            weights[m, i] = weights[m, i] / total
+    return weights
+
+
+@_jit
+def turnover_matrix(weights):
+    n_rows, n_symbols = weights.shape
+    turnovers = np.empty(n_rows)
+    for m in range(n_rows):
+        total = 0.0
+        for j in range(n_symbols):
+            prev = weights[m - 1, j] if m > 0 else 0.0
+            total += abs(weights[m, j] - prev)
+        turnovers[m] = total / 2
+    return turnovers
+
@@ -0,0 +1,190 @@
+"""
+CSCV/PBO（過剰最適化リスク）の一括計算
+
+概要:
+    CSCV（Combinatorially Symmetric Cross-Validation）は月次リターンを
+    n_blocks個のブロックに分け、半分を訓練・残りをテストとする
+    C(n_blocks, n_blocks/2) 通りの分割それぞれでSharpeを比較する。
+
+    分割ごとにブロックを連結して標準偏差を計算する代わりに、
+    ブロックごとの十分統計量（件数・合計・二乗和）を1回だけ求め、
+    (分割数 × ブロック数) の0/1行列との行列積で全分割の訓練/テストの
+    件数・合計・二乗和を一度に得る。1分割あたりの計算はブロック数に比例し、
+    n_blocks=20（184,756分割）も実用的な時間で計算できる。
+
+複数設定のPBO:
+    cscv_pbo_matrixは (設定数 × 月数) のリターン行列を受け取り、
+    Bailey / López de Prado のロジット順位法を全分割に適用する。
+    各分割で訓練Sharpe最大の設定を選び、テストSharpeでの相対順位
+    ω = 順位 / (設定数 + 1) のロジット λ = ln(ω / (1 - ω)) を求め、
+    PBO = P(λ <= 0)（訓練最良の設定がテストで中央値以下になる確率）とする。
+
+精度:
+    二乗和の桁落ちを避けるため、十分統計量は全期間平均を引いた値で計算する
+    （分散は平行移動に不変）。
+
+使用例:
+    >>> cscv_pbo(returns, spy_returns, n_blocks=16)['pbo']
+    >>> cscv_pbo_matrix(returns_matrix(param_outputs, 'D3'))['pbo']  # 設定 × 月数
+"""
+
+from itertools import combinations
+
+import numpy as np
+from scipy import stats
+
+from windows import sharpe_from_sums
+
+
+def cscv_split_matrix(n_blocks):
+    """
+    CSCVの全分割（訓練側）を表す0/1行列
+
+    Args:
+        n_blocks (int): ブロック数（偶数）
+
+    Returns:
+        np.ndarray: 訓練ブロック=1（C(n_blocks, n_blocks/2) × n_blocks、
+            行の順序は itertools.combinations(range(n_blocks), n_blocks // 2) と同じ）
+    """
+    train_idx = np.array(list(combinations(range(n_blocks), n_blocks // 2)))
+    split = np.zeros((len(train_idx), n_blocks))
+    split[np.arange(len(train_idx))[:, None], train_idx] = 1.0
+    return split
+
+
+def block_statistics(values, n_blocks):
+    """
+    ブロックごとの十分統計量
+
+    Args:
+        values (np.ndarray): 月次リターン（長さn、または 系列数×n）
+        n_blocks (int): ブロック数（各ブロック n // n_blocks ヶ月、余りは最終ブロック）
+
+    Returns:
+        tuple: (count, total, squares, shift)
+            - count: ブロックの件数（n_blocks）
+            - total / squares: ブロックの (値 - shift) の合計 / 二乗和（... × n_blocks）
+            - shift: 全期間平均（...）
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = values.shape[-1]
+    block_size = n // n_blocks
+    starts = np.arange(n_blocks) * block_size
+    shift = np.mean(values, axis=-1, keepdims=True)
+    centered = values - shift
+    count = np.diff(np.append(starts, n)).astype(np.float64)
+    total = np.add.reduceat(centered, starts, axis=-1)
+    squares = np.add.reduceat(centered * centered, starts, axis=-1)
+    return count, total, squares, shift[..., 0]
+
+
+def split_sharpes(split, count, total, squares, shift):
+    """
+    全分割のSharpe比（年率、不偏標準偏差）
+
+    Args:
+        split (np.ndarray): 対象ブロック=1の0/1行列（分割数 × n_blocks）
+        count / total / squares / shift: block_statisticsの出力
+
+    Returns:
+        np.ndarray: Sharpe（... × 分割数、標準偏差0の分割は0、windows.sharpe_from_sums）
+    """
+    return sharpe_from_sums(total @ split.T, squares @ split.T, split @ count, shift[..., None])
+
+
+def cscv_pbo(returns, benchmark_returns, n_blocks=16):
+    """
+    CSCV/PBOの簡易版（単一系列の対ベンチマーク超過リターン）
+
+    Args:
+        returns (list): 月次リターン
+        benchmark_returns (list): ベンチマークの月次リターン
+        n_blocks (int): ブロック数
+
+    Returns:
+        dict: n_combinations / pbo / rank_correlation / median_test_sharpe
+            （1ブロックが2ヶ月未満の場合はNone）
+
+    Note:
+        - 訓練Sharpe上位10%の分割のうち、テストSharpeが全分割の中央値以下の割合をPBOとする
+        - 訓練Sharpeの同順位は分割の列挙順（安定ソート）
+    """
+    n = min(len(returns), len(benchmark_returns))
+    if n // n_blocks < 2:
+        return None
+    excess = np.array(returns[:n]) - np.array(benchmark_returns[:n])
+
+    split = cscv_split_matrix(n_blocks)
+    block_stats = block_statistics(excess, n_blocks)
+    train_sharpes = split_sharpes(split, *block_stats)
+    test_sharpes = split_sharpes(1.0 - split, *block_stats)
+
+    median_test_sharpe = np.median(test_sharpes)
+    n_top = max(1, len(split) // 10)
+    top = np.argsort(-train_sharpes, kind='stable')[:n_top]
+    pbo = np.sum(test_sharpes[top] <= median_test_sharpe) / n_top
+    rank_correlation = stats.spearmanr(train_sharpes, test_sharpes)[0]
+
+    return {
+        'n_combinations': len(split),
+        'pbo': float(pbo),
+        'rank_correlation': float(rank_correlation),
+        'median_test_sharpe': float(median_test_sharpe)
+    }
+
+
+def cscv_pbo_matrix(returns, n_blocks=16):
+    """
+    複数設定のCSCV/PBO（ロジット順位法）
+
+    Args:
+        returns (np.ndarray): 月次リターン（設定数 × 月数、同じ月に揃えたもの）
+        n_blocks (int): ブロック数
+
+    Returns:
+        dict: 結果（1ブロックが2ヶ月未満、または設定数が2未満の場合はNone）
+            - n_configurations / n_combinations
+            - pbo: λ <= 0 となる分割の割合
+            - logit_mean / logit_std: λの平均 / 標準偏差
+            - prob_oos_loss: 訓練最良の設定のテストSharpeが0未満となる割合
+            - is_sharpe_mean / oos_sharpe_mean: 訓練最良の設定の訓練 / テストSharpe平均
+            - degradation_slope / degradation_intercept: テストSharpe = a × 訓練Sharpe + b の回帰係数
+            - selection_frequency: 各設定が訓練最良に選ばれた割合（設定の順）
+
+    Note:
+        テストSharpeの同順位は平均順位、訓練Sharpeの同値は先頭の設定を選ぶ
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    n_configs, n = returns.shape
+    if n // n_blocks < 2 or n_configs < 2:
+        return None
+
+    split = cscv_split_matrix(n_blocks)
+    block_stats = block_statistics(returns, n_blocks)
+    train_sharpes = split_sharpes(split, *block_stats)        # 設定 × 分割
+    test_sharpes = split_sharpes(1.0 - split, *block_stats)
+
+    columns = np.arange(len(split))
+    best = np.argmax(train_sharpes, axis=0)
+    is_sharpe = train_sharpes[best, columns]
+    oos_sharpe = test_sharpes[best, columns]
+    rank = (np.sum(test_sharpes < oos_sharpe, axis=0)
+            + (np.sum(test_sharpes == oos_sharpe, axis=0) + 1) / 2)
+    omega = rank / (n_configs + 1)
+    logits = np.log(omega / (1 - omega))
+    slope, intercept = np.polyfit(is_sharpe, oos_sharpe, 1)
+
+    return {
+        'n_configurations': n_configs,
+        'n_combinations': len(split),
+        'pbo': float(np.mean(logits <= 0)),
+        'logit_mean': float(np.mean(logits)),
+        'logit_std': float(np.std(logits)),
+        'prob_oos_loss': float(np.mean(oos_sharpe < 0)),
+        'is_sharpe_mean': float(np.mean(is_sharpe)),
+        'oos_sharpe_mean': float(np.mean(oos_sharpe)),
+        'degradation_slope': float(slope),
+        'degradation_intercept': float(intercept),
+        'selection_frequency': (np.bincount(best, minlength=n_configs) / len(split)).tolist(),
+    }
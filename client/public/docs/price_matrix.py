@@ -0,0 +1,335 @@
+"""
+価格マトリクス（日数×銘柄数）
+
+概要:
+    holygrail.parquetの終値（{symbol}_Close）を、日数×銘柄数の
+    連続したfloat64行列として一度だけ構築する共通データ層。
+    grail.py / robust.py の全計算関数はこの行列を参照する。
+
+構成:
+    - close: 終値行列（T×N、float64、C連続）
+    - symbols: 列順の銘柄シンボル（ソート済みで安定）
+    - column: {symbol: 列番号} の安定したインデックス
+
+列射影:
+    parquetスキーマから必要な '{symbol}_Close' 列だけを選んで読み込み、
+    Open/High/Low/Volume/Adj Close 等の列はディスクから読まない。
+    symbolsを指定すれば（例: 防御型ETF 13種のみ）さらに列を絞れる。
+    読み込み/スキップしたバイト数はPriceMatrix.io_reportに記録される。
+
+キャッシュ:
+    load_price_matrix(path, cache_dir) は終値行列・日付・銘柄リストを
+    .npyファイルとしてcache_dirに書き出し、2回目以降はnp.load(mmap_mode='r')で
+    ゼロコピーに開く。キーはparquetのサイズ・mtime・内容ハッシュ(SHA-256)で、
+    サイズ/mtimeが一致すればハッシュ計算も省略する。
+    サイズ/mtimeが変わっても内容ハッシュが同じなら再構築しない。
+
+使用例:
+    >>> prices = load_price_matrix(PARQUET_PATH, cache_dir=CACHE_DIR)
+    >>> cols = prices.cols(['AAPL', 'MSFT'])
+    >>> prices.close[idx, cols]
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+# キャッシュ形式のバージョン（形式変更時にインクリメントして旧キャッシュを無効化）
+CACHE_FORMAT_VERSION = 1
+
+
+def close_symbols(columns):
+    """
+    列名リストから終値列を持つ銘柄シンボルを抽出
+
+    Args:
+        columns (list): DataFrameまたはparquetスキーマの列名
+
+    Returns:
+        list: ソート済み銘柄シンボル（'{symbol}_Close' 列が存在するもの）
+
+    Note:
+        'Adj' を含む列（Adj Close）は除外
+    """
+    names = set(columns)
+    candidates = set(c.split('_')[0] for c in columns if '_Close' in c and 'Adj' not in c)
+    return sorted(s for s in candidates if f'{s}_Close' in names)
+
+
+def read_close_frame(path, symbols=None):
+    """
+    parquetから必要な終値列のみを読み込み（列射影）
+
+    Args:
+        path (str): holygrail.parquetのパス
+        symbols (list): 読み込む銘柄（Noneの場合は全銘柄の終値列）
+
+    Returns:
+        tuple: (df, io_report)
+            - df (pd.DataFrame): '{symbol}_Close' 列のみのDataFrame（日付インデックス付き）
+            - io_report (dict): 列射影レポート
+                - columns_read / columns_total: 読み込んだ列数 / 全列数
+                - bytes_read / bytes_skipped: 読み込んだ / スキップした列チャンクの圧縮後バイト数
+
+    Note:
+        バイト数はparquetメタデータの列チャンクサイズ（total_compressed_size）の合計
+    """
+    parquet_file = pq.ParquetFile(path)
+    names = parquet_file.schema_arrow.names
+    available = close_symbols(names)
+    if symbols is not None:
+        requested = set(symbols)
+        available = [s for s in available if s in requested]
+    columns = [f'{s}_Close' for s in available]
+
+    # インデックス列（日付）はpandasメタデータから取得して読み込み対象に含める
+    pandas_metadata = parquet_file.schema_arrow.pandas_metadata or {}
+    index_columns = [c for c in pandas_metadata.get('index_columns', []) if isinstance(c, str)]
+    needed = set(columns) | set(index_columns)
+
+    metadata = parquet_file.metadata
+    bytes_read = 0
+    bytes_skipped = 0
+    for rg in range(metadata.num_row_groups):
+        row_group = metadata.row_group(rg)
+        for c in range(row_group.num_columns):
+            chunk = row_group.column(c)
+            if chunk.path_in_schema in needed:
+                bytes_read += chunk.total_compressed_size
+            else:
+                bytes_skipped += chunk.total_compressed_size
+
+    df = pd.read_parquet(path, columns=columns)
+    io_report = {
+        'columns_read': len(columns),
+        'columns_total': len(names),
+        'bytes_read': bytes_read,
+        'bytes_skipped': bytes_skipped,
+    }
+    return df, io_report
+
+
+class PriceMatrix:
+    """
+    終値マトリクス
+
+    Attributes:
+        dates (pd.DatetimeIndex): 日付インデックス（長さT）
+        symbols (list): 列順の銘柄シンボル（長さN）
+        close (np.ndarray): 終値行列（T×N、float64）
+        column (dict): {symbol: 列番号}
+    """
+
+    def __init__(self, dates, symbols, close, fingerprint=None, cache_status=None, io_report=None):
+        self.dates = pd.DatetimeIndex(dates)
+        self.symbols = list(symbols)
+        self.close = close
+        self.column = {s: i for i, s in enumerate(self.symbols)}
+        # 元parquetの内容ハッシュ（キャッシュ経由で読み込んだ場合のみ）
+        self.fingerprint = fingerprint
+        # キャッシュ状態: 'hit' / 'rehashed' / 'rebuilt' / None（キャッシュ未使用）
+        self.cache_status = cache_status
+        # parquet読み込み時の列射影レポート（read_close_frameの戻り値、キャッシュヒット時はNone）
+        self.io_report = io_report
+
+    @classmethod
+    def from_frame(cls, df):
+        """
+        ワイド形式のDataFrameから構築
+
+        Args:
+            df (pd.DataFrame): '{symbol}_Close' 列を含む日次価格データ
+
+        Returns:
+            PriceMatrix: 終値マトリクス
+        """
+        symbols = close_symbols(df.columns)
+        close = np.ascontiguousarray(
+            df[[f'{s}_Close' for s in symbols]].to_numpy(dtype=np.float64)
+        )
+        return cls(df.index, symbols, close)
+
+    @property
+    def n_days(self):
+        return self.close.shape[0]
+
+    @property
+    def n_symbols(self):
+        return self.close.shape[1]
+
+    def month_starts(self):
+        """
+        各月の最初の営業日のインデックス
+
+        Returns:
+            list: [(first_idx, timestamp), ...] 月順
+        """
+        periods = self.dates.to_period('M').asi8
+        first = np.flatnonzero(np.r_[True, periods[1:] != periods[:-1]])
+        return [(int(i), self.dates[i]) for i in first]
+
+    def __contains__(self, symbol):
+        return symbol in self.column
+
+    def cols(self, symbols):
+        """
+        銘柄リストを列番号配列に変換（存在しない銘柄は除外、順序は保持）
+
+        Args:
+            symbols (list): 銘柄シンボルのリスト
+
+        Returns:
+            np.ndarray: 列番号（int64）
+        """
+        return np.array([self.column[s] for s in symbols if s in self.column], dtype=np.int64)
+
+    def series(self, symbol):
+        """
+        単一銘柄の終値系列（存在しない場合は全てNaN）
+
+        Args:
+            symbol (str): 銘柄シンボル
+
+        Returns:
+            np.ndarray: 終値（長さT）
+        """
+        if symbol not in self.column:
+            return np.full(self.n_days, np.nan)
+        return self.close[:, self.column[symbol]]
+
+
+# =============================================================================
+# メモリマップキャッシュ
+# =============================================================================
+
+def content_hash(path, chunk_size=1 << 20):
+    """
+    ファイル内容のSHA-256ハッシュ
+
+    Args:
+        path (str): ファイルパス
+        chunk_size (int): 読み込みチャンクサイズ（バイト）
+
+    Returns:
+        str: 16進ダイジェスト
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, 'manifest.json'), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('format_version') != CACHE_FORMAT_VERSION:
+        return None
+    for name in ('close.npy', 'dates.npy'):
+        if not os.path.exists(os.path.join(cache_dir, name)):
+            return None
+    return manifest
+
+
+def _write_atomic(path, write):
+    tmp_path = f'{path}.tmp{os.getpid()}'
+    with open(tmp_path, 'wb') as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def _write_manifest(cache_dir, manifest):
+    payload = json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8')
+    _write_atomic(os.path.join(cache_dir, 'manifest.json'), lambda f: f.write(payload))
+
+
+def _open_cache(cache_dir, manifest, status, io_report=None):
+    close = np.load(os.path.join(cache_dir, 'close.npy'), mmap_mode='r')
+    dates = np.load(os.path.join(cache_dir, 'dates.npy'))
+    return PriceMatrix(dates, manifest['symbols'], close,
+                       fingerprint=manifest['sha256'], cache_status=status, io_report=io_report)
+
+
+def _load_projected(path, symbols):
+    df, io_report = read_close_frame(path, symbols)
+    prices = PriceMatrix.from_frame(df)
+    prices.io_report = io_report
+    return prices
+
+
+def load_price_matrix(path, cache_dir=None, symbols=None):
+    """
+    parquetから終値マトリクスを読み込み（列射影 + メモリマップキャッシュ付き）
+
+    Args:
+        path (str): holygrail.parquetのパス
+        cache_dir (str): キャッシュディレクトリ（Noneの場合はキャッシュ未使用）
+        symbols (list): 読み込む銘柄（Noneの場合は全銘柄の終値列）
+
+    Returns:
+        PriceMatrix: 終値マトリクス（キャッシュ使用時のcloseは読み取り専用memmap）
+
+    Note:
+        - サイズ・mtimeが前回と一致: ハッシュ計算なしでキャッシュを開く（'hit'）
+        - 内容ハッシュが前回と一致: マニフェストのみ更新（'rehashed'）
+        - それ以外: parquetを読み込んでキャッシュを再構築（'rebuilt'）
+        - マニフェストは最後に書き込むため、書き込み途中のキャッシュは使われない
+        - symbols指定時は銘柄集合ごとに別のサブディレクトリへキャッシュ
+    """
+    if cache_dir is None:
+        return _load_projected(path, symbols)
+
+    if symbols is not None:
+        key = hashlib.sha256('\n'.join(sorted(set(symbols))).encode('utf-8')).hexdigest()[:16]
+        cache_dir = os.path.join(cache_dir, f'subset-{key}')
+
+    stat = os.stat(path)
+    manifest = _read_manifest(cache_dir)
+    if manifest and manifest['size'] == stat.st_size and manifest['mtime_ns'] == stat.st_mtime_ns:
+        return _open_cache(cache_dir, manifest, 'hit')
+
+    digest = content_hash(path)
+    if manifest and manifest['sha256'] == digest:
+        manifest.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        _write_manifest(cache_dir, manifest)
+        return _open_cache(cache_dir, manifest, 'rehashed')
+
+    prices = _load_projected(path, symbols)
+    os.makedirs(cache_dir, exist_ok=True)
+    _write_atomic(os.path.join(cache_dir, 'close.npy'), lambda f: np.save(f, prices.close))
+    _write_atomic(os.path.join(cache_dir, 'dates.npy'),
+                  lambda f: np.save(f, prices.dates.values.astype('datetime64[ns]')))
+    manifest = {
+        'format_version': CACHE_FORMAT_VERSION,
+        'source': os.path.abspath(path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': digest,
+        'symbols': prices.symbols,
+    }
+    _write_manifest(cache_dir, manifest)
+    return _open_cache(cache_dir, manifest, 'rebuilt', prices.io_report)
+
+
+def format_io_report(io_report):
+    """
+    列射影レポートを表示用文字列に整形
+
+    Args:
+        io_report (dict): read_close_frameの列射影レポート
+
+    Returns:
+        str: 例 '列 92/631, 読込 2.4MB / スキップ 14.1MB (85.5%)'
+    """
+    total = io_report['bytes_read'] + io_report['bytes_skipped']
+    skipped_ratio = io_report['bytes_skipped'] / total if total > 0 else 0
+    return (f"列 {io_report['columns_read']}/{io_report['columns_total']}, "
+            f"読込 {io_report['bytes_read'] / 1e6:.1f}MB / "
+            f"スキップ {io_report['bytes_skipped'] / 1e6:.1f}MB ({skipped_ratio:.1%})")
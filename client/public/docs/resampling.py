@@ -0,0 +1,206 @@
+"""
+リサンプリング検定の一括計算（ブロックブートストラップ・符号反転モンテカルロ）
+
+概要:
+    robust.pyのテスト5が1標本ずつPythonループで組み立てていた
+    ブロックブートストラップを、(リサンプル数×月数) のインデックス行列として
+    一括生成し、指標（Sharpe/MaxDD/CAGR/Sortino/Calmar）を axis=1 方向に
+    全リサンプル同時に計算する。
+
+    メモリはリサンプル数×月数×8バイト×数倍になるため、
+    インデックス行列はchunk_size行ずつ展開して評価する
+    （ブロック開始位置の乱数は最初に全リサンプル分を一度に生成）。
+
+    符号反転モンテカルロ（テスト10）は、(シミュレーション数×月数) の±1行列を
+    chunk_size行ずつ生成し、超過リターン行列（月数×戦略数）との行列積で
+    全戦略のシミュレーション平均を一度に求める。
+
+乱数:
+    np.random.seed(seed) → np.random.randint(0, n - block_size + 1, (n_bootstrap, n_blocks))
+    は、1標本ずつ randint を呼ぶ従来実装と同じ乱数列を行優先で消費するため、
+    同じseedなら従来実装と同じブートストラップ標本になる。
+    符号行列 np.random.choice([-1, 1], (chunk, n)) も同様に、1回ずつ
+    np.random.choice([-1, 1], n) を呼ぶ従来実装と同じ符号列になる。
+
+使用例:
+    >>> stats = block_bootstrap(returns, n_bootstrap=100000)
+    >>> stats['sharpe_ci_lower'], stats['sharpe_ci_upper']
+    >>> metrics = metrics_matrix(returns_matrix)  # 各行のcalc_metrics
+    >>> sign_flip_test(excess_matrix, n_simulations=1000000)['p_value']
+"""
+
+import numpy as np
+
+
+def metrics_matrix(returns):
+    """
+    calc_metricsの行ごとの一括版
+
+    Args:
+        returns (np.ndarray): 月次リターン（... × 月数、最終軸が時系列）
+
+    Returns:
+        dict: cumulative / cagr / max_dd / sharpe / sortino / calmar（各 ... の形状）
+
+    Note:
+        calc_metricsと同じ規則:
+        - Sharpe: 年率平均 / 年率標準偏差（標準偏差0の場合は0）
+        - Sortino: 負のリターンのみの標準偏差（負のリターンがない場合は0.001）
+        - Calmar: CAGR / |MaxDD|（MaxDD=0の場合は0）
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    n = returns.shape[-1]
+
+    growth = np.cumprod(1 + returns, axis=-1)
+    cumulative = growth[..., -1] - 1
+    years = n / 12
+    cagr = (1 + cumulative) ** (1 / years) - 1
+    max_dd = np.min(growth / np.maximum.accumulate(growth, axis=-1) - 1, axis=-1)
+
+    mean_ret = np.mean(returns, axis=-1) * 12
+    std_ret = np.std(returns, axis=-1) * np.sqrt(12)
+
+    negative = returns < 0
+    n_neg = negative.sum(axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(std_ret > 0, mean_ret / std_ret, 0.0)
+        neg_mean = np.where(negative, returns, 0.0).sum(axis=-1) / n_neg
+        neg_var = np.where(negative, returns - neg_mean[..., None], 0.0) ** 2
+        downside_std = np.where(
+            n_neg > 0, np.sqrt(neg_var.sum(axis=-1) / n_neg) * np.sqrt(12), 0.001
+        )
+        sortino = np.where(downside_std > 0, mean_ret / downside_std, 0.0)
+        calmar = np.where(max_dd < 0, cagr / np.abs(max_dd), 0.0)
+
+    return {
+        'cumulative': cumulative,
+        'cagr': cagr,
+        'max_dd': max_dd,
+        'sharpe': sharpe,
+        'sortino': sortino,
+        'calmar': calmar,
+    }
+
+
+def block_bootstrap_starts(n, n_bootstrap, block_size, seed=42):
+    """
+    全リサンプルのブロック開始位置
+
+    Args:
+        n (int): 月数
+        n_bootstrap (int): リサンプル数
+        block_size (int): ブロックサイズ（月数）
+        seed (int): 乱数シード（np.random.seed）
+
+    Returns:
+        np.ndarray: 開始位置（n_bootstrap × ceil(n / block_size)）
+    """
+    np.random.seed(seed)
+    n_blocks = int(np.ceil(n / block_size))
+    return np.random.randint(0, n - block_size + 1, size=(n_bootstrap, n_blocks))
+
+
+def block_bootstrap_indices(starts, n, block_size):
+    """
+    ブロック開始位置から (リサンプル数 × 月数) のインデックス行列を展開
+
+    Args:
+        starts (np.ndarray): ブロック開始位置（B × ブロック数）
+        n (int): 月数
+        block_size (int): ブロックサイズ（月数）
+
+    Returns:
+        np.ndarray: インデックス（B × n、各ブロックを連結して先頭n個）
+    """
+    blocks = starts[:, :, None] + np.arange(block_size)
+    return blocks.reshape(len(starts), -1)[:, :n]
+
+
+def block_bootstrap(returns, n_bootstrap=1000, block_size=12, seed=42, chunk_size=10000):
+    """
+    ブロックブートストラップでSharpe/MaxDD等の分布を推定（一括計算）
+
+    Args:
+        returns (np.ndarray): 月次リターン（長さn、または 系列数×n）
+        n_bootstrap (int): リサンプル数
+        block_size (int): ブロックサイズ（月数）
+        seed (int): 乱数シード（全系列で同じブロック開始位置を使う）
+        chunk_size (int): 一度に評価するリサンプル数（メモリ上限）
+
+    Returns:
+        dict: 分布の要約（2次元入力の場合は系列ごとのdictのリスト）
+            - sharpe_mean / sharpe_std / sharpe_ci_lower / sharpe_ci_upper
+            - max_dd_mean / max_dd_ci_lower / max_dd_ci_upper
+            - prob_sharpe_gt_1: P(Sharpe > 1)
+            - cagr_mean / cagr_ci_lower / cagr_ci_upper
+            - sortino_mean / calmar_mean
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    single = returns.ndim == 1
+    series = returns[None, :] if single else returns
+    n = series.shape[1]
+
+    starts = block_bootstrap_starts(n, n_bootstrap, block_size, seed)
+    samples = {name: np.empty((len(series), n_bootstrap)) for name in ('sharpe', 'max_dd', 'cagr', 'sortino', 'calmar')}
+    for lo in range(0, n_bootstrap, chunk_size):
+        idx = block_bootstrap_indices(starts[lo:lo + chunk_size], n, block_size)
+        for s, values in enumerate(series):
+            metrics = metrics_matrix(values[idx])
+            for name, out in samples.items():
+                out[s, lo:lo + len(idx)] = metrics[name]
+
+    sharpe, max_dd, cagr = samples['sharpe'], samples['max_dd'], samples['cagr']
+    summary = {
+        'sharpe_mean': np.mean(sharpe, axis=1),
+        'sharpe_std': np.std(sharpe, axis=1),
+        'sharpe_ci_lower': np.percentile(sharpe, 2.5, axis=1),
+        'sharpe_ci_upper': np.percentile(sharpe, 97.5, axis=1),
+        'max_dd_mean': np.mean(max_dd, axis=1),
+        'max_dd_ci_lower': np.percentile(max_dd, 2.5, axis=1),
+        'max_dd_ci_upper': np.percentile(max_dd, 97.5, axis=1),
+        'prob_sharpe_gt_1': np.mean(sharpe > 1.0, axis=1),
+        'cagr_mean': np.mean(cagr, axis=1),
+        'cagr_ci_lower': np.percentile(cagr, 2.5, axis=1),
+        'cagr_ci_upper': np.percentile(cagr, 97.5, axis=1),
+        'sortino_mean': np.mean(samples['sortino'], axis=1),
+        'calmar_mean': np.mean(samples['calmar'], axis=1),
+    }
+    results = [{key: values[s] for key, values in summary.items()} for s in range(len(series))]
+    return results[0] if single else results
+
+
+def sign_flip_test(excess, n_simulations=10000, seed=42, chunk_size=10000):
+    """
+    符号反転モンテカルロ検定（超過リターンの平均 > 0 の片側検定、一括計算）
+
+    Args:
+        excess (np.ndarray): 超過リターン（長さn、または 系列数×n）
+        n_simulations (int): シミュレーション数
+        seed (int): 乱数シード（全系列で同じ符号行列を使う）
+        chunk_size (int): 一度に生成する符号行列の行数（メモリ上限）
+
+    Returns:
+        dict: 各系列の検定結果（2次元入力の場合は長さ=系列数の配列）
+            - observed_mean: 実際の超過リターン平均
+            - p_value: 符号をランダムに反転した平均が実際の平均以上となる割合
+
+    Note:
+        シミュレーション平均 = 符号行列（chunk×n） @ 超過リターン（n×系列数） / n
+    """
+    excess = np.asarray(excess, dtype=np.float64)
+    single = excess.ndim == 1
+    series = excess[None, :] if single else excess
+    n = series.shape[1]
+
+    observed = np.mean(series, axis=1)
+    exceed = np.zeros(len(series), dtype=np.int64)
+    np.random.seed(seed)
+    for lo in range(0, n_simulations, chunk_size):
+        signs = np.random.choice([-1, 1], size=(min(chunk_size, n_simulations - lo), n))
+        simulated = (signs @ series.T) / n
+        exceed += np.sum(simulated >= observed, axis=0)
+
+    p_value = exceed / n_simulations
+    if single:
+        return {'observed_mean': observed[0], 'p_value': p_value[0]}
+    return {'observed_mean': observed, 'p_value': p_value}
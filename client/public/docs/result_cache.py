@@ -0,0 +1,255 @@
+"""
+シミュレーション結果キャッシュ（内容アドレス方式、LRU削除）
+
+概要:
+    BacktestContext.run（全13戦略のシミュレーション）の結果を、
+    パラメータ・価格データ・コードから求めたSHA-256をキーにディスクへ保存する。
+    robust.pyを同じパラメータで再実行した場合、シミュレーションは
+    キャッシュの読み込み（.npz）だけになる。
+
+キー:
+    - パラメータ: momentum_period / top_n / transaction_cost / target_vol /
+      rebalance_offset / indices / bull_series（配列は dtype・形状・バイト列）
+    - 名前空間（SimulationCache作成時に1回だけ計算）:
+        - 価格データの指紋（PriceMatrix.fingerprint、なければ終値行列のハッシュ）
+        - コードのバージョン（SOURCE_MODULESのソースのハッシュ、kernels.ENABLED）
+        - BacktestContextの設定（ユニバース・Volパラメータ等）
+        - CACHE_FORMAT_VERSION
+    いずれかが変われば別のキーになるため、古い結果を誤って使うことはない。
+
+保存形式:
+    1エントリ = 1ファイル（{キー}.npz、pickleなし）。戦略名の配列と
+    '{戦略番号}:{系列名}' の配列を持ち、読み込み時にrunと同じ
+    {戦略名: {系列名: list}} に戻す（整数の系列は整数のまま）。
+    書き込みは一時ファイル → os.replace で、並行実行でも壊れたファイルを残さない。
+
+LRU削除:
+    ヒット時にファイルのmtimeを更新し、保存後に合計サイズがmax_bytesを
+    超えていればmtimeの古い順に削除する。
+
+使用例:
+    >>> cache = SimulationCache(RESULT_CACHE_DIR, 256 * 1024**2,
+    ...                         namespace=simulation_namespace(prices, BACKTEST_SETTINGS))
+    >>> results = cache.get_or_run(context.run, momentum_period=126, top_n=5,
+    ...                            transaction_cost=0.002, target_vol=0.14)
+    >>> cache.report()  # 'ヒット 12回 / 計算 0回 / 削除 0件'
+"""
+
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+import kernels
+
+# キャッシュ形式のバージョン（保存形式・キー構成の変更時にインクリメント）
+CACHE_FORMAT_VERSION = 1
+
+# シミュレーション結果に影響するモジュール（ソースが変わればキーも変わる）
+SOURCE_MODULES = ['engine.py', 'selection.py', 'signals.py', 'kernels.py']
+
+
+def _update_digest(digest, value):
+    """値を型付きの正規形でハッシュに追加（dictはキー順、配列はdtype・形状・バイト列）"""
+    if isinstance(value, np.ndarray):
+        digest.update(f'ndarray:{value.dtype.str}:{value.shape}:'.encode('utf-8'))
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, dict):
+        digest.update(f'dict:{len(value)}:'.encode('utf-8'))
+        for key in sorted(value, key=str):
+            _update_digest(digest, str(key))
+            _update_digest(digest, value[key])
+    elif isinstance(value, (list, tuple)):
+        digest.update(f'{type(value).__name__}:{len(value)}:'.encode('utf-8'))
+        for item in value:
+            _update_digest(digest, item)
+    elif isinstance(value, np.generic):
+        _update_digest(digest, value.item())
+    else:
+        digest.update(f'{type(value).__name__}:{value!r};'.encode('utf-8'))
+
+
+def content_hash(value):
+    """
+    値の内容ハッシュ
+
+    Args:
+        value: dict / list / tuple / np.ndarray / スカラー（入れ子可）
+
+    Returns:
+        str: SHA-256（16進数）
+    """
+    digest = hashlib.sha256()
+    _update_digest(digest, value)
+    return digest.hexdigest()
+
+
+def code_version(modules=SOURCE_MODULES):
+    """
+    シミュレーションコードのバージョン（ソースファイルのハッシュ）
+
+    Args:
+        modules (list): 同ディレクトリのモジュールファイル名
+
+    Returns:
+        str: SHA-256（16進数、kernels.ENABLEDも含む）
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha256()
+    for module in modules:
+        with open(os.path.join(here, module), 'rb') as f:
+            digest.update(module.encode('utf-8') + b'\0' + f.read() + b'\0')
+    digest.update(f'kernels.ENABLED={kernels.ENABLED}'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def simulation_namespace(prices, settings):
+    """
+    キャッシュの名前空間（価格データ・コード・設定・形式バージョン）
+
+    Args:
+        prices (PriceMatrix): 価格マトリクス
+        settings (dict): BacktestContextの設定（robust.pyのBACKTEST_SETTINGS）
+
+    Returns:
+        str: SHA-256（16進数）
+    """
+    price_fingerprint = prices.fingerprint
+    if price_fingerprint is None:
+        price_fingerprint = content_hash({'close': prices.close, 'symbols': list(prices.symbols)})
+    return content_hash({
+        'format_version': CACHE_FORMAT_VERSION,
+        'prices': price_fingerprint,
+        'code': code_version(),
+        'settings': settings,
+    })
+
+
+class SimulationCache:
+    """
+    シミュレーション結果のディスクキャッシュ
+
+    Attributes:
+        cache_dir (str): 保存先ディレクトリ
+        max_bytes (int): 合計サイズの上限（超えた分はLRUで削除）
+        namespace (str): simulation_namespaceの値（キーの一部）
+        hits / misses / evictions (int): ヒット数 / 計算回数 / 削除件数
+    """
+
+    def __init__(self, cache_dir, max_bytes, namespace=''):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, **params):
+        """
+        パラメータのキャッシュキー
+
+        Args:
+            **params: runの引数（indices / bull_seriesを含む、Noneも区別）
+
+        Returns:
+            str: SHA-256（16進数）
+        """
+        return content_hash({'namespace': self.namespace, 'params': params})
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.npz')
+
+    def get(self, key):
+        """
+        キャッシュ済みの結果（ヒット時はLRU順を更新）
+
+        Args:
+            key (str): keyの戻り値
+
+        Returns:
+            dict: {戦略名: {系列名: list}}（ない場合はNone）
+        """
+        path = self._path(key)
+        try:
+            with np.load(path) as data:
+                names = data['strategies'].tolist()
+                results = {name: {} for name in names}
+                for entry in data.files:
+                    if entry == 'strategies':
+                        continue
+                    index, field = entry.split(':', 1)
+                    results[names[int(index)]][field] = data[entry].tolist()
+            os.utime(path)
+        except (FileNotFoundError, OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return results
+
+    def put(self, key, results):
+        """
+        結果を保存し、上限を超えた分をLRUで削除
+
+        Args:
+            key (str): keyの戻り値
+            results (dict): {戦略名: {系列名: list}}
+        """
+        arrays = {'strategies': np.array(list(results))}
+        for index, data in enumerate(results.values()):
+            for field, values in data.items():
+                arrays[f'{index}:{field}'] = np.asarray(values)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.evict()
+
+    def get_or_run(self, run, **params):
+        """
+        キャッシュにあれば読み込み、なければrun(**params)を実行して保存
+
+        Args:
+            run (callable): シミュレーション関数（BacktestContext.run等）
+            **params: runのキーワード引数（キーにも使う）
+
+        Returns:
+            dict: runの結果
+        """
+        key = self.key(**params)
+        results = self.get(key)
+        if results is None:
+            results = run(**params)
+            self.put(key, results)
+        return results
+
+    def evict(self):
+        """合計サイズがmax_bytes以下になるまで、最終使用（mtime）の古い順に削除"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.npz'):
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.evictions += 1
+
+    def report(self):
+        """ヒット・計算・削除の回数（表示用）"""
+        return f"ヒット {self.hits}回 / 計算 {self.misses}回 / 削除 {self.evictions}件"
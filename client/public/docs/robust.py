@@ -42,8 +42,22 @@
 依存ライブラリ:
     - numpy
     - pandas
+    - pyarrow（parquetの列射影読み込み）
     - scipy
     - json
+    - price_matrix.py（同ディレクトリ、終値マトリクス共通データ層）
+    - signals.py（同ディレクトリ、指標の一括事前計算）
+    - selection.py（同ディレクトリ、銘柄選択キャッシュ）
+    - engine.py（同ディレクトリ、戦略レジストリとシミュレーションエンジン）
+    - sweep.py（同ディレクトリ、fork方式のプロセスプールによるパラメータスイープ）
+    - tail.py（同ディレクトリ、テールリスク指標の一括計算）
+    - resampling.py（同ディレクトリ、ブートストラップ・モンテカルロ検定の一括計算）
+    - pbo.py（同ディレクトリ、CSCV/PBOの一括計算）
+    - windows.py（同ディレクトリ、Walk-Forward・ホールドアウトのローリング窓統計）
+    - series.py（同ディレクトリ、戦略ごとの月次リターン統計キャッシュ）
+    - result_cache.py（同ディレクトリ、シミュレーション結果のディスクキャッシュ）
+    - kernels.py（同ディレクトリ、Numba JITカーネル）
+    - numba（オプション、インストールされていればkernels.pyのカーネルを使用）
 
 作成者: Portfolio Advisor System
 バージョン: v2.0
@@ -58,10 +72,24 @@ from scipy import stats
 import warnings
 warnings.filterwarnings('ignore')
 
+from price_matrix import format_io_report, load_price_matrix
+from engine import BacktestContext
+from signals import regime_matrix
+from sweep import map_sweep, parameter_grid, returns_matrix, sweep_table
+from pbo import cscv_pbo, cscv_pbo_matrix
+from result_cache import SimulationCache, simulation_namespace
+from resampling import block_bootstrap, sign_flip_test
+from tail import tail_metrics
+from series import ReturnSeries, as_return_series
+from windows import holdout_matrix, walk_forward_grid, walk_forward_matrix, walk_forward_optimize
+
 # =============================================================================
 # パラメータ
 # =============================================================================
 MOMENTUM_PERIOD = 126  # 6ヶ月（デフォルト）
+MOMENTUM_HORIZONS = [63, 126, 189, 252]  # 3, 6, 9, 12ヶ月（テスト4の感度分析）
+REGIME_MA_PERIODS = [100, 150, 200, 250]   # レジーム判定ルール感度（テスト2b）
+REGIME_THRESHOLDS = [0.90, 0.95, 1.00]
 MA_PERIOD = 200
 REGIME_THRESHOLD = 0.95
 ATTACK_TOP_N = 5
@@ -79,10 +107,30 @@ WEIGHT_CAP = 0.40
 VOLSCALE_LOOKBACK = 21
 VOLSCALE_MIN = 0.5
 VOLSCALE_MAX = 1.5
+VOLSCALE_TARGET_GRID = np.round(np.arange(0.06, 0.2501, 0.01), 2)  # 目標Vol感度（6%〜25%）
+VOLSCALE_CLIP_GRID = [(0.5, 1.5), (0.5, 1.0), (0.25, 2.0), (0.5, 2.0)]  # (最小, 最大)スケール
 
 # 取引コスト（デフォルト）
 TRANSACTION_COST = 0.002
 
+# ブロックブートストラップ（テスト5）のリサンプル数（一括計算のため100,000でも実行可能）
+BOOTSTRAP_SAMPLES = 1000
+
+# モンテカルロ順列検定（テスト10）のシミュレーション数（符号行列の行列積で一括計算）
+MC_SIMULATIONS = 1000000
+
+# パラメータスイープ（テスト4/9）のワーカー数（Noneの場合はCPUコア数、1またはforkが使えない環境では順次実行）
+SWEEP_WORKERS = None
+
+# Walk-Forward分析（テスト14）の感応度: 訓練期間（年）× テスト期間（月数、ステップも同じ）
+WFA_TRAIN_YEARS = [3, 5, 7]
+WFA_TEST_MONTHS = [6, 12, 24]
+
+# Walk-Forward最適化（テスト14）: 訓練/テスト期間（月数）とVolScale戦略の目標Vol候補
+WFO_TRAIN_MONTHS = 36
+WFO_TEST_MONTHS = 6
+WFO_TARGET_VOLS = [0.10, 0.12, 0.14, 0.16, 0.18]
+
 # =============================================================================
 # データ読み込み
 # =============================================================================
@@ -92,260 +140,130 @@ print("=" * 80)
 print()
 
 PARQUET_PATH = '/home/ubuntu/portfolio-advisor/analysis/holygrail.parquet'
-df = pd.read_parquet(PARQUET_PATH)
-print(f"データ期間: {df.index.min()} 〜 {df.index.max()}")
+CACHE_DIR = '/home/ubuntu/portfolio-advisor/analysis/.holygrail_cache'
 
-# シンボルリスト
-close_cols = [c for c in df.columns if '_Close' in c and 'Adj' not in c]
-ALL_SYMBOLS = list(set([c.split('_')[0] for c in close_cols]))
+# シミュレーション結果キャッシュ（パラメータ・価格データ・コードのハッシュがキー、上限超過分はLRUで削除）
+RESULT_CACHE_DIR = '/home/ubuntu/portfolio-advisor/analysis/.simulation_cache'
+RESULT_CACHE_MAX_BYTES = 256 * 1024 ** 2
 
-DEFENSE_ETFS = ['GLD', 'EEM', 'IWM', 'QQQ', 'SPY', 'EFA', 'DBC', 'LQD', 'AGG', 'SHY', 'TLT', 'TIP', 'IYR']
+# 価格マトリクス（日数×銘柄数、grail.pyと共有のmemmapキャッシュ）
+prices = load_price_matrix(PARQUET_PATH, cache_dir=CACHE_DIR)
+print(f"データ期間: {prices.dates.min()} 〜 {prices.dates.max()}")
+print(f"価格キャッシュ: {prices.cache_status}")
+if prices.io_report:
+    print(f"列射影: {format_io_report(prices.io_report)}")
+close = prices.close
+ALL_SYMBOLS = prices.symbols
 
-sp500_symbols = [s for s in ALL_SYMBOLS if s not in DEFENSE_ETFS and f'{s}_Close' in df.columns]
+DEFENSE_ETFS = ['GLD', 'EEM', 'IWM', 'QQQ', 'SPY', 'EFA', 'DBC', 'LQD', 'AGG', 'SHY', 'TLT', 'TIP', 'IYR']
 
-# 価格データ
-price_data = {}
-for symbol in ALL_SYMBOLS:
-    col = f'{symbol}_Close'
-    if col in df.columns:
-        price_data[symbol] = df[col].values
+sp500_symbols = [s for s in ALL_SYMBOLS if s not in DEFENSE_ETFS]
+sp500_cols = prices.cols(sp500_symbols)
+defense_cols = prices.cols(DEFENSE_ETFS)
 
-spy_prices = price_data.get('SPY', np.full(len(df), np.nan))
+spy_prices = prices.series('SPY')
 
-# 月次インデックス
-df['YearMonth'] = df.index.to_period('M')
-monthly_indices = []
-monthly_dates = []
-for ym, group in df.groupby('YearMonth'):
-    first_idx = df.index.get_loc(group.index[0])
-    monthly_indices.append((first_idx, group.index[0]))
-    monthly_dates.append(group.index[0])
 
 # =============================================================================
 # 基本計算関数
 # =============================================================================
 
-def calc_momentum(symbol, idx, momentum_period=MOMENTUM_PERIOD):
+def apply_transaction_costs(data, costs):
     """
-    モメンタム計算（指定期間のリターン）
+    複数のコスト水準を一括適用した月次リターン行列
     
     Args:
-        symbol (str): 銘柄シンボル
-        idx (int): 現在のインデックス
-        momentum_period (int): モメンタム計算期間（日数）
+        data (dict): run_strategy_simulationの1戦略分の結果
+        costs (array-like): 取引コスト率のリスト
     
     Returns:
-        float: 指定期間のリターン（小数）
-    """
-    if symbol not in price_data:
-        return np.nan
-    prices = price_data[symbol]
-    if idx < momentum_period:
-        return np.nan
-    current = prices[idx]
-    past = prices[idx - momentum_period]
-    if np.isnan(current) or np.isnan(past) or past <= 0:
-        return np.nan
-    return (current / past) - 1
-
-
-def calc_volatility_improved(symbol, idx):
-    if symbol not in price_data:
-        return VOL_FLOOR
-    prices = price_data[symbol]
-    
-    if idx >= VOL_SHORT_PERIOD:
-        short_prices = prices[idx - VOL_SHORT_PERIOD:idx + 1]
-        short_returns = np.diff(short_prices) / short_prices[:-1]
-        short_returns = short_returns[~np.isnan(short_returns)]
-        short_vol = np.std(short_returns) * np.sqrt(252) if len(short_returns) >= 10 else np.nan
-    else:
-        short_vol = np.nan
-    
-    if idx >= VOL_LONG_PERIOD:
-        long_prices = prices[idx - VOL_LONG_PERIOD:idx + 1]
-        long_returns = np.diff(long_prices) / long_prices[:-1]
-        long_returns = long_returns[~np.isnan(long_returns)]
-        long_vol = np.std(long_returns) * np.sqrt(252) if len(long_returns) >= 20 else np.nan
-    else:
-        long_vol = np.nan
-    
-    if not np.isnan(short_vol) and not np.isnan(long_vol):
-        vol = VOL_SHORT_WEIGHT * short_vol + VOL_LONG_WEIGHT * long_vol
-    elif not np.isnan(short_vol):
-        vol = short_vol
-    elif not np.isnan(long_vol):
-        vol = long_vol
-    else:
-        vol = 0.20
-    
-    return max(vol, VOL_FLOOR)
-
-
-def select_attack_stocks(universe, idx, top_n, momentum_period=MOMENTUM_PERIOD):
-    momentum_scores = []
-    for symbol in universe:
-        mom = calc_momentum(symbol, idx, momentum_period)
-        if not np.isnan(mom):
-            momentum_scores.append((symbol, mom))
-    
-    if len(momentum_scores) < top_n:
-        return [], {}
+        np.ndarray: 月次リターン（コスト水準数×月数）
     
-    momentum_scores.sort(key=lambda x: x[1], reverse=True)
-    selected = [s[0] for s in momentum_scores[:top_n]]
-    
-    inv_vols = []
-    for symbol in selected:
-        vol = calc_volatility_improved(symbol, idx)
-        inv_vols.append(1 / vol)
-    
-    total_inv = sum(inv_vols)
-    weights = {s: min(iv / total_inv, WEIGHT_CAP) for s, iv in zip(selected, inv_vols)}
-    
-    total_weight = sum(weights.values())
-    weights = {s: w / total_weight for s, w in weights.items()}
-    
-    return selected, weights
+    Note:
+        net = (gross - cost × turnover) × scale をブロードキャストで計算
+        （VolScaleなしの戦略はscale=1.0）。SPYはコストなしのため全行同じ。
+    """
+    costs = np.asarray(costs, dtype=np.float64)[:, None]
+    if 'gross_returns' not in data:
+        returns = np.asarray(data['returns'], dtype=np.float64)
+        return np.repeat(returns[None, :], len(costs), axis=0)
+    gross = np.asarray(data['gross_returns'], dtype=np.float64)
+    turnovers = np.asarray(data['turnovers'], dtype=np.float64)
+    scales = np.asarray(data['scale_factors'], dtype=np.float64)
+    return (gross[None, :] - costs * turnovers[None, :]) * scales[None, :]
 
 
-def select_defense_etfs(etfs, idx, top_n, momentum_period=MOMENTUM_PERIOD):
-    momentum_scores = []
-    for symbol in etfs:
-        mom = calc_momentum(symbol, idx, momentum_period)
-        if not np.isnan(mom):
-            momentum_scores.append((symbol, mom))
-    
-    if len(momentum_scores) < top_n:
-        return [], {}
-    
-    momentum_scores.sort(key=lambda x: x[1], reverse=True)
-    selected = [s[0] for s in momentum_scores[:top_n]]
-    
-    inv_vols = []
-    for symbol in selected:
-        vol = calc_volatility_improved(symbol, idx)
-        inv_vols.append(1 / vol)
+def apply_volscale_grid(data, targets, clip_bounds, transaction_cost=TRANSACTION_COST):
+    """
+    目標Vol×クリップ範囲の全組み合わせを一括適用した月次リターン
     
-    total_inv = sum(inv_vols)
-    weights = {s: min(iv / total_inv, WEIGHT_CAP) for s, iv in zip(selected, inv_vols)}
+    Args:
+        data (dict): run_strategy_simulationのVolScale戦略1つ分の結果
+        targets (array-like): 目標ボラティリティのリスト
+        clip_bounds (list): [(VOLSCALE_MIN, VOLSCALE_MAX), ...] のリスト
+        transaction_cost (float): 取引コスト率
     
-    total_weight = sum(weights.values())
-    weights = {s: w / total_weight for s, w in weights.items()}
+    Returns:
+        np.ndarray: 月次リターン（目標Vol数×クリップ範囲数×月数）
     
-    return selected, weights
+    Note:
+        scale = clip(target / realized_vol, min, max) と
+        net = (gross - cost × turnover) × scale をブロードキャストで計算。
+        実現Volは選択時に保存済みのため再シミュレーション不要。
+    """
+    targets = np.asarray(targets, dtype=np.float64)[:, None, None]
+    bounds = np.asarray(clip_bounds, dtype=np.float64)
+    realized = np.asarray(data['realized_vols'], dtype=np.float64)[None, None, :]
+    scales = np.clip(targets / realized, bounds[None, :, 0:1], bounds[None, :, 1:2])
+    gross = np.asarray(data['gross_returns'], dtype=np.float64)
+    turnovers = np.asarray(data['turnovers'], dtype=np.float64)
+    return (gross - transaction_cost * turnovers) * scales
 
 
-def calc_portfolio_volatility(selected, weights, idx):
-    if idx < VOLSCALE_LOOKBACK:
-        return 0.15
-    
-    returns_matrix = []
-    weight_list = []
-    
-    for symbol in selected:
-        if symbol not in price_data:
-            continue
-        prices = price_data[symbol]
-        period_prices = prices[idx - VOLSCALE_LOOKBACK:idx + 1]
-        if len(period_prices) < VOLSCALE_LOOKBACK:
-            continue
-        returns = np.diff(period_prices) / period_prices[:-1]
-        if np.any(np.isnan(returns)):
-            continue
-        returns_matrix.append(returns)
-        weight_list.append(weights.get(symbol, 0))
-    
-    if len(returns_matrix) == 0:
-        return 0.15
-    
-    returns_matrix = np.array(returns_matrix)
-    weight_arr = np.array(weight_list)
-    weight_arr = weight_arr / weight_arr.sum()
-    
-    portfolio_returns = np.dot(weight_arr, returns_matrix)
-    vol = np.std(portfolio_returns) * np.sqrt(252)
-    
-    return max(vol, VOL_FLOOR) if vol > 0 else 0.15
+def calc_sharpe_matrix(returns_matrix):
+    """最終軸ごとのSharpe比（calc_metricsのsharpeと同じ定義、行列を一括計算）"""
+    mean_ret = np.mean(returns_matrix, axis=-1) * 12
+    std_ret = np.std(returns_matrix, axis=-1) * np.sqrt(12)
+    return np.where(std_ret > 0, mean_ret / np.where(std_ret > 0, std_ret, 1), 0.0)
 
 
-def calc_volscale_factor(selected, weights, idx, target_vol):
-    realized_vol = calc_portfolio_volatility(selected, weights, idx)
-    scale = target_vol / realized_vol if realized_vol > 0 else 1.0
-    scale = np.clip(scale, VOLSCALE_MIN, VOLSCALE_MAX)
-    return scale, realized_vol
+def calc_max_dd_matrix(returns_matrix):
+    """最終軸ごとの最大ドローダウン（calc_metricsのmax_ddと同じ定義、行列を一括計算）"""
+    cum_returns = np.cumprod(1 + returns_matrix, axis=-1)
+    running_max = np.maximum.accumulate(cum_returns, axis=-1)
+    return np.min(cum_returns / running_max - 1, axis=-1)
 
 
-def calc_turnover(prev_weights, curr_weights):
-    all_symbols = set(prev_weights.keys()) | set(curr_weights.keys())
-    turnover = 0.0
-    for symbol in all_symbols:
-        prev_w = prev_weights.get(symbol, 0)
-        curr_w = curr_weights.get(symbol, 0)
-        turnover += abs(curr_w - prev_w)
-    return turnover / 2
+def calc_metrics(returns):
+    """
+    月次リターンの基本指標（ReturnSeries.metricsのコピー）
 
+    Args:
+        returns (list / ReturnSeries): 月次リターン
 
-def calc_monthly_return_with_cost(selected, weights, start_idx, end_idx, prev_weights, transaction_cost=TRANSACTION_COST):
-    month_return = 0.0
-    for symbol in selected:
-        if symbol not in price_data:
-            continue
-        start_price = price_data[symbol][start_idx]
-        end_price = price_data[symbol][end_idx]
-        if np.isnan(start_price) or np.isnan(end_price) or start_price <= 0:
-            continue
-        ret = (end_price / start_price) - 1
-        month_return += ret * weights[symbol]
-    
-    turnover = calc_turnover(prev_weights, weights)
-    cost = transaction_cost * turnover
-    
-    return month_return - cost, turnover
+    Returns:
+        dict: cumulative / cagr / max_dd / sharpe / sortino / calmar（空の系列は空の辞書）
+    """
+    return dict(as_return_series(returns).metrics)
 
 
-def is_bull_regime(idx):
-    if idx < MA_PERIOD:
-        return True
-    spy_price = spy_prices[idx]
-    ma200 = np.mean(spy_prices[idx - MA_PERIOD + 1:idx + 1])
-    if np.isnan(spy_price) or np.isnan(ma200):
-        return True
-    return spy_price >= ma200 * REGIME_THRESHOLD
+def group_by_length(series_by_name):
+    """
+    同じ長さの系列を (系列数 × 月数) の行列にまとめる
 
+    Args:
+        series_by_name (dict): {名前: 月次リターン}
 
-def calc_metrics(returns):
-    returns = np.array(returns)
-    if len(returns) == 0:
-        return {}
-    
-    cumulative = np.prod(1 + returns) - 1
-    years = len(returns) / 12
-    cagr = (1 + cumulative) ** (1 / years) - 1 if years > 0 else 0
-    
-    cum_returns = np.cumprod(1 + returns)
-    running_max = np.maximum.accumulate(cum_returns)
-    drawdowns = cum_returns / running_max - 1
-    max_dd = np.min(drawdowns)
-    
-    mean_ret = np.mean(returns) * 12
-    std_ret = np.std(returns) * np.sqrt(12)
-    sharpe = mean_ret / std_ret if std_ret > 0 else 0
-    
-    neg_returns = returns[returns < 0]
-    downside_std = np.std(neg_returns) * np.sqrt(12) if len(neg_returns) > 0 else 0.001
-    sortino = mean_ret / downside_std if downside_std > 0 else 0
-    
-    calmar = cagr / abs(max_dd) if max_dd < 0 else 0
-    
-    return {
-        'cumulative': cumulative,
-        'cagr': cagr,
-        'max_dd': max_dd,
-        'sharpe': sharpe,
-        'sortino': sortino,
-        'calmar': calmar
-    }
+    Returns:
+        list: [(名前のリスト, 行列), ...]（長さの初出順）
+    """
+    groups = {}
+    for name, values in series_by_name.items():
+        groups.setdefault(len(values), []).append(name)
+    return [
+        (names, np.array([series_by_name[name] for name in names], dtype=np.float64))
+        for names in groups.values()
+    ]
 
 
 # =============================================================================
@@ -366,16 +284,43 @@ SP100_SYMBOLS = [
     'TSLA', 'TXN', 'UNH', 'UNP', 'UPS', 'USB', 'V', 'VZ', 'WBA', 'WFC',
     'WMT', 'XOM'
 ]
-sp100_symbols = [s for s in SP100_SYMBOLS if s in ALL_SYMBOLS and f'{s}_Close' in df.columns]
-
-# 全13戦略の定義
-ALL_13_STRATEGIES = [
-    'D2', 'D3', '防御型TOP5', '防御型TOP3',
-    'D2+防御型', 'D3+防御型', 'SPY',
-    'D2_VolScale', 'D3_VolScale',
-    '防御型TOP5_VolScale', '防御型TOP3_VolScale',
-    'D2+防御型_VolScale', 'D3+防御型_VolScale'
-]
+sp100_symbols = [s for s in SP100_SYMBOLS if s in prices]
+sp100_cols = prices.cols(sp100_symbols)
+
+# シミュレーションの事前計算設定（テスト4/9の並列スイープのワーカーは構築済みのcontextをforkで引き継ぐ）
+BACKTEST_SETTINGS = {
+    'universes': {'sp100': sp100_symbols, 'sp500': sp500_symbols, 'defense': DEFENSE_ETFS},
+    'momentum_horizons': MOMENTUM_HORIZONS,
+    'vol_params': (VOL_SHORT_PERIOD, VOL_LONG_PERIOD, VOL_SHORT_WEIGHT, VOL_LONG_WEIGHT, VOL_FLOOR),
+    'ma_period': MA_PERIOD,
+    'regime_threshold': REGIME_THRESHOLD,
+    'weight_cap': WEIGHT_CAP,
+    'volscale_lookback': VOLSCALE_LOOKBACK,
+    'scale_bounds': (VOLSCALE_MIN, VOLSCALE_MAX),
+    'defense_top_n': (5, DEFENSE_TOP_N_3),
+    'attack_vol_multiplier': 1.36,  # 攻撃型D2/D3の目標Vol = target_vol × 1.36
+}
+
+# 事前計算一式:
+#   - 改善版ボラティリティ（全銘柄×全日を一括計算し、以降は添字参照のみ）
+#   - モメンタム（期間×日数×銘柄数、感度分析の全期間を一括計算）
+#   - モメンタム順位（ユニバース×期間ごとに全日付を一括ソート、top_nは先頭スライス）
+#   - 銘柄選択キャッシュ（全シミュレーションで共有、コスト・レジーム・目標Volだけが異なる再実行では選択を再計算しない）
+#   - レジーム判定（累積和MA200で全日を一括計算）
+context = BacktestContext(prices, **BACKTEST_SETTINGS)
+selections = context.selections
+
+# シミュレーション結果キャッシュ（同じパラメータ・価格データ・コード・設定の再実行では読み込みのみ）
+result_cache = SimulationCache(
+    RESULT_CACHE_DIR, RESULT_CACHE_MAX_BYTES, namespace=simulation_namespace(prices, BACKTEST_SETTINGS)
+)
+
+# 月次インデックス（各月の最初の営業日）
+monthly_indices = context.monthly_indices
+monthly_dates = [month_start for _, month_start in monthly_indices]
+
+# 全13戦略の定義（選択レッグ × レジームスイッチ × VolScale目標 × 取引コスト）
+ALL_13_STRATEGIES = [strategy.name for strategy in context.strategies(ATTACK_TOP_N, 0.14)]
 
 def run_strategy_simulation(
     momentum_period=126,
@@ -383,7 +328,8 @@ def run_strategy_simulation(
     transaction_cost=0.002,
     target_vol=0.14,
     rebalance_offset=0,
-    indices_override=None
+    indices_override=None,
+    bull_series=None
 ):
     """
     全13戦略のシミュレーションを実行
@@ -395,157 +341,78 @@ def run_strategy_simulation(
         target_vol (float): 目標ボラティリティ（デフォルト0.14=14%）
         rebalance_offset (int): リバランス日オフセット（0=月初, 5=月中, -1=月末）
         indices_override (list): カスタム月次インデックス（オプション）
+        bull_series (np.ndarray): カスタムレジーム判定（長さT、オプション、regime_matrixの1行）
     
     Returns:
         dict: 全13戦略の月次リターン、スケールファクター、ターンオーバー
+            - gross_returns: コスト控除前・スケール前の月次リターン（SPY以外）
+              apply_transaction_costsで任意のコスト水準を後から適用できる
+            - realized_vols: 選択時点の実現ポートフォリオVol（VolScale戦略のみ）
+              apply_volscale_gridで任意の目標Vol・クリップ範囲を後から適用できる
+    
+    Note:
+        防御型はtop_nによらずTOP5/TOP3固定。選択はSelectionCacheで全呼び出しに共有。
+        結果はresult_cacheに保存され、同じ引数の再実行ではディスクから読み込む。
     """
-    indices = indices_override if indices_override else monthly_indices
-    
-    # 全13戦略の結果を初期化
-    results = {}
-    for strategy in ALL_13_STRATEGIES:
-        if strategy == 'SPY':
-            results[strategy] = {'returns': []}
-        else:
-            results[strategy] = {'returns': [], 'scale_factors': [], 'turnovers': []}
-    
-    prev_weights = {s: {} for s in ALL_13_STRATEGIES if s != 'SPY'}
-    
-    for i in range(len(indices) - 1):
-        start_idx, month_start = indices[i]
-        end_idx, month_end = indices[i + 1]
-        
-        # リバランスオフセット適用
-        start_idx = min(start_idx + rebalance_offset, end_idx - 1)
-        end_idx -= 1
-        
-        selection_idx = start_idx - 1
-        if selection_idx < momentum_period:
-            continue
-        
-        bull = is_bull_regime(selection_idx)
-        
-        # D2: S&P100モメンタム（VolScaleなし）
-        selected_d2, weights_d2 = select_attack_stocks(sp100_symbols, selection_idx, top_n, momentum_period)
-        if selected_d2:
-            base_ret, turnover = calc_monthly_return_with_cost(selected_d2, weights_d2, start_idx, end_idx, prev_weights['D2'], transaction_cost)
-            results['D2']['returns'].append(base_ret)
-            results['D2']['scale_factors'].append(1.0)
-            results['D2']['turnovers'].append(turnover)
-            prev_weights['D2'] = weights_d2
-        
-        # D3: S&P500モメンタム（VolScaleなし）
-        selected_d3, weights_d3 = select_attack_stocks(sp500_symbols, selection_idx, top_n, momentum_period)
-        if selected_d3:
-            base_ret, turnover = calc_monthly_return_with_cost(selected_d3, weights_d3, start_idx, end_idx, prev_weights['D3'], transaction_cost)
-            results['D3']['returns'].append(base_ret)
-            results['D3']['scale_factors'].append(1.0)
-            results['D3']['turnovers'].append(turnover)
-            prev_weights['D3'] = weights_d3
-        
-        # 防御型TOP5: 防御ETFのみTOP5（VolScaleなし）
-        selected_def5, weights_def5 = select_defense_etfs(DEFENSE_ETFS, selection_idx, 5, momentum_period)
-        if selected_def5:
-            base_ret, turnover = calc_monthly_return_with_cost(selected_def5, weights_def5, start_idx, end_idx, prev_weights['防御型TOP5'], transaction_cost)
-            results['防御型TOP5']['returns'].append(base_ret)
-            results['防御型TOP5']['scale_factors'].append(1.0)
-            results['防御型TOP5']['turnovers'].append(turnover)
-            prev_weights['防御型TOP5'] = weights_def5
-        
-        # 防御型TOP3: 防御ETFのみTOP3（VolScaleなし）
-        selected_def3, weights_def3 = select_defense_etfs(DEFENSE_ETFS, selection_idx, 3, momentum_period)
-        if selected_def3:
-            base_ret, turnover = calc_monthly_return_with_cost(selected_def3, weights_def3, start_idx, end_idx, prev_weights['防御型TOP3'], transaction_cost)
-            results['防御型TOP3']['returns'].append(base_ret)
-            results['防御型TOP3']['scale_factors'].append(1.0)
-            results['防御型TOP3']['turnovers'].append(turnover)
-            prev_weights['防御型TOP3'] = weights_def3
-        
-        # D2+防御型: レジーム切り替え（VolScaleなし）
-        if bull:
-            selected_d2d, weights_d2d = selected_d2, weights_d2
-        else:
-            selected_d2d, weights_d2d = selected_def3, weights_def3
-        if selected_d2d:
-            base_ret, turnover = calc_monthly_return_with_cost(selected_d2d, weights_d2d, start_idx, end_idx, prev_weights['D2+防御型'], transaction_cost)
-            results['D2+防御型']['returns'].append(base_ret)
-            results['D2+防御型']['scale_factors'].append(1.0)
-            results['D2+防御型']['turnovers'].append(turnover)
-            prev_weights['D2+防御型'] = weights_d2d
-        
-        # D3+防御型: レジーム切り替え（VolScaleなし）
-        if bull:
-            selected_d3d, weights_d3d = selected_d3, weights_d3
-        else:
-            selected_d3d, weights_d3d = selected_def3, weights_def3
-        if selected_d3d:
-            base_ret, turnover = calc_monthly_return_with_cost(selected_d3d, weights_d3d, start_idx, end_idx, prev_weights['D3+防御型'], transaction_cost)
-            results['D3+防御型']['returns'].append(base_ret)
-            results['D3+防御型']['scale_factors'].append(1.0)
-            results['D3+防御型']['turnovers'].append(turnover)
-            prev_weights['D3+防御型'] = weights_d3d
-        
-        # SPY
-        spy_start = spy_prices[start_idx]
-        spy_end = spy_prices[end_idx]
-        if not np.isnan(spy_start) and not np.isnan(spy_end) and spy_start > 0:
-            results['SPY']['returns'].append((spy_end / spy_start) - 1)
-        
-        # D2_VolScale
-        if selected_d2:
-            scale, _ = calc_volscale_factor(selected_d2, weights_d2, selection_idx, target_vol * 1.36)
-            base_ret, turnover = calc_monthly_return_with_cost(selected_d2, weights_d2, start_idx, end_idx, prev_weights['D2_VolScale'], transaction_cost)
-            results['D2_VolScale']['returns'].append(base_ret * scale)
-            results['D2_VolScale']['scale_factors'].append(scale)
-            results['D2_VolScale']['turnovers'].append(turnover)
-            prev_weights['D2_VolScale'] = weights_d2
-        
-        # D3_VolScale
-        if selected_d3:
-            scale, _ = calc_volscale_factor(selected_d3, weights_d3, selection_idx, target_vol * 1.36)
-            base_ret, turnover = calc_monthly_return_with_cost(selected_d3, weights_d3, start_idx, end_idx, prev_weights['D3_VolScale'], transaction_cost)
-            results['D3_VolScale']['returns'].append(base_ret * scale)
-            results['D3_VolScale']['scale_factors'].append(scale)
-            results['D3_VolScale']['turnovers'].append(turnover)
-            prev_weights['D3_VolScale'] = weights_d3
-        
-        # 防御型TOP5_VolScale
-        if selected_def5:
-            scale, _ = calc_volscale_factor(selected_def5, weights_def5, selection_idx, target_vol)
-            base_ret, turnover = calc_monthly_return_with_cost(selected_def5, weights_def5, start_idx, end_idx, prev_weights['防御型TOP5_VolScale'], transaction_cost)
-            results['防御型TOP5_VolScale']['returns'].append(base_ret * scale)
-            results['防御型TOP5_VolScale']['scale_factors'].append(scale)
-            results['防御型TOP5_VolScale']['turnovers'].append(turnover)
-            prev_weights['防御型TOP5_VolScale'] = weights_def5
-        
-        # 防御型TOP3_VolScale
-        if selected_def3:
-            scale, _ = calc_volscale_factor(selected_def3, weights_def3, selection_idx, target_vol)
-            base_ret, turnover = calc_monthly_return_with_cost(selected_def3, weights_def3, start_idx, end_idx, prev_weights['防御型TOP3_VolScale'], transaction_cost)
-            results['防御型TOP3_VolScale']['returns'].append(base_ret * scale)
-            results['防御型TOP3_VolScale']['scale_factors'].append(scale)
-            results['防御型TOP3_VolScale']['turnovers'].append(turnover)
-            prev_weights['防御型TOP3_VolScale'] = weights_def3
-        
-        # D2+防御型_VolScale
-        if selected_d2d:
-            scale, _ = calc_volscale_factor(selected_d2d, weights_d2d, selection_idx, target_vol)
-            base_ret, turnover = calc_monthly_return_with_cost(selected_d2d, weights_d2d, start_idx, end_idx, prev_weights['D2+防御型_VolScale'], transaction_cost)
-            results['D2+防御型_VolScale']['returns'].append(base_ret * scale)
-            results['D2+防御型_VolScale']['scale_factors'].append(scale)
-            results['D2+防御型_VolScale']['turnovers'].append(turnover)
-            prev_weights['D2+防御型_VolScale'] = weights_d2d
-        
-        # D3+防御型_VolScale
-        if selected_d3d:
-            scale, _ = calc_volscale_factor(selected_d3d, weights_d3d, selection_idx, target_vol)
-            base_ret, turnover = calc_monthly_return_with_cost(selected_d3d, weights_d3d, start_idx, end_idx, prev_weights['D3+防御型_VolScale'], transaction_cost)
-            results['D3+防御型_VolScale']['returns'].append(base_ret * scale)
-            results['D3+防御型_VolScale']['scale_factors'].append(scale)
-            results['D3+防御型_VolScale']['turnovers'].append(turnover)
-            prev_weights['D3+防御型_VolScale'] = weights_d3d
-    
-    return results
+    return result_cache.get_or_run(
+        context.run, momentum_period=momentum_period, top_n=top_n, transaction_cost=transaction_cost,
+        target_vol=target_vol, rebalance_offset=rebalance_offset,
+        indices=indices_override, bull_series=bull_series,
+    )
+
+
+def run_parameter_sweep(grid):
+    """
+    パラメータグリッドの全組み合わせでrun_strategy_simulationを実行（ProcessPoolExecutorで並列化）
+
+    Args:
+        grid (list): run_strategy_simulationの引数辞書のリスト（sweep.parameter_grid等）
+
+    Returns:
+        tuple: (table, outputs)
+            - table: 1行 = 1パラメータ × 1戦略（パラメータ列 + strategy + calc_metricsの指標列）
+            - outputs: 各パラメータの全13戦略の結果（gridと同順、sweep.returns_matrixで行列化）
+
+    Note:
+        result_cacheにない設定だけをワーカーで計算し、結果を保存する
+    """
+    defaults = {
+        'momentum_period': 126, 'top_n': 5, 'transaction_cost': 0.002, 'target_vol': 0.14,
+        'rebalance_offset': 0, 'indices': None, 'bull_series': None,
+    }
+    tasks = [{**defaults, **params} for params in grid]
+    keys = [result_cache.key(**task) for task in tasks]
+    outputs = [result_cache.get(key) for key in keys]
+    missing = [i for i, results in enumerate(outputs) if results is None]
+    if missing:
+        computed = map_sweep(
+            prices, BacktestContext, BACKTEST_SETTINGS, BacktestContext.run,
+            [tasks[i] for i in missing],
+            max_workers=SWEEP_WORKERS, context=context,
+        )
+        for i, results in zip(missing, computed):
+            result_cache.put(keys[i], results)
+            outputs[i] = results
+    table = sweep_table(grid, outputs, lambda data: calc_metrics(data['returns']))
+    return table, outputs
+
+
+def metrics_from_table(table, key):
+    """
+    縦持ちテーブルを {key(行): {戦略名: 指標辞書}} に変換
+
+    Args:
+        table (pd.DataFrame): run_parameter_sweepの出力
+        key (callable): 行（辞書）→ 結果辞書のキー
+
+    Returns:
+        dict: パラメータ別・戦略別の指標（calc_metricsと同じキー）
+    """
+    metric_columns = table.columns[table.columns.get_loc('strategy') + 1:]
+    nested = {}
+    for row in table.to_dict('records'):
+        nested.setdefault(key(row), {})[row['strategy']] = {m: row[m] for m in metric_columns}
+    return nested
 
 
 # =============================================================================
@@ -557,14 +424,15 @@ print("テスト1: 取引コスト感度分析")
 print("=" * 80)
 
 cost_scenarios = [0.001, 0.002, 0.005, 0.010]  # 0.1%, 0.2%, 0.5%, 1.0%
-cost_results = {}
+cost_results = {cost: {} for cost in cost_scenarios}
 
-for cost in cost_scenarios:
-    results = run_strategy_simulation(transaction_cost=cost)
-    cost_results[cost] = {
-        strategy: calc_metrics(data['returns'])
-        for strategy, data in results.items()
-    }
+# 選択・ウェイト・スケール・ターンオーバーはコストに依存しないため1回だけシミュレーションし、
+# コスト水準は (gross - cost × turnover) × scale としてまとめて適用する
+base_results = run_strategy_simulation()
+for strategy, data in base_results.items():
+    net_returns = apply_transaction_costs(data, cost_scenarios)
+    for cost, returns in zip(cost_scenarios, net_returns):
+        cost_results[cost][strategy] = calc_metrics(returns)
 
 print()
 # 全戦略のSharpeを表示
@@ -589,6 +457,35 @@ for strategy in ALL_13_STRATEGIES:
     else:
         print(f"{strategy}: 1.0%コストでもSPYを上回る")
 
+# 損益分岐コスト曲線（100水準のSharpeを一括計算）
+BREAKEVEN_COST_GRID = np.linspace(0.0, 0.03, 100)  # 0%〜3%
+breakeven_results = {}
+print()
+print(f"【損益分岐コスト曲線（{BREAKEVEN_COST_GRID[0]*100:.1f}%〜{BREAKEVEN_COST_GRID[-1]*100:.1f}%, {len(BREAKEVEN_COST_GRID)}水準）】")
+for strategy in ALL_13_STRATEGIES:
+    if strategy == 'SPY':
+        continue
+    sharpe_curve = calc_sharpe_matrix(apply_transaction_costs(base_results[strategy], BREAKEVEN_COST_GRID))
+    below = np.flatnonzero(sharpe_curve < spy_sharpe)
+    if len(below) == 0:
+        breakeven_cost = None
+    elif below[0] == 0:
+        breakeven_cost = 0.0
+    else:
+        # 隣接する2水準の間を線形補間
+        k = below[0]
+        c0, c1 = BREAKEVEN_COST_GRID[k - 1], BREAKEVEN_COST_GRID[k]
+        s0, s1 = sharpe_curve[k - 1], sharpe_curve[k]
+        breakeven_cost = float(c0 + (s0 - spy_sharpe) / (s0 - s1) * (c1 - c0))
+    breakeven_results[strategy] = {
+        'sharpe_curve': sharpe_curve.tolist(),
+        'breakeven_cost': breakeven_cost,
+    }
+    if breakeven_cost is None:
+        print(f"{strategy}: {BREAKEVEN_COST_GRID[-1]*100:.1f}%コストでもSPYを上回る")
+    else:
+        print(f"{strategy}: 損益分岐コスト = {breakeven_cost*100:.2f}%")
+
 
 # =============================================================================
 # テスト2: レジーム別パフォーマンス分解
@@ -607,8 +504,11 @@ regimes = {
     '直近 (2023-2025)': (pd.Timestamp('2023-01-01'), pd.Timestamp('2025-12-31')),
 }
 
-# 全期間シミュレーション（月次リターンと日付を保持）
-full_results = run_strategy_simulation()
+# 全期間シミュレーション（月次リターンと日付を保持、テスト1のデフォルト設定の結果を再利用）
+full_results = base_results
+
+# 戦略ごとの統計キャッシュ（平均・分散・歪度・尖度・ドローダウン等は各テストで共有）
+return_series = {strategy: ReturnSeries(full_results[strategy]['returns']) for strategy in ALL_13_STRATEGIES}
 
 # 月次リターンと日付を対応付け
 n_returns = len(full_results['D3+防御型_VolScale']['returns'])
@@ -645,6 +545,27 @@ for regime_name in regimes.keys():
     
     print(f"{regime_name:<25} {d3_str:>15} {regime_str:>15} {spy_str:>10}")
 
+# テスト2b: レジーム判定ルール感度（MA期間 × 閾値）
+# SPYの累積和から全ルールのBull/Bear系列を一括計算し、スイッチ戦略のみ比較
+print()
+print("【レジーム判定ルール感度（MA期間 × 閾値）】")
+regime_rule_grid = regime_matrix(spy_prices, REGIME_MA_PERIODS, REGIME_THRESHOLDS)
+switch_strategies = ['D2+防御型', 'D3+防御型', 'D2+防御型_VolScale', 'D3+防御型_VolScale']
+regime_rule_results = {}
+for i, ma_period in enumerate(REGIME_MA_PERIODS):
+    for k, threshold in enumerate(REGIME_THRESHOLDS):
+        key = f"ma{ma_period}_th{threshold:.2f}"
+        results = run_strategy_simulation(bull_series=regime_rule_grid[i, k])
+        regime_rule_results[key] = {
+            strategy: calc_metrics(results[strategy]['returns'])
+            for strategy in switch_strategies
+        }
+
+print(f"{'ルール':<18}" + "".join(f"{s:>22}" for s in switch_strategies))
+print("-" * (18 + 22 * len(switch_strategies)))
+for key, data in regime_rule_results.items():
+    print(f"{key:<18}" + "".join(f"{data[s].get('sharpe', 0):>22.2f}" for s in switch_strategies))
+
 
 # =============================================================================
 # テスト3: テールリスク分析
@@ -658,7 +579,7 @@ def calc_tail_metrics(returns):
     """
     テールリスク指標を計算
     
-    CVaR、最悑12ヶ月リターン、ドローダウン滞在期間を算出。
+    CVaR、最悪12ヶ月リターン、ドローダウン滞在期間を算出。
     
     Args:
         returns (list): 月次リターンのリスト
@@ -666,74 +587,45 @@ def calc_tail_metrics(returns):
     Returns:
         dict: テールリスク指標
             - cvar_5: 5%CVaR（条件付きVaR）
-            - worst_12m: 最悑12ヶ月リターン
+            - worst_12m: 最悪12ヶ月リターン
             - dd_duration: ドローダウン滞在期間（月）
-    """
-    returns = np.array(returns)
-    if len(returns) < 12:
-        return {}
-    
-    # CVaR (5%)
-    sorted_returns = np.sort(returns)
-    var_5 = np.percentile(returns, 5)
-    cvar_5 = np.mean(sorted_returns[sorted_returns <= var_5])
-    
-    # 最悪12ヶ月
-    rolling_12m = []
-    for i in range(len(returns) - 11):
-        rolling_ret = np.prod(1 + returns[i:i+12]) - 1
-        rolling_12m.append(rolling_ret)
-    worst_12m = min(rolling_12m) if rolling_12m else np.nan
-    
-    # 最悪3ヶ月
-    rolling_3m = []
-    for i in range(len(returns) - 2):
-        rolling_ret = np.prod(1 + returns[i:i+3]) - 1
-        rolling_3m.append(rolling_ret)
-    worst_3m = min(rolling_3m) if rolling_3m else np.nan
-    
-    # DD滞在期間（平均）
-    cum_returns = np.cumprod(1 + returns)
-    running_max = np.maximum.accumulate(cum_returns)
-    in_dd = cum_returns < running_max
     
-    dd_durations = []
-    current_duration = 0
-    for is_in_dd in in_dd:
-        if is_in_dd:
-            current_duration += 1
-        else:
-            if current_duration > 0:
-                dd_durations.append(current_duration)
-            current_duration = 0
-    if current_duration > 0:
-        dd_durations.append(current_duration)
-    
-    avg_dd_duration = np.mean(dd_durations) if dd_durations else 0
-    max_dd_duration = max(dd_durations) if dd_durations else 0
-    
-    # 負け月の連続
-    max_losing_streak = 0
-    current_streak = 0
-    for r in returns:
-        if r < 0:
-            current_streak += 1
-            max_losing_streak = max(max_losing_streak, current_streak)
-        else:
-            current_streak = 0
-    
-    return {
-        'cvar_5': cvar_5,
-        'worst_12m': worst_12m,
-        'worst_3m': worst_3m,
-        'avg_dd_duration': avg_dd_duration,
-        'max_dd_duration': max_dd_duration,
-        'max_losing_streak': max_losing_streak
-    }
+    Note:
+        tail.tail_metricsの1系列版（複数系列はcalc_tail_metrics_batchで一括計算）
+    """
+    return calc_tail_metrics_batch({'series': returns})['series']
 
-tail_results = {}
-for strategy in ALL_13_STRATEGIES:
-    tail_results[strategy] = calc_tail_metrics(full_results[strategy]['returns'])
+
+def calc_tail_metrics_batch(returns_by_strategy):
+    """
+    複数戦略のテールリスク指標を一括計算
+
+    Args:
+        returns_by_strategy (dict): {戦略名: 月次リターン}
+
+    Returns:
+        dict: {戦略名: calc_tail_metricsと同じ指標辞書}（12ヶ月未満の系列は空の辞書）
+    """
+    results = {}
+    for names, matrix in group_by_length(returns_by_strategy):
+        if matrix.shape[1] < 12:
+            results.update((name, {}) for name in names)
+            continue
+        metrics = tail_metrics(matrix)
+        for i, name in enumerate(names):
+            results[name] = {
+                'cvar_5': metrics['cvar_5'][i],
+                'worst_12m': metrics['worst_12m'][i],
+                'worst_3m': metrics['worst_3m'][i],
+                'avg_dd_duration': metrics['avg_dd_duration'][i],
+                'max_dd_duration': int(metrics['max_dd_duration'][i]),
+                'max_losing_streak': int(metrics['max_losing_streak'][i]),
+            }
+    return {name: results[name] for name in returns_by_strategy}
+
+tail_results = calc_tail_metrics_batch(
+    {strategy: full_results[strategy]['returns'] for strategy in ALL_13_STRATEGIES}
+)
 
 print()
 print("全戦略のテールリスク分析:")
@@ -774,18 +666,15 @@ print("=" * 80)
 print("テスト4: パラメータ感度分析（モメンタム期間 × 銘柄数）")
 print("=" * 80)
 
-momentum_periods = [63, 126, 189, 252]  # 3, 6, 9, 12ヶ月
+momentum_periods = MOMENTUM_HORIZONS  # 3, 6, 9, 12ヶ月
 top_n_values = [3, 5, 10]
 
-param_results = {}
-for mom_period in momentum_periods:
-    for top_n in top_n_values:
-        key = f"mom{mom_period//21}m_top{top_n}"
-        results = run_strategy_simulation(momentum_period=mom_period, top_n=top_n)
-        param_results[key] = {
-            strategy: calc_metrics(data['returns'])
-            for strategy, data in results.items()
-        }
+# 全組み合わせをプロセスプールで並列実行し、縦持ちテーブルに集約
+param_grid = parameter_grid(momentum_period=momentum_periods, top_n=top_n_values)
+param_table, param_outputs = run_parameter_sweep(param_grid)
+param_results = metrics_from_table(
+    param_table, lambda row: f"mom{row['momentum_period']//21}m_top{row['top_n']}"
+)
 
 print()
 print("【全戦略のパラメータ感度分析】")
@@ -829,52 +718,11 @@ print("=" * 80)
 print("テスト5: ブロックブートストラップ（Sharpe/MaxDDの95%CI）")
 print("=" * 80)
 
-def block_bootstrap(returns, n_bootstrap=1000, block_size=12, seed=42):
-    """ブロックブートストラップでSharpe/MaxDDの分布を推定
-    
-    Args:
-        returns: 月次リターンの配列
-        n_bootstrap: ブートストラップ回数（デフォルト1000）
-        block_size: ブロックサイズ（デフォルト12ヶ月）
-        seed: 乱数シード（デフォルト42、再現性確保のため）
-    """
-    np.random.seed(seed)  # 再現性のためシードを固定
-    returns = np.array(returns)
-    n = len(returns)
-    
-    sharpes = []
-    max_dds = []
-    
-    for _ in range(n_bootstrap):
-        # ブロックサンプリング
-        n_blocks = int(np.ceil(n / block_size))
-        sampled_returns = []
-        
-        for _ in range(n_blocks):
-            start = np.random.randint(0, n - block_size + 1)
-            sampled_returns.extend(returns[start:start + block_size])
-        
-        sampled_returns = np.array(sampled_returns[:n])
-        
-        # 指標計算
-        metrics = calc_metrics(sampled_returns)
-        sharpes.append(metrics['sharpe'])
-        max_dds.append(metrics['max_dd'])
-    
-    return {
-        'sharpe_mean': np.mean(sharpes),
-        'sharpe_std': np.std(sharpes),
-        'sharpe_ci_lower': np.percentile(sharpes, 2.5),
-        'sharpe_ci_upper': np.percentile(sharpes, 97.5),
-        'max_dd_mean': np.mean(max_dds),
-        'max_dd_ci_lower': np.percentile(max_dds, 2.5),
-        'max_dd_ci_upper': np.percentile(max_dds, 97.5),
-        'prob_sharpe_gt_1': np.mean(np.array(sharpes) > 1.0),
-    }
-
-bootstrap_results = {}
-for strategy in ALL_13_STRATEGIES:
-    bootstrap_results[strategy] = block_bootstrap(full_results[strategy]['returns'])
+# 同じ月数の戦略はまとめて1回で評価（同じseedのため全戦略で同じブロック開始位置）
+bootstrap_stats = {}
+for names, matrix in group_by_length({strategy: full_results[strategy]['returns'] for strategy in ALL_13_STRATEGIES}):
+    bootstrap_stats.update(zip(names, block_bootstrap(matrix, n_bootstrap=BOOTSTRAP_SAMPLES)))
+bootstrap_results = {strategy: bootstrap_stats[strategy] for strategy in ALL_13_STRATEGIES}
 
 print()
 print("全戦略のブートストラップ結果:")
@@ -898,17 +746,30 @@ def calc_psr(returns, benchmark_sharpe=0):
     """
     Probabilistic Sharpe Ratio (PSR) を計算
     Bailey & López de Prado (2012)
+
+    Args:
+        returns (list / ReturnSeries): 月次リターン
+        benchmark_sharpe (float): 比較するSharpe（SR*）
+
+    Returns:
+        dict: sharpe / skewness / kurtosis / psr / n_samples
+
+    Note:
+        ReturnSeriesを渡した場合、モーメントと結果は系列にキャッシュされる
     """
-    returns = np.array(returns)
-    n = len(returns)
-    
-    mean_ret = np.mean(returns)
-    std_ret = np.std(returns, ddof=1)
-    sharpe = mean_ret / std_ret * np.sqrt(12) if std_ret > 0 else 0
+    series = as_return_series(returns)
+    return series.cached(('psr', benchmark_sharpe), lambda: _compute_psr(series, benchmark_sharpe))
+
+
+def _compute_psr(series, benchmark_sharpe):
+    """calc_psrの計算本体（系列のキャッシュ済みモーメントを使う）"""
+    n = series.n
+    std_ret = series.std_ddof1
+    sharpe = series.mean / std_ret * np.sqrt(12) if std_ret > 0 else 0
     
     # 歪度と尖度
-    skew = stats.skew(returns)
-    kurt = stats.kurtosis(returns)  # excess kurtosis
+    skew = series.skew
+    kurt = series.kurtosis  # excess kurtosis
     
     # PSR計算
     # PSR = Φ((SR - SR*) × √(n-1) / √(1 - γ₃×SR + (γ₄-1)/4×SR²))
@@ -937,12 +798,14 @@ def calc_dsr(returns, n_trials=10):
     
     n_trials: 試行回数（パラメータ組み合わせ数など）
     """
-    returns = np.array(returns)
-    n = len(returns)
-    
-    mean_ret = np.mean(returns)
-    std_ret = np.std(returns, ddof=1)
-    sharpe = mean_ret / std_ret * np.sqrt(12) if std_ret > 0 else 0
+    series = as_return_series(returns)
+    return series.cached(('dsr', n_trials), lambda: _compute_dsr(series, n_trials))
+
+
+def _compute_dsr(series, n_trials):
+    """calc_dsrの計算本体（Sharpe・PSRは系列のキャッシュを共有）"""
+    n = series.n
+    sharpe = calc_psr(series)['sharpe']
     
     # 期待される最大Sharpe（多重検定補正）
     # E[max(SR)] ≈ (1 - γ) × Φ⁻¹(1 - 1/n_trials) + γ × Φ⁻¹(1 - 1/(n_trials × e))
@@ -952,7 +815,7 @@ def calc_dsr(returns, n_trials=10):
     expected_max_sr *= np.sqrt(12 / n)  # 年率化とサンプルサイズ補正
     
     # DSR = PSR with benchmark = expected_max_sr
-    psr_result = calc_psr(returns, benchmark_sharpe=expected_max_sr)
+    psr_result = calc_psr(series, benchmark_sharpe=expected_max_sr)
     
     return {
         'sharpe': sharpe,
@@ -964,14 +827,14 @@ def calc_dsr(returns, n_trials=10):
 print()
 print("【全戦略のPSR (Probabilistic Sharpe Ratio)】")
 for strategy in ALL_13_STRATEGIES:
-    psr = calc_psr(full_results[strategy]['returns'])
+    psr = calc_psr(return_series[strategy])
     print(f"{strategy}: Sharpe={psr['sharpe']:.2f}, 歪度={psr['skewness']:.2f}, 尖度={psr['kurtosis']:.2f}, PSR={psr['psr']*100:.1f}%")
 
 print()
 print("【全戦略のDSR (Deflated Sharpe Ratio)】")
 print("※ 試行回数 = 12（モメンタム期間4 × 銘柄数3）で補正")
 for strategy in ALL_13_STRATEGIES:
-    dsr = calc_dsr(full_results[strategy]['returns'], n_trials=12)
+    dsr = calc_dsr(return_series[strategy], n_trials=12)
     print(f"{strategy}: Sharpe={dsr['sharpe']:.2f}, 期待最大SR={dsr['expected_max_sr']:.2f}, DSR={dsr['dsr']*100:.1f}%")
 
 
@@ -992,7 +855,7 @@ print("※ 学術研究に基づき、年率-2%のペナルティを適用")
 print()
 
 original_metrics = {
-    strategy: calc_metrics(full_results[strategy]['returns'])
+    strategy: calc_metrics(return_series[strategy])
     for strategy in ALL_13_STRATEGIES
 }
 
@@ -1072,6 +935,27 @@ for strategy in volscale_strategies:
         diff = adj - orig
         print(f"{strategy}: 元Sharpe={orig:.2f}, 調達コスト後Sharpe={adj:.2f}, 差分={diff:+.2f}")
 
+# 目標Vol × クリップ範囲の感度（保存済みの実現Volから一括計算）
+print()
+print("【目標Vol × クリップ範囲のSharpe/MaxDD曲面】")
+print(f"※ 目標Vol {VOLSCALE_TARGET_GRID[0]*100:.0f}%〜{VOLSCALE_TARGET_GRID[-1]*100:.0f}% × クリップ範囲{len(VOLSCALE_CLIP_GRID)}種、再シミュレーションなし")
+volscale_surface_results = {}
+for strategy in volscale_strategies:
+    surface_returns = apply_volscale_grid(full_results[strategy], VOLSCALE_TARGET_GRID, VOLSCALE_CLIP_GRID)
+    sharpe_surface = calc_sharpe_matrix(surface_returns)
+    max_dd_surface = calc_max_dd_matrix(surface_returns)
+    best_t, best_c = np.unravel_index(np.argmax(sharpe_surface), sharpe_surface.shape)
+    volscale_surface_results[strategy] = {
+        'sharpe': sharpe_surface.tolist(),
+        'max_dd': max_dd_surface.tolist(),
+        'best_target_vol': float(VOLSCALE_TARGET_GRID[best_t]),
+        'best_clip': list(VOLSCALE_CLIP_GRID[best_c]),
+        'best_sharpe': float(sharpe_surface[best_t, best_c]),
+    }
+    print(f"{strategy}: 最良 目標Vol={VOLSCALE_TARGET_GRID[best_t]*100:.0f}%, "
+          f"クリップ={VOLSCALE_CLIP_GRID[best_c]}, Sharpe={sharpe_surface[best_t, best_c]:.2f}, "
+          f"MaxDD={max_dd_surface[best_t, best_c]*100:.1f}%")
+
 
 # =============================================================================
 # テスト9: リバランス日感度
@@ -1087,13 +971,9 @@ rebalance_offsets = {
     '月末（-5日）': -5,
 }
 
-rebalance_results = {}
-for label, offset in rebalance_offsets.items():
-    results = run_strategy_simulation(rebalance_offset=offset)
-    rebalance_results[label] = {
-        strategy: calc_metrics(data['returns'])
-        for strategy, data in results.items()
-    }
+offset_labels = {offset: label for label, offset in rebalance_offsets.items()}
+rebalance_table, _ = run_parameter_sweep(parameter_grid(rebalance_offset=list(rebalance_offsets.values())))
+rebalance_results = metrics_from_table(rebalance_table, lambda row: offset_labels[row['rebalance_offset']])
 
 print()
 print("【全戦略のリバランス日感度】")
@@ -1130,42 +1010,51 @@ print("=" * 80)
 print("テスト10: モンテカルロ順列検定（統計的有意性）")
 print("=" * 80)
 
-def monte_carlo_permutation_test(strategy_returns, benchmark_returns, n_simulations=10000):
-    """モンテカルロ順列検定"""
-    np.random.seed(42)
-    
-    n = min(len(strategy_returns), len(benchmark_returns))
-    strategy_returns = np.array(strategy_returns[:n])
-    benchmark_returns = np.array(benchmark_returns[:n])
-    
-    excess_returns = strategy_returns - benchmark_returns
-    observed_mean = np.mean(excess_returns)
-    
-    simulated_means = []
-    for _ in range(n_simulations):
-        signs = np.random.choice([-1, 1], size=len(excess_returns))
-        simulated_means.append(np.mean(excess_returns * signs))
-    
-    p_value = np.mean(np.array(simulated_means) >= observed_mean)
-    
-    return {
-        'observed_mean': float(observed_mean),
-        'p_value': float(p_value),
-        'significant_005': p_value < 0.05,
-        'significant_001': p_value < 0.01
-    }
+def monte_carlo_permutation_tests(returns_by_strategy, benchmark_returns, n_simulations=MC_SIMULATIONS):
+    """
+    複数戦略のモンテカルロ順列検定を一括実行
+
+    Args:
+        returns_by_strategy (dict): {戦略名: 月次リターン}
+        benchmark_returns (list): ベンチマークの月次リターン
+        n_simulations (int): シミュレーション数
+
+    Returns:
+        dict: {戦略名: {'observed_mean', 'p_value', 'significant_005', 'significant_001'}}
+
+    Note:
+        ベンチマークとの共通月数（先頭から）が同じ戦略は、同じ符号行列との
+        1回の行列積でまとめて検定する（戦略ごとにseedを固定した従来実装と同じ符号列）
+    """
+    benchmark_returns = np.array(benchmark_returns)
+    by_length = {}
+    for strategy, returns in returns_by_strategy.items():
+        by_length.setdefault(min(len(returns), len(benchmark_returns)), []).append(strategy)
+
+    results = {}
+    for n, names in by_length.items():
+        excess = np.array([np.array(returns_by_strategy[name][:n]) for name in names]) - benchmark_returns[:n]
+        tested = sign_flip_test(excess, n_simulations=n_simulations)
+        for name, observed_mean, p_value in zip(names, tested['observed_mean'], tested['p_value']):
+            results[name] = {
+                'observed_mean': float(observed_mean),
+                'p_value': float(p_value),
+                'significant_005': p_value < 0.05,
+                'significant_001': p_value < 0.01
+            }
+    return {strategy: results[strategy] for strategy in returns_by_strategy}
 
 spy_returns = full_results['SPY']['returns']
-mc_results = {}
+mc_results = monte_carlo_permutation_tests(
+    {strategy: full_results[strategy]['returns'] for strategy in ALL_13_STRATEGIES if strategy != 'SPY'},
+    spy_returns,
+)
 
 print()
-print("【全戦略のモンテカルロ順列検定結果】")
-for strategy in ALL_13_STRATEGIES:
-    if strategy != 'SPY':
-        result = monte_carlo_permutation_test(full_results[strategy]['returns'], spy_returns)
-        mc_results[strategy] = result
-        sig = "✅ 有意" if result['significant_005'] else "❌ 非有意"
-        print(f"{strategy}: 超過リターン={result['observed_mean']*100:.3f}%, p値={result['p_value']:.4f}, {sig}")
+print(f"【全戦略のモンテカルロ順列検定結果】（{MC_SIMULATIONS:,}回）")
+for strategy, result in mc_results.items():
+    sig = "✅ 有意" if result['significant_005'] else "❌ 非有意"
+    print(f"{strategy}: 超過リターン={result['observed_mean']*100:.3f}%, p値={result['p_value']:.4f}, {sig}")
 
 
 # =============================================================================
@@ -1177,13 +1066,15 @@ print("テスト11: Cohen's d（効果量）")
 print("=" * 80)
 
 def calc_cohens_d(strategy_returns, benchmark_returns):
-    """Cohen's dを計算"""
-    n1, n2 = len(strategy_returns), len(benchmark_returns)
-    var1, var2 = np.var(strategy_returns, ddof=1), np.var(benchmark_returns, ddof=1)
+    """Cohen's dを計算（list / ReturnSeries、ReturnSeriesはキャッシュ済みの平均・分散を使う）"""
+    strategy_series = as_return_series(strategy_returns)
+    benchmark_series = as_return_series(benchmark_returns)
+    n1, n2 = strategy_series.n, benchmark_series.n
+    var1, var2 = strategy_series.var_ddof1, benchmark_series.var_ddof1
     pooled_std = np.sqrt(((n1-1)*var1 + (n2-1)*var2) / (n1+n2-2))
     if pooled_std == 0:
         return 0
-    return (np.mean(strategy_returns) - np.mean(benchmark_returns)) / pooled_std
+    return (strategy_series.mean - benchmark_series.mean) / pooled_std
 
 def interpret_cohens_d(d):
     d_abs = abs(d)
@@ -1203,10 +1094,7 @@ print("【全戦略のCohen's d（効果量）】")
 for strategy in ALL_13_STRATEGIES:
     if strategy != 'SPY':
         n = min(len(full_results[strategy]['returns']), len(spy_returns))
-        d = calc_cohens_d(
-            np.array(full_results[strategy]['returns'][:n]),
-            np.array(spy_returns[:n])
-        )
+        d = calc_cohens_d(return_series[strategy].window(0, n), return_series['SPY'].window(0, n))
         cohens_d_results[strategy] = {
             'value': float(d),
             'interpretation': interpret_cohens_d(d)
@@ -1253,62 +1141,6 @@ print("=" * 80)
 print("テスト13: CSCV/PBO（過剰最適化リスク評価）")
 print("=" * 80)
 
-def cscv_pbo(returns, benchmark_returns, n_blocks=16):
-    """CSCV/PBOの簡易版実装"""
-    from itertools import combinations
-    
-    n = min(len(returns), len(benchmark_returns))
-    returns = np.array(returns[:n])
-    benchmark_returns = np.array(benchmark_returns[:n])
-    
-    block_size = n // n_blocks
-    if block_size < 2:
-        return None
-    
-    excess_returns = returns - benchmark_returns
-    
-    blocks = []
-    for i in range(n_blocks):
-        start = i * block_size
-        end = start + block_size if i < n_blocks - 1 else n
-        blocks.append(excess_returns[start:end])
-    
-    train_indices = list(combinations(range(n_blocks), n_blocks // 2))
-    
-    results_list = []
-    for train_idx in train_indices:
-        test_idx = tuple(i for i in range(n_blocks) if i not in train_idx)
-        
-        train_returns = np.concatenate([blocks[i] for i in train_idx])
-        test_returns = np.concatenate([blocks[i] for i in test_idx])
-        
-        train_sharpe = (np.mean(train_returns) * 12) / (np.std(train_returns, ddof=1) * np.sqrt(12)) if np.std(train_returns) > 0 else 0
-        test_sharpe = (np.mean(test_returns) * 12) / (np.std(test_returns, ddof=1) * np.sqrt(12)) if np.std(test_returns) > 0 else 0
-        
-        results_list.append({
-            'train_sharpe': train_sharpe,
-            'test_sharpe': test_sharpe
-        })
-    
-    results_sorted = sorted(results_list, key=lambda x: x['train_sharpe'], reverse=True)
-    
-    test_sharpes = [r['test_sharpe'] for r in results_list]
-    median_test_sharpe = np.median(test_sharpes)
-    
-    n_top = max(1, len(results_list) // 10)
-    pbo_count = sum(1 for i in range(n_top) if results_sorted[i]['test_sharpe'] <= median_test_sharpe)
-    pbo = pbo_count / n_top
-    
-    train_sharpes = [r['train_sharpe'] for r in results_list]
-    rank_correlation = stats.spearmanr(train_sharpes, test_sharpes)[0]
-    
-    return {
-        'n_combinations': len(results_list),
-        'pbo': float(pbo),
-        'rank_correlation': float(rank_correlation),
-        'median_test_sharpe': float(median_test_sharpe)
-    }
-
 def interpret_pbo(pbo):
     if pbo < 0.10:
         return "低"
@@ -1331,6 +1163,22 @@ for strategy in ALL_13_STRATEGIES:
             risk = interpret_pbo(result['pbo'])
             print(f"{strategy}: PBO={result['pbo']:.1%}, リスク={risk}, ランク相関={result['rank_correlation']:.3f}")
 
+# 複数設定のPBO（テスト4のモメンタム期間 × 銘柄数の全設定から訓練期間で最良を選んだ場合）
+param_labels = [f"mom{p['momentum_period']//21}m_top{p['top_n']}" for p in param_grid]
+pbo_grid_results = {}
+
+print()
+print(f"【パラメータグリッド（{len(param_labels)}設定）のPBO（ロジット順位法）】")
+for strategy in ALL_13_STRATEGIES:
+    if strategy != 'SPY':
+        result = cscv_pbo_matrix(returns_matrix(param_outputs, strategy))
+        if result:
+            result['configurations'] = param_labels
+            pbo_grid_results[strategy] = result
+            risk = interpret_pbo(result['pbo'])
+            print(f"{strategy}: PBO={result['pbo']:.1%}, リスク={risk}, "
+                  f"λ平均={result['logit_mean']:.2f}, OOS損失確率={result['prob_oos_loss']:.1%}")
+
 
 # =============================================================================
 # テスト14: Walk-Forward Analysis
@@ -1340,58 +1188,86 @@ print("=" * 80)
 print("テスト14: Walk-Forward Analysis（ウォークフォワード分析）")
 print("=" * 80)
 
-def walk_forward_analysis(returns, window_years=5, step_years=1):
-    """ウォークフォワード分析"""
-    returns = np.array(returns)
-    window_months = window_years * 12
-    step_months = step_years * 12
-    
-    if len(returns) < window_months + step_months:
-        return None
-    
-    periods = []
-    start = 0
-    
-    while start + window_months + step_months <= len(returns):
-        train_returns = returns[start:start + window_months]
-        test_returns = returns[start + window_months:start + window_months + step_months]
-        
-        train_sharpe = (np.mean(train_returns) * 12) / (np.std(train_returns, ddof=1) * np.sqrt(12)) if np.std(train_returns) > 0 else 0
-        test_sharpe = (np.mean(test_returns) * 12) / (np.std(test_returns, ddof=1) * np.sqrt(12)) if np.std(test_returns) > 0 else 0
-        
-        # 劣化率の計算（train_sharpeが0の場合は0とする）
-        if train_sharpe != 0:
-            degradation = (test_sharpe - train_sharpe) / abs(train_sharpe)
-        else:
-            degradation = 0
-        
-        periods.append({
-            'start': start // 12,
-            'train_sharpe': float(train_sharpe),
-            'test_sharpe': float(test_sharpe),
-            'degradation': float(degradation)
-        })
-        
-        start += step_months
-    
-    avg_degradation = np.mean([p['degradation'] for p in periods])
-    consistency = sum(1 for p in periods if p['test_sharpe'] > 0) / len(periods)
-    
+def walk_forward_batch(returns_by_strategy, train_months=60, test_months=12, step_months=None):
+    """
+    複数戦略のウォークフォワード分析を一括計算
+
+    Args:
+        returns_by_strategy (dict): {戦略名: 月次リターン}
+        train_months (int): 訓練期間（月数）
+        test_months (int): テスト期間（月数）
+        step_months (int): ステップ（月数、Noneの場合はtest_months）
+
+    Returns:
+        dict: {戦略名: 結果辞書}（期間がない系列はNone）
+            - n_periods: 期間数
+            - avg_degradation / consistency: 劣化率の平均 / テストSharpe > 0 の割合
+            - periods: 期間ごとの start（年）/ train_sharpe / test_sharpe / degradation
+
+    Note:
+        同じ月数の戦略はwindows.walk_forward_matrixで一括計算
+    """
+    results = {}
+    for names, matrix in group_by_length(returns_by_strategy):
+        wfa = walk_forward_matrix(matrix, train_months, test_months, step_months)
+        for i, name in enumerate(names):
+            results[name] = None if wfa is None else {
+                'n_periods': wfa['n_periods'],
+                'avg_degradation': float(wfa['avg_degradation'][i]),
+                'consistency': float(wfa['consistency'][i]),
+                'periods': [
+                    {
+                        'start': int(start) // 12,
+                        'train_sharpe': float(wfa['train_sharpe'][i, k]),
+                        'test_sharpe': float(wfa['test_sharpe'][i, k]),
+                        'degradation': float(wfa['degradation'][i, k]),
+                    }
+                    for k, start in enumerate(wfa['starts'])
+                ],
+            }
+    return {name: results[name] for name in returns_by_strategy}
+
+
+def walk_forward_grid_batch(returns_by_strategy, train_years_list, test_months_list):
+    """
+    訓練期間 × テスト期間の全組み合わせで複数戦略のウォークフォワード分析
+
+    Args:
+        returns_by_strategy (dict): {戦略名: 月次リターン}
+        train_years_list (list): 訓練期間（年）のリスト
+        test_months_list (list): テスト期間（月数、ステップも同じ）のリスト
+
+    Returns:
+        dict: {'train{年}y_test{月}m': {戦略名: n_periods / avg_degradation / consistency}}
+            （期間がない戦略は含めない）
+    """
+    grid_results = {
+        f"train{years}y_test{months}m": {}
+        for years in train_years_list for months in test_months_list
+    }
+    for names, matrix in group_by_length(returns_by_strategy):
+        grid = walk_forward_grid(matrix, [years * 12 for years in train_years_list], test_months_list)
+        for (train_months, test_months), wfa in grid.items():
+            pair_results = grid_results[f"train{train_months // 12}y_test{test_months}m"]
+            for i, name in enumerate(names):
+                pair_results[name] = {
+                    'n_periods': wfa['n_periods'],
+                    'avg_degradation': float(wfa['avg_degradation'][i]),
+                    'consistency': float(wfa['consistency'][i]),
+                }
     return {
-        'n_periods': len(periods),
-        'avg_degradation': float(avg_degradation),
-        'consistency': float(consistency),
-        'periods': periods
+        key: {name: pair[name] for name in returns_by_strategy if name in pair}
+        for key, pair in grid_results.items()
     }
 
+wfa_returns = {strategy: full_results[strategy]['returns'] for strategy in ALL_13_STRATEGIES}
 wfa_results = {}
 
 print(f"\n訓練期間: 5年、テスト期間: 1年、ステップ: 1年")
 print()
 print("【全戦略のWalk-Forward Analysis】")
 
-for strategy in ALL_13_STRATEGIES:
-    result = walk_forward_analysis(full_results[strategy]['returns'])
+for strategy, result in walk_forward_batch(wfa_returns).items():
     if result:
         wfa_results[strategy] = {
             'n_periods': result['n_periods'],
@@ -1400,6 +1276,95 @@ for strategy in ALL_13_STRATEGIES:
         }
         print(f"{strategy}: 期間数={result['n_periods']}, 平均劣化={result['avg_degradation']:.1%}, 一貫性={result['consistency']:.1%}")
 
+# 訓練期間 × テスト期間の感応度（累積和を1回だけ計算して全組み合わせを評価）
+wfa_grid_results = walk_forward_grid_batch(wfa_returns, WFA_TRAIN_YEARS, WFA_TEST_MONTHS)
+
+print()
+print(f"【訓練期間 × テスト期間別の一貫性（訓練{WFA_TRAIN_YEARS}年 × テスト{WFA_TEST_MONTHS}ヶ月）】")
+for strategy in ALL_13_STRATEGIES:
+    cells = [
+        f"{pair[strategy]['consistency']:.0%}" if strategy in pair else "-"
+        for pair in wfa_grid_results.values()
+    ]
+    print(f"{strategy}: {' / '.join(cells)}")
+
+
+# Walk-Forward最適化（各訓練窓でテスト4のグリッドから最良設定を選び直し、テスト期間をつなぐ）
+def walk_forward_config_matrix(outputs, labels, strategy):
+    """
+    Walk-Forward最適化の候補設定 × 月数のリターン行列
+
+    Args:
+        outputs (list): run_parameter_sweepの結果（gridと同順）
+        labels (list): 各パラメータのラベル
+        strategy (str): 戦略名
+
+    Returns:
+        tuple: (行列, 設定ラベルのリスト)（直近の共通月数にそろえる）
+
+    Note:
+        VolScale戦略はモメンタム期間 × 銘柄数 × 目標Vol（WFO_TARGET_VOLS、攻撃型は
+        attack_vol_multiplier倍）を候補とし、目標Volは保存済みの実現Volから
+        再シミュレーションなしで適用する
+    """
+    if 'VolScale' not in strategy:
+        return returns_matrix(outputs, strategy), list(labels)
+    base = strategy.replace('_VolScale', '')
+    targets = [context.volscale_targets(target_vol)[base] for target_vol in WFO_TARGET_VOLS]
+    series, config_labels = [], []
+    for results, label in zip(outputs, labels):
+        scaled = apply_volscale_grid(results[strategy], targets, [(VOLSCALE_MIN, VOLSCALE_MAX)])[:, 0, :]
+        series.extend(scaled)
+        config_labels.extend(f"{label}_tv{target_vol*100:.0f}" for target_vol in WFO_TARGET_VOLS)
+    n_months = min(len(values) for values in series)
+    return np.array([values[len(values) - n_months:] for values in series]), config_labels
+
+wfo_results = {}
+
+print()
+print(f"【Walk-Forward最適化（訓練{WFO_TRAIN_MONTHS}ヶ月 / テスト{WFO_TEST_MONTHS}ヶ月ごとに設定を再選択）】")
+print("※ 固定=現在値（6ヶ月・Top5・目標Vol14%）、後知恵=全期間Sharpe最大の設定（いずれも同じテスト月で評価）")
+for strategy in ALL_13_STRATEGIES:
+    if strategy == 'SPY':
+        continue
+    matrix, config_labels = walk_forward_config_matrix(param_outputs, param_labels, strategy)
+    baseline = config_labels.index('mom6m_top5_tv14' if 'VolScale' in strategy else 'mom6m_top5')
+    hindsight = int(np.argmax(calc_sharpe_matrix(matrix)))
+    strategy_results = {}
+    for mode, anchored in (('anchored', True), ('rolling', False)):
+        wfo = walk_forward_optimize(matrix, WFO_TRAIN_MONTHS, WFO_TEST_MONTHS, anchored=anchored)
+        if wfo is None:
+            continue
+        oos_start = int(wfo['test_starts'][0])
+        oos_end = oos_start + len(wfo['oos_returns'])  # 末尾のテスト期間に満たない月は含めない
+        oos_metrics = calc_metrics(wfo['oos_returns'])
+        strategy_results[mode] = {
+            'n_windows': len(wfo['test_starts']),
+            'n_configurations': len(config_labels),
+            'oos_months': len(wfo['oos_returns']),
+            'oos_sharpe': oos_metrics['sharpe'],
+            'oos_cagr': oos_metrics['cagr'],
+            'oos_max_dd': oos_metrics['max_dd'],
+            'baseline_sharpe': calc_metrics(matrix[baseline, oos_start:oos_end])['sharpe'],
+            'hindsight_sharpe': calc_metrics(matrix[hindsight, oos_start:oos_end])['sharpe'],
+            'hindsight_configuration': config_labels[hindsight],
+            'avg_train_sharpe': float(np.mean(wfo['train_sharpe'])),
+            'avg_test_sharpe': float(np.mean(wfo['test_sharpe'])),
+            'selected': [config_labels[i] for i in wfo['selected']],
+            'selection_frequency': {
+                config_labels[i]: float(freq)
+                for i, freq in enumerate(wfo['selection_frequency']) if freq > 0
+            },
+        }
+    if strategy_results:
+        wfo_results[strategy] = strategy_results
+        line = ", ".join(
+            f"{mode} OOS Sharpe={r['oos_sharpe']:.2f}（{r['n_windows']}窓）"
+            for mode, r in strategy_results.items()
+        )
+        r = next(iter(strategy_results.values()))
+        print(f"{strategy}: {line}, 固定={r['baseline_sharpe']:.2f}, 後知恵={r['hindsight_sharpe']:.2f}")
+
 
 # =============================================================================
 # テスト15: Out-of-Sample検証（ホールドアウト）
@@ -1409,47 +1374,45 @@ print("=" * 80)
 print("テスト15: Out-of-Sample検証（最後20%ホールドアウト）")
 print("=" * 80)
 
-def holdout_validation(returns, train_ratio=0.8):
+def holdout_batch(returns_by_strategy, train_ratio=0.8):
     """
-    Out-of-Sample検証（ホールドアウト方式）
-    最後20%を完全に未使用のテストデータとして検証
-    
+    複数戦略のホールドアウト検証を一括計算
+
     Args:
-        returns: 月次リターンの配列
-        train_ratio: 訓練データの割合（デフォルト0.8）
-    
+        returns_by_strategy (dict): {戦略名: 月次リターン}
+        train_ratio (float): 訓練データの割合
+
     Returns:
-        dict: 訓練期間とテスト期間のパフォーマンス比較
+        dict: {戦略名: 結果辞書}
+            - train_months / test_months: 訓練 / テスト期間の月数（先頭からtrain_ratio）
+            - train_sharpe / test_sharpe / sharpe_degradation
+            - train_cagr / test_cagr / cagr_degradation
+            - test_p_value / test_significant: テスト期間の平均 = 0 のt検定
+            - is_robust: 劣化が50%未満かつテストSharpe > 0
+
+    Note:
+        同じ月数の戦略はwindows.holdout_matrixで一括計算
     """
-    returns = np.array(returns)
-    split = int(len(returns) * train_ratio)
-    
-    train_returns = returns[:split]
-    test_returns = returns[split:]
-    
-    train_metrics = calc_metrics(train_returns)
-    test_metrics = calc_metrics(test_returns)
-    
-    # パフォーマンス劣化率の計算
-    sharpe_degradation = (test_metrics['sharpe'] - train_metrics['sharpe']) / abs(train_metrics['sharpe']) if train_metrics['sharpe'] != 0 else 0
-    cagr_degradation = (test_metrics['cagr'] - train_metrics['cagr']) / abs(train_metrics['cagr']) if train_metrics['cagr'] != 0 else 0
-    
-    # テスト期間の有意性検定（t検定）
-    t_stat, p_value = stats.ttest_1samp(test_returns, 0)
-    
-    return {
-        'train_months': len(train_returns),
-        'test_months': len(test_returns),
-        'train_sharpe': float(train_metrics['sharpe']),
-        'test_sharpe': float(test_metrics['sharpe']),
-        'sharpe_degradation': float(sharpe_degradation),
-        'train_cagr': float(train_metrics['cagr']),
-        'test_cagr': float(test_metrics['cagr']),
-        'cagr_degradation': float(cagr_degradation),
-        'test_p_value': float(p_value),
-        'test_significant': bool(p_value < 0.05),
-        'is_robust': bool(sharpe_degradation > -0.5 and test_metrics['sharpe'] > 0)  # 劣化が50%未満かつテスト期間もプラス
-    }
+    results = {}
+    for names, matrix in group_by_length(returns_by_strategy):
+        holdout = holdout_matrix(matrix, train_ratio)
+        for i, name in enumerate(names):
+            p_value = holdout['test_p_value'][i]
+            sharpe_degradation = holdout['sharpe_degradation'][i]
+            results[name] = {
+                'train_months': holdout['train_months'],
+                'test_months': holdout['test_months'],
+                'train_sharpe': float(holdout['train_sharpe'][i]),
+                'test_sharpe': float(holdout['test_sharpe'][i]),
+                'sharpe_degradation': float(sharpe_degradation),
+                'train_cagr': float(holdout['train_cagr'][i]),
+                'test_cagr': float(holdout['test_cagr'][i]),
+                'cagr_degradation': float(holdout['cagr_degradation'][i]),
+                'test_p_value': float(p_value),
+                'test_significant': bool(p_value < 0.05),
+                'is_robust': bool(sharpe_degradation > -0.5 and holdout['test_sharpe'][i] > 0)  # 劣化が50%未満かつテスト期間もプラス
+            }
+    return {name: results[name] for name in returns_by_strategy}
 
 oos_results = {}
 print()
@@ -1457,8 +1420,7 @@ print(f"訓練期間: 最初80% / テスト期間: 最後20%")
 print()
 print("【全戦略のOut-of-Sample検証】")
 
-for strategy in ALL_13_STRATEGIES:
-    result = holdout_validation(full_results[strategy]['returns'])
+for strategy, result in holdout_batch(wfa_returns).items():
     oos_results[strategy] = result
     robust_str = "✅ Yes" if result['is_robust'] else "❌ No"
     print(f"{strategy}: Train Sharpe={result['train_sharpe']:.2f}, Test Sharpe={result['test_sharpe']:.2f}, 劣化率={result['sharpe_degradation']:.1%}, p値={result['test_p_value']:.4f}, {robust_str}")
@@ -1478,26 +1440,26 @@ def regime_change_test(returns, split_ratio=0.5):
     前半と後半でリターン分布が変化したかを検定
     
     Args:
-        returns: 月次リターンの配列
+        returns: 月次リターンの配列（ReturnSeriesの場合は前半/後半の統計をキャッシュ）
         split_ratio: 分割位置（デフォルト0.5）
     
     Returns:
         dict: KS検定結果と分布の変化量
     """
-    returns = np.array(returns)
-    split = int(len(returns) * split_ratio)
+    series = as_return_series(returns)
+    split = int(series.n * split_ratio)
     
-    first_half = returns[:split]
-    second_half = returns[split:]
+    first_half = series.window(0, split)
+    second_half = series.window(split, series.n)
     
     # KS検定
-    ks_stat, ks_p_value = stats.ks_2samp(first_half, second_half)
+    ks_stat, ks_p_value = stats.ks_2samp(first_half.values, second_half.values)
     
     # 分布の特性変化
-    first_mean = np.mean(first_half)
-    second_mean = np.mean(second_half)
-    first_std = np.std(first_half, ddof=1)
-    second_std = np.std(second_half, ddof=1)
+    first_mean = first_half.mean
+    second_mean = second_half.mean
+    first_std = first_half.std_ddof1
+    second_std = second_half.std_ddof1
     
     mean_change = (second_mean - first_mean) / first_std if first_std > 0 else 0  # 標準化された平均変化
     vol_change = (second_std - first_std) / first_std if first_std > 0 else 0  # ボラティリティ変化率
@@ -1521,7 +1483,7 @@ print()
 print("【全戦略のRegime Change検定】")
 
 for strategy in ALL_13_STRATEGIES:
-    result = regime_change_test(full_results[strategy]['returns'])
+    result = regime_change_test(return_series[strategy])
     regime_change_results[strategy] = result
     change_str = "⚠️ あり" if result['regime_changed'] else "✅ なし"
     print(f"{strategy}: KS統計量={result['ks_statistic']:.4f}, p値={result['ks_p_value']:.4f}, 平均変化={result['mean_change_std']:.2f}σ, Vol変化={result['vol_change_pct']:.1%}, {change_str}")
@@ -1609,6 +1571,7 @@ print()
 print("=" * 80)
 print("結果サマリー")
 print("=" * 80)
+print(f"選択キャッシュ: 計算 {selections.misses}回 / 再利用 {selections.hits}回")
 
 output = {
     'test1_cost_sensitivity': {
@@ -1618,6 +1581,11 @@ output = {
         }
         for cost, data in cost_results.items()
     },
+    'test1_breakeven_curve': {
+        'costs': BREAKEVEN_COST_GRID.tolist(),
+        'spy_sharpe': float(spy_sharpe),
+        'strategies': breakeven_results,
+    },
     'test2_regime_breakdown': {
         regime: {
             strategy: {k: float(v) for k, v in metrics.items()} if metrics else {}
@@ -1625,6 +1593,13 @@ output = {
         }
         for regime, data in regime_results.items()
     },
+    'test2_regime_rule_sensitivity': {
+        key: {
+            strategy: {k: float(v) for k, v in metrics.items()}
+            for strategy, metrics in data.items()
+        }
+        for key, data in regime_rule_results.items()
+    },
     'test3_tail_risk': {
         strategy: {k: float(v) for k, v in metrics.items()}
         for strategy, metrics in tail_results.items()
@@ -1642,8 +1617,8 @@ output = {
     },
     'test6_dsr_psr': {
         strategy: {
-            'psr': float(calc_psr(full_results[strategy]['returns'])['psr']),
-            'dsr': float(calc_dsr(full_results[strategy]['returns'], n_trials=12)['dsr']),
+            'psr': float(calc_psr(return_series[strategy])['psr']),
+            'dsr': float(calc_dsr(return_series[strategy], n_trials=12)['dsr']),
         }
         for strategy in ALL_13_STRATEGIES
     },
@@ -1659,6 +1634,11 @@ output = {
         }
         for strategy, factors in scale_factors.items()
     },
+    'test8_volscale_surface': {
+        'target_vols': VOLSCALE_TARGET_GRID.tolist(),
+        'clip_bounds': [list(bounds) for bounds in VOLSCALE_CLIP_GRID],
+        'strategies': volscale_surface_results,
+    },
     'test9_rebalance_sensitivity': {
         label: {
             strategy: {k: float(v) for k, v in metrics.items()}
@@ -1685,7 +1665,10 @@ output = {
         for strategy, data in bonferroni_results.items()
     },
     'test13_pbo': pbo_results,
+    'test13_pbo_parameter_grid': pbo_grid_results,
     'test14_wfa': wfa_results,
+    'test14_wfa_grid': wfa_grid_results,
+    'test14_wfo': wfo_results,
     'test15_oos': oos_results,
     'test16_regime_change': regime_change_results,
     'test17_fdr': fdr_results,
@@ -1699,37 +1682,13 @@ print("=" * 80)
 print("総合評価生成（13戦略 × 5項目）")
 print("=" * 80)
 
-# grail.jsonから全戦略のリターンを取得
-grail_path = '/home/ubuntu/portfolio-advisor/analysis/grail.json'
-with open(grail_path, 'r', encoding='utf-8') as f:
-    grail_data = json.load(f)
-
-all_strategies = list(grail_data['summary'].keys())
-print(f"対象戦略: {all_strategies}")
+# テスト10〜14の結果（メモリ上、全期間の月次リターンから計算済み）をそのまま採点に使う
+print(f"対象戦略: {ALL_13_STRATEGIES}")
 print()
 
-# 累積リターンから月次リターンを計算する関数
-def calc_monthly_returns_from_cumulative(cumulative):
-    """100スタートの累積リターンから月次リターンを計算"""
-    monthly = []
-    for i in range(len(cumulative)):
-        if i == 0:
-            # 最初の月は100からの変化
-            monthly.append((cumulative[i] / 100) - 1)
-        else:
-            if cumulative[i-1] != 0:
-                monthly.append(cumulative[i] / cumulative[i-1] - 1)
-            else:
-                monthly.append(0)
-    return monthly
-
-# SPYリターンを取得（累積リターンから計算）
-spy_cumulative = grail_data['monthly_data']['cumulative_returns']['SPY']
-spy_monthly_returns = calc_monthly_returns_from_cumulative(spy_cumulative)
-
 comprehensive_evaluation = {}
 
-for strategy in all_strategies:
+for strategy in ALL_13_STRATEGIES:
     if strategy == 'SPY':
         # SPYはベンチマークなのでスキップ
         comprehensive_evaluation[strategy] = {
@@ -1743,14 +1702,7 @@ for strategy in all_strategies:
         }
         continue
     
-    # 累積リターンから月次リターンを計算
-    strategy_cumulative = grail_data['monthly_data']['cumulative_returns'].get(strategy, [])
-    if strategy_cumulative:
-        strategy_returns = calc_monthly_returns_from_cumulative(strategy_cumulative)
-    else:
-        strategy_returns = []
-    
-    if not strategy_returns or len(strategy_returns) < 60:
+    if return_series[strategy].n < 60:
         # データ不足の場合
         comprehensive_evaluation[strategy] = {
             'monte_carlo': {'p_value': 1.0, 'significant': False},
@@ -1763,24 +1715,19 @@ for strategy in all_strategies:
         }
         continue
     
-    # データ長を揃える
-    n = min(len(strategy_returns), len(spy_monthly_returns))
-    strat_ret = np.array(strategy_returns[:n])
-    spy_ret = np.array(spy_monthly_returns[:n])
+    # 1. モンテカルロ順列検定（テスト10）
+    mc_result = mc_results[strategy]
     
-    # 1. モンテカルロ順列検定
-    mc_result = monte_carlo_permutation_test(strat_ret, spy_ret)
+    # 2. Cohen's d（テスト11）
+    d_value = cohens_d_results[strategy]['value']
+    d_interp = cohens_d_results[strategy]['interpretation']
     
-    # 2. Cohen's d
-    d_value = calc_cohens_d(strat_ret, spy_ret)
-    d_interp = interpret_cohens_d(d_value)
+    # 3. Bonferroni補正（テスト12、SPY以外の戦略数で補正）
+    bonf_result = bonferroni_results[strategy]
+    bonf_sig = bonf_result['significant']
     
-    # 3. Bonferroni補正（13戦略なのでalpha=0.05/13）
-    bonferroni_alpha_all = 0.05 / 13
-    bonf_sig = mc_result['p_value'] < bonferroni_alpha_all
-    
-    # 4. PBO
-    pbo_result = cscv_pbo(strat_ret, spy_ret)
+    # 4. PBO（テスト13）
+    pbo_result = pbo_results.get(strategy)
     if pbo_result:
         pbo_val = pbo_result['pbo']
         pbo_risk = interpret_pbo(pbo_val)
@@ -1788,8 +1735,8 @@ for strategy in all_strategies:
         pbo_val = 0.5
         pbo_risk = '中'
     
-    # 5. WFA
-    wfa_result = walk_forward_analysis(strat_ret)
+    # 5. WFA（テスト14）
+    wfa_result = wfa_results.get(strategy)
     if wfa_result:
         wfa_consistency = wfa_result['consistency']
         wfa_degradation = wfa_result['avg_degradation']
@@ -1820,8 +1767,8 @@ for strategy in all_strategies:
             'interpretation': d_interp
         },
         'bonferroni': {
-            'p_value': float(mc_result['p_value']),
-            'bonferroni_alpha': float(bonferroni_alpha_all),
+            'p_value': float(bonf_result['p_value']),
+            'bonferroni_alpha': float(bonf_result['bonferroni_alpha']),
             'significant': bool(bonf_sig)
         },
         'pbo': {
@@ -1859,7 +1806,7 @@ evaluations = [
     ("テスト3: テールリスク", f"CVaR(5%)={tail_results['D3+防御型_VolScale']['cvar_5']*100:.1f}%", "✅" if tail_results['D3+防御型_VolScale']['cvar_5'] > -0.10 else "⚠️"),
     ("テスト4: パラメータ感度", f"{stable_count}/{total_count}が70%以上維持", "✅" if stable_count >= total_count * 0.7 else "⚠️"),
     ("テスト5: ブートストラップ", f"P(Sharpe>1)={bootstrap_results['D3+防御型_VolScale']['prob_sharpe_gt_1']*100:.0f}%", "✅" if bootstrap_results['D3+防御型_VolScale']['prob_sharpe_gt_1'] > 0.8 else "⚠️"),
-    ("テスト6: DSR/PSR", f"DSR={calc_dsr(full_results['D3+防御型_VolScale']['returns'], n_trials=12)['dsr']*100:.0f}%", "✅" if calc_dsr(full_results['D3+防御型_VolScale']['returns'], n_trials=12)['dsr'] > 0.5 else "⚠️"),
+    ("テスト6: DSR/PSR", f"DSR={calc_dsr(return_series['D3+防御型_VolScale'], n_trials=12)['dsr']*100:.0f}%", "✅" if calc_dsr(return_series['D3+防御型_VolScale'], n_trials=12)['dsr'] > 0.5 else "⚠️"),
     ("テスト7: サバイバーシップ補正", f"補正後Sharpe={adjusted_results['D3+防御型_VolScale']['sharpe']:.2f}", "✅" if adjusted_results['D3+防御型_VolScale']['sharpe'] > 1.0 else "⚠️"),
     ("テスト8: レバレッジ", f"レバ>1比率={np.sum(np.array(scale_factors['D3+防御型_VolScale']) > 1.0) / len(scale_factors['D3+防御型_VolScale'])*100:.0f}%", "✅" if np.sum(np.array(scale_factors['D3+防御型_VolScale']) > 1.0) / len(scale_factors['D3+防御型_VolScale']) < 0.5 else "⚠️"),
     ("テスト9: リバランス日感度", f"最大差={max_diff:.2f}", "✅" if max_diff < 0.1 else "⚠️"),
@@ -1868,5 +1815,8 @@ evaluations = [
 for test_name, result, verdict in evaluations:
     print(f"{verdict} {test_name}: {result}")
 
+print()
+print(f"シミュレーション結果キャッシュ: {result_cache.report()}")
+
 print()
 print("=" * 80)
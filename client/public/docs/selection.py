@@ -0,0 +1,316 @@
+"""
+銘柄選択キャッシュ（選択銘柄・ウェイト・実現ポートフォリオVol）
+
+概要:
+    1つのシミュレーション月で、D2/D3/防御型TOP5/防御型TOP3の選択結果は
+    通常版・+防御型・VolScale版の複数戦略に共有される。
+    SelectionCacheは (universe, selection_idx, top_n, momentum_period) をキーに
+    選択銘柄・リスク逆数ウェイト・実現ポートフォリオVolを一度だけ計算する。
+    VolScale版は目標Volが違うだけなので、スケールは保存済みの実現Volから求まる。
+
+    キャッシュはシミュレーションの呼び出しをまたいで共有できるため、
+    取引コストやレジーム判定だけを変えた再シミュレーションでは
+    選択計算が一切発生しない。
+
+    SelectionCache.matrix() は同じ計算を全月分まとめて行い、
+    月数×銘柄数のウェイト行列（engine.run_backtest_matrix用）を返す。
+
+使用例:
+    >>> selections = SelectionCache(ranks, vol_matrix, close, ALL_SYMBOLS, WEIGHT_CAP,
+    ...                             VOLSCALE_LOOKBACK, VOL_FLOOR)
+    >>> d3 = selections.get('sp500', selection_idx, 5, 126)
+    >>> d3.symbols, d3.weights, d3.realized_vol
+    >>> d3_all = selections.matrix('sp500', selection_indices, 5, 126)
+    >>> d3_all.dense(len(ALL_SYMBOLS))  # 月数×銘柄数
+"""
+
+import numpy as np
+
+import kernels
+
+# 実現Volが計算できない場合（データ不足・全銘柄欠損・Vol=0）の値
+DEFAULT_PORTFOLIO_VOL = 0.15
+
+
+def inverse_vol_weights(vols, weight_cap):
+    """
+    リスク逆数ウェイト（ウェイト上限適用後に再正規化）
+
+    Args:
+        vols (np.ndarray): 銘柄別の年率ボラティリティ
+        weight_cap (float): 単一銘柄ウェイト上限
+
+    Returns:
+        np.ndarray: ウェイト（合計=1.0）
+    """
+    inv_vols = 1 / vols
+    weights = np.minimum(inv_vols / np.sum(inv_vols), weight_cap)
+    return weights / np.sum(weights)
+
+
+def inverse_vol_weight_matrix(vols, weight_cap):
+    """
+    inverse_vol_weightsの行ごとの一括版
+
+    Args:
+        vols (np.ndarray): 選択銘柄の年率ボラティリティ（M×k）
+        weight_cap (float): 単一銘柄ウェイト上限
+
+    Returns:
+        np.ndarray: ウェイト（M×k、各行の合計=1.0、NaNを含む行はNaN）
+
+    Note:
+        kernels.ENABLEDの場合はNumbaカーネル
+    """
+    if kernels.ENABLED:
+        return kernels.inverse_vol_weight_matrix(vols, weight_cap)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        inv_vols = 1 / vols
+        weights = np.minimum(inv_vols / np.sum(inv_vols, axis=1, keepdims=True), weight_cap)
+        return weights / np.sum(weights, axis=1, keepdims=True)
+
+
+def portfolio_volatility(close, cols, weight_arr, idx, lookback, vol_floor):
+    """
+    ポートフォリオの実現ボラティリティ（VolScale用）
+
+    Args:
+        close (np.ndarray): 終値行列（T×N）
+        cols (np.ndarray): 選択銘柄の列番号
+        weight_arr (np.ndarray): 選択銘柄のウェイト（colsと同順）
+        idx (int): 選択日インデックス
+        lookback (int): 計算期間（日数）
+        vol_floor (float): ボラティリティフロア
+
+    Returns:
+        float: ポートフォリオの年率ボラティリティ
+
+    Note:
+        - 直近lookback本の日次リターンのウェイト加重和の標準偏差×√252
+        - 欠損を含む銘柄は除外してウェイトを再正規化
+        - 計算できない場合はDEFAULT_PORTFOLIO_VOL
+    """
+    if idx < lookback:
+        return DEFAULT_PORTFOLIO_VOL
+
+    window = close[idx - lookback:idx + 1, cols]
+    returns_matrix = np.diff(window, axis=0) / window[:-1]
+    complete = ~np.any(np.isnan(returns_matrix), axis=0)
+    if not np.any(complete):
+        return DEFAULT_PORTFOLIO_VOL
+
+    weight_arr = weight_arr[complete] / weight_arr[complete].sum()
+    portfolio_returns = np.dot(returns_matrix[:, complete], weight_arr)
+    vol = np.std(portfolio_returns) * np.sqrt(252)
+
+    return max(vol, vol_floor) if vol > 0 else DEFAULT_PORTFOLIO_VOL
+
+
+def portfolio_volatility_matrix(close, cols, weights, idx, lookback, vol_floor):
+    """
+    portfolio_volatilityの全月一括版
+
+    Args:
+        close (np.ndarray): 終値行列（T×N）
+        cols (np.ndarray): 選択銘柄の列番号（M×k）
+        weights (np.ndarray): 選択銘柄のウェイト（M×k）
+        idx (np.ndarray): 選択日インデックス（長さM）
+        lookback (int): 計算期間（日数）
+        vol_floor (float): ボラティリティフロア
+
+    Returns:
+        np.ndarray: ポートフォリオの年率ボラティリティ（長さM）
+    """
+    vol = np.full(len(idx), DEFAULT_PORTFOLIO_VOL)
+    enough = idx >= lookback
+    if not np.any(enough):
+        return vol
+
+    rows = idx[enough, None] + np.arange(-lookback, 1)[None, :]
+    window = close[rows[:, :, None], cols[enough, None, :]]  # M'×(lookback+1)×k
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = np.diff(window, axis=1) / window[:, :-1]
+    complete = ~np.any(np.isnan(returns), axis=1)
+    w = np.where(complete, weights[enough], 0.0)
+    w_sum = w.sum(axis=1)
+    w = w / np.where(w_sum > 0, w_sum, 1.0)[:, None]
+
+    portfolio_returns = np.einsum('mlk,mk->ml', np.where(complete[:, None, :], returns, 0.0), w)
+    with np.errstate(invalid='ignore'):
+        sub = np.std(portfolio_returns, axis=1) * np.sqrt(252)
+        sub = np.where(sub > 0, np.maximum(sub, vol_floor), DEFAULT_PORTFOLIO_VOL)
+    sub[~np.any(complete, axis=1)] = DEFAULT_PORTFOLIO_VOL
+    vol[enough] = sub
+    return vol
+
+
+class Selection:
+    """
+    1回分の銘柄選択結果
+
+    Attributes:
+        cols (np.ndarray): 選択銘柄の列番号（モメンタム降順）
+        symbols (list): 選択銘柄シンボル（colsと同順）
+        weight_arr (np.ndarray): ウェイト（colsと同順）
+        weights (dict): {symbol: weight}（合計=1.0）
+        realized_vol (float): 実現ポートフォリオVol（選択なしの場合はNone）
+
+    Note:
+        選択銘柄がない場合（有効銘柄がtop_n未満）はbool値がFalse
+    """
+
+    __slots__ = ('cols', 'symbols', 'weight_arr', 'weights', 'realized_vol')
+
+    def __init__(self, cols, symbols, weight_arr, realized_vol):
+        self.cols = cols
+        self.symbols = symbols
+        self.weight_arr = weight_arr
+        self.weights = dict(zip(symbols, weight_arr.tolist()))
+        self.realized_vol = realized_vol
+
+    def __bool__(self):
+        return len(self.symbols) > 0
+
+
+class SelectionMatrix:
+    """
+    全月分の銘柄選択結果
+
+    Attributes:
+        cols (np.ndarray): 選択銘柄の列番号（M×top_n、モメンタム降順）
+        weights (np.ndarray): ウェイト（M×top_n、選択なしの月は0）
+        realized_vol (np.ndarray): 実現ポートフォリオVol（長さM、選択なしの月はNaN）
+        valid (np.ndarray): 選択ありの月（長さM、bool）
+    """
+
+    __slots__ = ('cols', 'weights', 'realized_vol', 'valid')
+
+    def __init__(self, cols, weights, realized_vol, valid):
+        self.cols = cols
+        self.weights = weights
+        self.realized_vol = realized_vol
+        self.valid = valid
+
+    def dense(self, n_symbols):
+        """
+        ウェイト行列
+
+        Args:
+            n_symbols (int): 全銘柄数N
+
+        Returns:
+            np.ndarray: ウェイト（M×N、選択外の銘柄・選択なしの月は0）
+        """
+        weights = np.zeros((len(self.valid), n_symbols))
+        weights[np.arange(len(self.valid))[:, None], self.cols] = self.weights
+        return weights
+
+    def take(self, rows):
+        """
+        指定した月だけを取り出した選択結果
+
+        Args:
+            rows (np.ndarray): 月の位置またはboolマスク
+
+        Returns:
+            SelectionMatrix: 部分集合
+        """
+        return SelectionMatrix(self.cols[rows], self.weights[rows], self.realized_vol[rows], self.valid[rows])
+
+
+class SelectionCache:
+    """
+    銘柄選択キャッシュ
+
+    Attributes:
+        ranks (RankCache): モメンタム順位キャッシュ
+        vol_matrix (np.ndarray): 銘柄別ボラティリティ（T×N、rolling_volatilityの出力）
+        close (np.ndarray): 終値行列（T×N）
+        symbols (list): 列順の銘柄シンボル
+        weight_cap (float): 単一銘柄ウェイト上限
+        lookback (int): 実現ポートフォリオVolの計算期間（日数）
+        vol_floor (float): ボラティリティフロア
+        hits / misses (int): キャッシュのヒット数 / 計算回数
+    """
+
+    def __init__(self, ranks, vol_matrix, close, symbols, weight_cap, lookback, vol_floor):
+        self.ranks = ranks
+        self.vol_matrix = vol_matrix
+        self.close = close
+        self.symbols = symbols
+        self.weight_cap = weight_cap
+        self.lookback = lookback
+        self.vol_floor = vol_floor
+        self.hits = 0
+        self.misses = 0
+        self._selections = {}
+        self._matrices = {}
+
+    def __len__(self):
+        return len(self._selections) + len(self._matrices)
+
+    def get(self, universe, idx, top_n, momentum_period):
+        """
+        銘柄選択（初回のみ計算）
+
+        Args:
+            universe (str): ユニバース名（'sp100' / 'sp500' / 'defense'）
+            idx (int): 選択日インデックス
+            top_n (int): 選択銘柄数
+            momentum_period (int): モメンタム期間（日数）
+
+        Returns:
+            Selection: 選択結果（モメンタム上位top_n、リスク逆数ウェイト）
+        """
+        key = (universe, int(idx), int(top_n), int(momentum_period))
+        selection = self._selections.get(key)
+        if selection is not None:
+            self.hits += 1
+            return selection
+
+        self.misses += 1
+        cols = self.ranks.top(universe, momentum_period, idx, top_n)
+        if len(cols) == 0:
+            selection = Selection(cols, [], np.empty(0), None)
+        else:
+            weight_arr = inverse_vol_weights(self.vol_matrix[idx, cols], self.weight_cap)
+            realized_vol = portfolio_volatility(
+                self.close, cols, weight_arr, idx, self.lookback, self.vol_floor
+            )
+            selection = Selection(cols, [self.symbols[c] for c in cols], weight_arr, realized_vol)
+        self._selections[key] = selection
+        return selection
+
+    def matrix(self, universe, idx, top_n, momentum_period):
+        """
+        全月分の銘柄選択（同じ選択日配列なら初回のみ計算）
+
+        Args:
+            universe (str): ユニバース名
+            idx (np.ndarray): 選択日インデックス（長さM）
+            top_n (int): 選択銘柄数
+            momentum_period (int): モメンタム期間（日数）
+
+        Returns:
+            SelectionMatrix: 選択結果（getと同じ規則を全月に一括適用）
+        """
+        idx = np.asarray(idx, dtype=np.int64)
+        key = (universe, int(top_n), int(momentum_period), idx.tobytes())
+        selection = self._matrices.get(key)
+        if selection is not None:
+            self.hits += 1
+            return selection
+
+        self.misses += 1
+        ranked, n_valid = self.ranks.ranking(universe, momentum_period)
+        valid = n_valid[idx] >= top_n
+        cols = ranked[idx, :top_n].astype(np.int64)
+        weights = inverse_vol_weight_matrix(self.vol_matrix[idx[:, None], cols], self.weight_cap)
+        weights[~valid] = 0.0
+        realized_vol = portfolio_volatility_matrix(
+            self.close, cols, weights, idx, self.lookback, self.vol_floor
+        )
+        realized_vol[~valid] = np.nan
+        selection = SelectionMatrix(cols, weights, realized_vol, valid)
+        self._matrices[key] = selection
+        return selection
@@ -0,0 +1,186 @@
+"""
+月次リターン系列の統計キャッシュ
+
+概要:
+    robust.pyの各テストは同じ戦略の月次リターンから平均・標準偏差・歪度・尖度・
+    累積リターン・ドローダウンを何度も計算していた（PSRはテスト6・DSR・出力・
+    総合評価で4回、Cohen's d・Regime Change検定もそれぞれ再計算）。
+    ReturnSeriesは1戦略の系列につき1つ作り、各統計量を初回参照時に一度だけ
+    計算して保持する。PSR/DSR・部分期間（window）も引数ごとにキャッシュする。
+
+    統計量はすべて同じ中心化偏差（リターン - 平均）から求める:
+        - 分散: 偏差二乗和 / n（ddof=0）、/ (n-1)（ddof=1）
+        - 歪度: m3 / m2^1.5（scipy.stats.skew、bias=Trueと同じ）
+        - 尖度: m4 / m2² - 3（scipy.stats.kurtosis、超過尖度と同じ）
+
+使用例:
+    >>> series = ReturnSeries(full_results['D3']['returns'])
+    >>> series.mean, series.std_ddof1, series.skew, series.kurtosis
+    >>> series.metrics['sharpe']  # calc_metricsと同じ指標
+    >>> series.window(0, 60).mean  # 部分期間も初回のみ計算
+"""
+
+import numpy as np
+
+
+class ReturnSeries:
+    """
+    月次リターン系列（統計量は初回参照時に計算して保持）
+
+    Attributes:
+        values (np.ndarray): 月次リターン（読み取り専用）
+        n (int): 月数
+        hits / misses (int): キャッシュのヒット数 / 計算回数
+    """
+
+    def __init__(self, returns):
+        self.values = np.array(returns, dtype=np.float64)
+        self.values.flags.writeable = False
+        self.n = len(self.values)
+        self.hits = 0
+        self.misses = 0
+        self._cache = {}
+
+    def __len__(self):
+        return self.n
+
+    def _get(self, key, compute):
+        """キャッシュ済みの値（なければcompute()で計算して保持）"""
+        if key in self._cache:
+            self.hits += 1
+            return self._cache[key]
+        self.misses += 1
+        value = self._cache[key] = compute()
+        return value
+
+    @property
+    def mean(self):
+        """平均"""
+        return self._get('mean', lambda: np.mean(self.values))
+
+    @property
+    def deviations(self):
+        """中心化偏差（リターン - 平均）"""
+        return self._get('deviations', lambda: self.values - self.mean)
+
+    def _central_moment(self, order):
+        """order次の中心モーメント（/ n）"""
+        return self._get(('moment', order), lambda: np.mean(self.deviations ** order))
+
+    @property
+    def var(self):
+        """分散（ddof=0）"""
+        return self._central_moment(2)
+
+    @property
+    def std(self):
+        """標準偏差（ddof=0）"""
+        return self._get('std', lambda: np.sqrt(self.var))
+
+    @property
+    def var_ddof1(self):
+        """不偏分散（ddof=1）"""
+        return self._get('var_ddof1', lambda: self.var * self.n / (self.n - 1))
+
+    @property
+    def std_ddof1(self):
+        """不偏標準偏差（ddof=1）"""
+        return self._get('std_ddof1', lambda: np.sqrt(self.var_ddof1))
+
+    @property
+    def skew(self):
+        """歪度（scipy.stats.skewと同じ、標本モーメント）"""
+        return self._get('skew', lambda: self._central_moment(3) / self.var ** 1.5)
+
+    @property
+    def kurtosis(self):
+        """超過尖度（scipy.stats.kurtosisと同じ、標本モーメント）"""
+        return self._get('kurtosis', lambda: self._central_moment(4) / self.var ** 2 - 3)
+
+    @property
+    def growth(self):
+        """累積資産推移（1 + 累積リターン）"""
+        return self._get('growth', lambda: np.cumprod(1 + self.values))
+
+    @property
+    def drawdowns(self):
+        """ドローダウン推移（資産 / 過去最高値 - 1）"""
+        return self._get('drawdowns', lambda: self.growth / np.maximum.accumulate(self.growth) - 1)
+
+    @property
+    def metrics(self):
+        """
+        calc_metricsと同じ指標辞書（空の系列は空の辞書）
+
+        Returns:
+            dict: cumulative / cagr / max_dd / sharpe / sortino / calmar
+        """
+        return self._get('metrics', self._compute_metrics)
+
+    def _compute_metrics(self):
+        if self.n == 0:
+            return {}
+        cumulative = self.growth[-1] - 1
+        years = self.n / 12
+        cagr = (1 + cumulative) ** (1 / years) - 1
+        max_dd = np.min(self.drawdowns)
+
+        mean_ret = self.mean * 12
+        std_ret = self.std * np.sqrt(12)
+        sharpe = mean_ret / std_ret if std_ret > 0 else 0
+
+        neg_returns = self.values[self.values < 0]
+        downside_std = np.std(neg_returns) * np.sqrt(12) if len(neg_returns) > 0 else 0.001
+        sortino = mean_ret / downside_std if downside_std > 0 else 0
+
+        calmar = cagr / abs(max_dd) if max_dd < 0 else 0
+        return {
+            'cumulative': cumulative,
+            'cagr': cagr,
+            'max_dd': max_dd,
+            'sharpe': sharpe,
+            'sortino': sortino,
+            'calmar': calmar
+        }
+
+    def cached(self, key, compute):
+        """
+        任意の派生値をキャッシュ（PSR/DSR等、引数を含むキーで保持）
+
+        Args:
+            key (tuple): キャッシュキー（例: ('psr', benchmark_sharpe)）
+            compute (callable): 初回のみ呼ばれる計算関数
+
+        Returns:
+            compute()の戻り値
+        """
+        return self._get(key, compute)
+
+    def window(self, start, stop):
+        """
+        部分期間 [start, stop) の系列（同じ範囲は同じオブジェクトを返す）
+
+        Args:
+            start (int): 開始月
+            stop (int): 終了月（この月を含まない）
+
+        Returns:
+            ReturnSeries: 部分期間の系列（全期間の場合は自身）
+        """
+        start, stop, _ = slice(start, stop).indices(self.n)
+        if (start, stop) == (0, self.n):
+            return self
+        return self._get(('window', start, stop), lambda: ReturnSeries(self.values[start:stop]))
+
+
+def as_return_series(returns):
+    """
+    ReturnSeriesへの変換（ReturnSeriesはそのまま返す）
+
+    Args:
+        returns (ReturnSeries / array-like): 月次リターン
+
+    Returns:
+        ReturnSeries: 系列
+    """
+    return returns if isinstance(returns, ReturnSeries) else ReturnSeries(returns)
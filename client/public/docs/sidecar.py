@@ -0,0 +1,125 @@
+"""
+月次系列のバイナリサイドカー（Arrow IPC / Feather v2）
+
+概要:
+    grail.jsonはチャート用に累積リターンを小数2桁に丸めて保存するため、
+    下流で月次リターンを使うには累積値からの逆算が必要で精度も落ちる。
+    grail.pyは同じ結果を全精度のまま列指向のFeatherファイル
+    （無圧縮のArrow IPC）にも書き出し、JSONは要約・チャート用のまま残す。
+
+構成（1行 = 1評価月）:
+    - month: 評価月（'YYYY-MM'）
+    - regime: 'Bull' / 'Bear'
+    - {戦略名}/{系列名}: float64の月次系列
+      （returns / gross_returns / turnovers / scale_factors / realized_vols のうち
+      戦略の結果に含まれるもの）
+
+    スキーマのメタデータ（b'holystat'）に戦略名の順序と各戦略の系列名、
+    形式バージョンをJSONで保持する。
+
+読み込み:
+    open_sidecarは pa.memory_map でファイルを開き、JSONのパースなしに
+    Arrowのテーブルとして返す（無圧縮のため列データはゼロコピー）。
+    strategy_seriesで1戦略分をnumpy配列として取り出せる。
+
+使用例:
+    >>> write_sidecar(SIDECAR_PATH, months_list, regimes_list, results)
+    >>> table, layout = open_sidecar(SIDECAR_PATH)
+    >>> strategy_series(table, 'D3+防御型_VolScale')['returns']
+"""
+
+import json
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# サイドカー形式のバージョン（列構成の変更時にインクリメント）
+SIDECAR_FORMAT_VERSION = 1
+
+# 書き出す月次系列（戦略の結果に含まれるもののみ）
+SERIES_FIELDS = ['returns', 'gross_returns', 'turnovers', 'scale_factors', 'realized_vols']
+
+_METADATA_KEY = b'holystat'
+
+
+def write_sidecar(path, months, regimes, results):
+    """
+    全戦略の月次系列をFeather（無圧縮）で保存
+
+    Args:
+        path (str): 出力パス（.feather / .arrow）
+        months (list): 評価月（'YYYY-MM'）
+        regimes (list): 各月のレジーム（'Bull' / 'Bear'）
+        results (dict): {戦略名: {系列名: 月次リスト}}（run_backtest_matrixの結果等）
+
+    Returns:
+        dict: スキーマに保存したレイアウト（format_version / strategies / fields）
+
+    Note:
+        各系列の長さは評価月数と一致している必要がある（pyarrowが検証）
+    """
+    columns = {'month': pa.array(months, pa.string()), 'regime': pa.array(regimes, pa.string())}
+    fields = {}
+    for name, data in results.items():
+        fields[name] = [field for field in SERIES_FIELDS if field in data]
+        for field in fields[name]:
+            columns[f'{name}/{field}'] = pa.array(np.asarray(data[field], dtype=np.float64))
+
+    layout = {
+        'format_version': SIDECAR_FORMAT_VERSION,
+        'strategies': list(results),
+        'fields': fields,
+    }
+    table = pa.table(columns).replace_schema_metadata(
+        {_METADATA_KEY: json.dumps(layout, ensure_ascii=False).encode('utf-8')}
+    )
+    feather.write_feather(table, path, compression='uncompressed')
+    return layout
+
+
+def open_sidecar(path):
+    """
+    サイドカーをメモリマップで開く
+
+    Args:
+        path (str): write_sidecarの出力パス
+
+    Returns:
+        tuple: (table, layout)
+            - table: pyarrow.Table（列データはメモリマップ上）
+            - layout: write_sidecarが保存したレイアウト
+
+    Raises:
+        ValueError: 形式バージョンが異なる場合
+    """
+    source = pa.memory_map(path, 'r')
+    table = pa.ipc.open_file(source).read_all()
+    layout = json.loads(table.schema.metadata[_METADATA_KEY].decode('utf-8'))
+    if layout['format_version'] != SIDECAR_FORMAT_VERSION:
+        raise ValueError(
+            f"サイドカーの形式バージョンが異なります: {layout['format_version']} "
+            f"(期待値 {SIDECAR_FORMAT_VERSION})"
+        )
+    return table, layout
+
+
+def strategy_series(table, name):
+    """
+    1戦略分の月次系列
+
+    Args:
+        table (pyarrow.Table): open_sidecarのテーブル
+        name (str): 戦略名
+
+    Returns:
+        dict: {系列名: np.ndarray}（読み取り専用、欠損なしのためゼロコピー）
+    """
+    prefix = f'{name}/'
+    series = {}
+    for column in table.column_names:
+        if column.startswith(prefix):
+            chunks = table.column(column)
+            values = chunks.chunk(0).to_numpy() if chunks.num_chunks == 1 else chunks.to_numpy()
+            series[column[len(prefix):]] = values
+    return series
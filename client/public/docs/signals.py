@@ -0,0 +1,321 @@
+"""
+シグナル事前計算（全銘柄×全日の一括ベクトル化）
+
+概要:
+    grail.py / robust.py の選択ロジックが参照する指標を、
+    価格マトリクス（T×N）全体に対して一度だけ計算する。
+    計算後の参照は配列の添字アクセス（O(1)）のみ。
+
+提供する指標:
+    - rolling_volatility: 短期/長期Volの加重平均（NaN対応、フロア適用）
+    - MomentumCube: 複数期間モメンタム（期間×日数×銘柄数）
+    - RankCache: ユニバース×期間ごとのモメンタム降順ランキング（日付×銘柄）
+    - regime_matrix / regime_series: MA期間×閾値ごとのBull/Bear判定（全日）
+
+使用例:
+    >>> vol = rolling_volatility(prices.close)
+    >>> vol[idx, cols]  # 月初idxにおける銘柄colsの改善版Vol
+"""
+
+import numpy as np
+
+import kernels
+
+
+def daily_returns(close):
+    """
+    日次リターン行列
+
+    Args:
+        close (np.ndarray): 終値行列（T×N）
+
+    Returns:
+        np.ndarray: r[t] = close[t] / close[t-1] - 1（T×N、先頭行はNaN）
+    """
+    returns = np.full(close.shape, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns[1:] = np.diff(close, axis=0) / close[:-1]
+    return returns
+
+
+def _prefix(values):
+    """先頭に0行を付けた累積和（窓合計 = prefix[t+1] - prefix[t+1-w]）"""
+    out = np.zeros((values.shape[0] + 1,) + values.shape[1:])
+    np.cumsum(values, axis=0, out=out[1:])
+    return out
+
+
+def rolling_return_std(returns, period, min_obs):
+    """
+    NaN対応のローリング標準偏差（年率）
+
+    各日tについて、直近period本の日次リターン（t-period+1〜t）から
+    NaNを除いた標本の母標準偏差×√252を計算する。
+
+    Args:
+        returns (np.ndarray): 日次リターン行列（T×N、daily_returnsの出力）
+        period (int): 窓の長さ（日数）
+        min_obs (int): 必要な有効リターン数（未満はNaN）
+
+    Returns:
+        np.ndarray: 年率ボラティリティ（T×N、t < period または有効数不足はNaN）
+
+    Note:
+        - 累積和（Σr, Σr², 有効数）の差分で全窓を一括計算（O(T×N)）
+        - ±infを含む窓は元実装（np.std）と同様にNaN
+        - kernels.ENABLEDの場合はNumbaカーネル（窓ごとの2パス計算）
+    """
+    if kernels.ENABLED:
+        return kernels.rolling_return_std(returns, period, min_obs)
+    valid = ~np.isnan(returns)
+    finite = np.where(valid, returns, 0.0)
+    infinite = np.isinf(finite)
+    finite[infinite] = 0.0
+
+    n_days = returns.shape[0]
+    s1 = _prefix(finite)
+    s2 = _prefix(finite * finite)
+    cnt = _prefix(valid.astype(np.float64))
+    n_inf = _prefix(infinite.astype(np.float64))
+
+    vol = np.full(returns.shape, np.nan)
+    if n_days <= period:
+        return vol
+    hi = np.arange(period, n_days) + 1
+    lo = hi - period
+    n = cnt[hi] - cnt[lo]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = (s1[hi] - s1[lo]) / n
+        var = (s2[hi] - s2[lo]) / n - mean * mean
+    std = np.sqrt(np.maximum(var, 0.0)) * np.sqrt(252)
+    std[(n < min_obs) | (n_inf[hi] - n_inf[lo] > 0)] = np.nan
+    vol[period:] = std
+    return vol
+
+
+def rolling_volatility(close, short_period=21, long_period=60,
+                       short_weight=0.7, long_weight=0.3,
+                       short_min_obs=10, long_min_obs=20,
+                       floor=0.05, default=0.20):
+    """
+    改善版ボラティリティ（短期/長期加重平均）の全銘柄×全日マトリクス
+
+    Args:
+        close (np.ndarray): 終値行列（T×N）
+        short_period (int): 短期Vol期間（日数）
+        long_period (int): 長期Vol期間（日数）
+        short_weight (float): 短期Volの重み
+        long_weight (float): 長期Volの重み
+        short_min_obs (int): 短期Volに必要な有効リターン数
+        long_min_obs (int): 長期Volに必要な有効リターン数
+        floor (float): ボラティリティフロア
+        default (float): 両方とも算出できない場合の値
+
+    Returns:
+        np.ndarray: 年率ボラティリティ（T×N）
+
+    Note:
+        - 両方有効: short_weight × 短期 + long_weight × 長期
+        - 片方のみ有効: その値
+        - 両方無効: default
+        - 最後にfloorを適用
+    """
+    returns = daily_returns(close)
+    short_vol = rolling_return_std(returns, short_period, short_min_obs)
+    long_vol = rolling_return_std(returns, long_period, long_min_obs)
+
+    vol = short_weight * short_vol + long_weight * long_vol
+    vol = np.where(np.isnan(long_vol), short_vol, vol)
+    vol = np.where(np.isnan(short_vol), long_vol, vol)
+    vol = np.where(np.isnan(vol), default, vol)
+    return np.maximum(vol, floor)
+
+
+def momentum_cube(close, horizons):
+    """
+    複数期間モメンタムを一括計算
+
+    Args:
+        close (np.ndarray): 終値行列（T×N）
+        horizons (list): モメンタム期間（日数）のリスト
+
+    Returns:
+        np.ndarray: mom[h, t, j] = close[t, j] / close[t - horizons[h], j] - 1（H×T×N）
+
+    Note:
+        以下はNaN（銘柄選択でモメンタムなしとして除外される）:
+        - t < horizons[h]（データ不足）
+        - 現在価格・過去価格のいずれかがNaN
+        - 過去価格 <= 0
+        kernels.ENABLEDの場合は期間ごとにNumbaカーネルで計算
+    """
+    if kernels.ENABLED:
+        return np.stack([kernels.momentum(close, int(h)) for h in horizons])
+    horizons = np.asarray(horizons, dtype=np.int64)
+    past_idx = np.arange(close.shape[0])[None, :] - horizons[:, None]
+    past = close[np.maximum(past_idx, 0)]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mom = (close[None, :, :] / past) - 1
+    mom[~(past > 0)] = np.nan
+    mom[past_idx < 0] = np.nan
+    return mom
+
+
+class MomentumCube:
+    """
+    複数期間モメンタムのキャッシュ（期間×日数×銘柄数）
+
+    Attributes:
+        close (np.ndarray): 終値行列（T×N）
+        horizons (list): 計算済みの期間（日数）
+        cube (np.ndarray): モメンタム（H×T×N、horizonsと同順）
+    """
+
+    def __init__(self, close, horizons):
+        self.close = close
+        self.horizons = [int(h) for h in horizons]
+        self.cube = momentum_cube(close, self.horizons)
+        self._plane = {h: i for i, h in enumerate(self.horizons)}
+
+    def add(self, horizon):
+        """
+        期間を追加（計算済みなら何もしない）
+
+        Args:
+            horizon (int): モメンタム期間（日数）
+        """
+        horizon = int(horizon)
+        if horizon in self._plane:
+            return
+        self.cube = np.concatenate([self.cube, momentum_cube(self.close, [horizon])])
+        self._plane[horizon] = len(self.horizons)
+        self.horizons.append(horizon)
+
+    def get(self, horizon):
+        """
+        指定期間のモメンタム行列（未計算の期間は追加してから返す）
+
+        Args:
+            horizon (int): モメンタム期間（日数）
+
+        Returns:
+            np.ndarray: モメンタム（T×N）
+        """
+        self.add(horizon)
+        return self.cube[self._plane[int(horizon)]]
+
+
+class RankCache:
+    """
+    モメンタム順位キャッシュ
+
+    ユニバース×期間ごとに、全日付のモメンタム降順の列番号を
+    argsortで一度だけ計算する。任意のtop_nは先頭からのスライスで得られる。
+
+    Attributes:
+        momentum (MomentumCube): モメンタムキャッシュ
+        universes (dict): {ユニバース名: 列番号配列}
+    """
+
+    def __init__(self, momentum, universes):
+        self.momentum = momentum
+        self.universes = universes
+        self._rankings = {}
+
+    def ranking(self, universe, horizon):
+        """
+        全日付のランキング（初回のみ計算）
+
+        Args:
+            universe (str): ユニバース名
+            horizon (int): モメンタム期間（日数）
+
+        Returns:
+            tuple: (ranked, n_valid)
+                - ranked (np.ndarray): モメンタム降順の列番号（T×Nu、NaNは末尾）
+                - n_valid (np.ndarray): 日付ごとの有効（非NaN）銘柄数（T）
+
+        Note:
+            同値はユニバース内の順序を維持（安定ソート）
+        """
+        key = (universe, int(horizon))
+        if key not in self._rankings:
+            cols = self.universes[universe]
+            scores = self.momentum.get(horizon)[:, cols]
+            order = np.argsort(-scores, axis=1, kind='stable')
+            ranked = cols.astype(np.int32)[order]
+            n_valid = np.sum(~np.isnan(scores), axis=1)
+            self._rankings[key] = (ranked, n_valid)
+        return self._rankings[key]
+
+    def top(self, universe, horizon, idx, top_n):
+        """
+        モメンタム上位top_n銘柄の列番号
+
+        Args:
+            universe (str): ユニバース名
+            horizon (int): モメンタム期間（日数）
+            idx (int): 日付インデックス
+            top_n (int): 選択銘柄数
+
+        Returns:
+            np.ndarray: 上位銘柄の列番号（降順）、有効銘柄がtop_n未満なら空配列
+        """
+        ranked, n_valid = self.ranking(universe, horizon)
+        if n_valid[idx] < top_n:
+            return np.empty(0, dtype=np.int64)
+        return ranked[idx, :top_n].astype(np.int64)
+
+
+def regime_matrix(spy_prices, ma_periods, thresholds):
+    """
+    レジーム判定（Bull=True）をMA期間×閾値の組み合わせで一括計算
+
+    Args:
+        spy_prices (np.ndarray): SPY終値（長さT）
+        ma_periods (list): 移動平均期間（日数）のリスト（例: [100, 150, 200, 250]）
+        thresholds (list): 判定閾値のリスト（例: [0.90, 0.95, 1.00]）
+
+    Returns:
+        np.ndarray: bull[p, k, t]（P×K×T、bool）
+
+    Note:
+        is_bull_regimeと同じ規則:
+        - t < MA期間: Bull
+        - 当日価格または窓内にNaN: Bull
+        - それ以外: SPY終値 >= MA × 閾値
+        移動平均は累積和の差分で計算（1本の累積和を全MA期間で共有）
+    """
+    spy_prices = np.asarray(spy_prices, dtype=np.float64)
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    valid = ~np.isnan(spy_prices)
+    price_sum = _prefix(np.where(valid, spy_prices, 0.0))
+    nan_count = _prefix((~valid).astype(np.float64))
+
+    n_days = len(spy_prices)
+    bull = np.ones((len(ma_periods), len(thresholds), n_days), dtype=bool)
+    for i, period in enumerate(ma_periods):
+        if n_days <= period:
+            continue
+        hi = np.arange(period, n_days) + 1
+        lo = hi - period
+        ma = (price_sum[hi] - price_sum[lo]) / period
+        has_nan = nan_count[hi] - nan_count[lo] > 0
+        above = spy_prices[period:][None, :] >= ma[None, :] * thresholds[:, None]
+        bull[i, :, period:] = above | has_nan[None, :]
+    return bull
+
+
+def regime_series(spy_prices, ma_period, threshold):
+    """
+    単一ルールのレジーム判定（Bull=True）
+
+    Args:
+        spy_prices (np.ndarray): SPY終値（長さT）
+        ma_period (int): 移動平均期間（日数）
+        threshold (float): 判定閾値
+
+    Returns:
+        np.ndarray: bull[t]（長さT、bool）
+    """
+    return regime_matrix(spy_prices, [ma_period], [threshold])[0, 0]
@@ -0,0 +1,170 @@
+"""
+パラメータスイープ（ProcessPoolExecutorによる並列実行）
+
+概要:
+    任意のパラメータグリッド（パラメータ辞書のリスト）を
+    ProcessPoolExecutorのワーカーに分配してシミュレーションを実行し、
+    結果を1つの縦持ちテーブル（パラメータ列 + strategy + 指標列）にまとめる。
+    集計前の結果（map_sweep）からは戦略ごとの (パラメータ × 月数) の
+    リターン行列（returns_matrix）を取り出せる。
+
+ワーカー（fork）:
+    事前計算（setup(prices, **setup_kwargs)、例: engine.BacktestContext）は
+    親プロセスで1回だけ構築し（構築済みのcontextを渡せばそれを使う）、
+    ワーカーはforkで親のメモリをそのまま引き継ぐ（コピーオンライト）。
+    終値行列・ボラティリティ・モメンタム・順位等の配列はコピーもpickle転送も
+    されず、ワーカーごとの再構築もないため、起動コストはワーカー数によらない。
+    タスクは task(context, **params) で実行され、{戦略名: 結果} を返す
+    （taskはpickle可能なモジュールレベルの関数・メソッドである必要がある）。
+
+    forkはメインモジュールを再importしないため、robust.pyのように
+    if __name__ == '__main__' のないスクリプトからも呼び出せる
+    （spawn / forkserverではワーカーごとにスクリプト全体が再実行される）。
+    forkが使えない環境（Windows）と、forkが安全でないmacOSでは
+    プロセスを起動せずに同じプロセスで順次実行する。
+
+    ワーカー数が1の場合（1コア環境・max_workers=1・グリッドが1件）も順次実行。
+
+使用例:
+    >>> grid = parameter_grid(momentum_period=[63, 126, 252], top_n=[3, 5, 10])
+    >>> table = run_sweep(prices, BacktestContext, settings, BacktestContext.run, grid,
+    ...                   lambda data: calc_metrics(data['returns']))
+    >>> table.pivot_table(index='momentum_period', columns='top_n', values='sharpe')
+    >>> outputs = map_sweep(prices, BacktestContext, settings, BacktestContext.run, grid)
+    >>> returns_matrix(outputs, 'D3')  # パラメータ × 月数
+"""
+
+import itertools
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+# ワーカープロセスが引き継ぐ状態（map_sweepがfork直前に設定）
+_worker_state = {}
+
+
+def fork_context():
+    """
+    並列実行に使うmultiprocessingコンテキスト
+
+    Returns:
+        multiprocessing.context.BaseContext: fork方式（使えない環境はNone）
+
+    Note:
+        macOSではforkが使えてもシステムフレームワークがfork後に安全でないため None
+    """
+    if sys.platform == 'darwin' or 'fork' not in multiprocessing.get_all_start_methods():
+        return None
+    return multiprocessing.get_context('fork')
+
+
+def parameter_grid(**axes):
+    """
+    パラメータグリッド（全組み合わせ）
+
+    Args:
+        **axes: {パラメータ名: 値のリスト}
+
+    Returns:
+        list: パラメータ辞書のリスト（先に指定した軸が外側のループ）
+    """
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*axes.values())]
+
+
+def _run_task(task, params):
+    return task(_worker_state['context'], **params)
+
+
+def sweep_table(grid, outputs, summarize):
+    """
+    スイープ結果の縦持ちテーブル
+
+    Args:
+        grid (list): パラメータ辞書のリスト
+        outputs (list): 各パラメータの {戦略名: 結果}（gridと同順）
+        summarize (callable): 1戦略分の結果 → 指標辞書
+
+    Returns:
+        pd.DataFrame: 1行 = 1パラメータ × 1戦略（パラメータ列 + strategy + 指標列）
+    """
+    rows = [
+        {**params, 'strategy': strategy, **summarize(data)}
+        for params, results in zip(grid, outputs)
+        for strategy, data in results.items()
+    ]
+    return pd.DataFrame(rows)
+
+
+def map_sweep(prices, setup, setup_kwargs, task, grid, max_workers=None, context=None):
+    """
+    パラメータグリッドの各要素でtaskを実行（集計前の生の結果）
+
+    Args:
+        run_sweepと同じ（summarizeを除く）
+
+    Returns:
+        list: 各パラメータの task(context, **params) の戻り値（gridと同順）
+    """
+    if context is None:
+        context = setup(prices, **setup_kwargs)
+    n_workers = min(max_workers or os.cpu_count() or 1, len(grid))
+    mp_context = fork_context() if n_workers > 1 else None
+    if mp_context is None:
+        return [task(context, **params) for params in grid]
+
+    # fork方式のProcessPoolExecutorは最初のタスク投入時に全ワーカーを起動し、
+    # 各ワーカーはこの時点の_worker_state（構築済みのcontext）を引き継ぐ
+    _worker_state['context'] = context
+    try:
+        with ProcessPoolExecutor(n_workers, mp_context=mp_context) as pool:
+            return list(pool.map(partial(_run_task, task), grid))
+    finally:
+        _worker_state.pop('context', None)
+
+
+def returns_matrix(outputs, strategy, field='returns'):
+    """
+    スイープ結果から1戦略の (パラメータ数 × 月数) 行列を取り出す
+
+    Args:
+        outputs (list): map_sweepの戻り値
+        strategy (str): 戦略名
+        field (str): 結果のキー（'returns' / 'gross_returns' / 'turnovers' 等）
+
+    Returns:
+        np.ndarray: パラメータ × 月数（直近の共通月数にそろえる）
+
+    Note:
+        パラメータにより選択可能になる月（モメンタム期間のデータ不足等）が
+        異なるため、系列の長さがそろわない場合は末尾（直近）の共通月数で切りそろえる
+    """
+    series = [results[strategy][field] for results in outputs]
+    n_months = min(len(values) for values in series)
+    return np.array([values[len(values) - n_months:] for values in series], dtype=np.float64)
+
+
+def run_sweep(prices, setup, setup_kwargs, task, grid, summarize, max_workers=None, context=None):
+    """
+    パラメータスイープの実行
+
+    Args:
+        prices (PriceMatrix): 価格マトリクス
+        setup (callable): setup(prices, **setup_kwargs) → 事前計算（親プロセスで1回だけ構築）
+        setup_kwargs (dict): setupのキーワード引数
+        task (callable): task(context, **params) → {戦略名: 結果}
+        grid (list): パラメータ辞書のリスト（parameter_grid等）
+        summarize (callable): 1戦略分の結果 → 指標辞書（親プロセスで実行）
+        max_workers (int): ワーカー数（Noneの場合はCPUコア数）
+        context: 構築済みの事前計算（省略時はsetupで構築、並列時はワーカーが引き継ぐ）
+
+    Returns:
+        pd.DataFrame: sweep_tableの縦持ちテーブル（gridと同順）
+    """
+    outputs = map_sweep(prices, setup, setup_kwargs, task, grid, max_workers, context)
+    return sweep_table(grid, outputs, summarize)
@@ -0,0 +1,118 @@
+"""
+テールリスク分析（月次リターン系列、O(n)の一括計算）
+
+概要:
+    robust.pyのテスト3（calc_tail_metrics）のテール指標を、
+    Pythonの要素ループなしで計算する。
+
+    - ローリング複利リターン: 対数リターンの累積和 L の差分
+      L[t+w] - L[t] を expm1 で戻す（窓の長さによらずO(n)）
+    - ドローダウン滞在期間・連敗月数: bool系列のランレングス符号化
+      （区間の開始/終了位置の差分）
+
+    tail_metricsは (系列数 × 月数) の行列を受け取り、全13戦略や
+    スイープの全設定のテール指標を1回の呼び出しで計算する。
+
+使用例:
+    >>> rolling_compound_matrix(returns_matrix, 12).min(axis=1)  # 最悪12ヶ月
+    >>> run_length_stats(returns_matrix < 0)['max']  # 最長連敗月数
+    >>> tail_metrics(returns_matrix)['worst_12m']  # 系列ごと
+"""
+
+import numpy as np
+
+
+def rolling_compound_matrix(returns, window):
+    """
+    ローリング複利リターン（対数累積和による一括計算）
+
+    Args:
+        returns (np.ndarray): 月次リターン（... × 月数n）
+        window (int): 窓の長さ（月数）
+
+    Returns:
+        np.ndarray: out[..., i] = prod(1 + returns[..., i:i+window]) - 1（... × max(n-window+1, 0)）
+
+    Note:
+        -1以下のリターン（全損）を含む系列は対数が定義できないため、
+        その系列のみ窓ごとの積で計算する
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    if returns.shape[-1] < window:
+        return np.empty(returns.shape[:-1] + (0,))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_growth = np.cumsum(np.log1p(returns), axis=-1)
+        log_growth = np.concatenate([np.zeros(returns.shape[:-1] + (1,)), log_growth], axis=-1)
+        compound = np.expm1(log_growth[..., window:] - log_growth[..., :-window])
+
+    ruined = np.any(returns <= -1, axis=-1)
+    if np.any(ruined):
+        windows = np.lib.stride_tricks.sliding_window_view(returns[ruined], window, axis=-1)
+        compound[ruined] = np.prod(1 + windows, axis=-1) - 1
+    return compound
+
+
+def run_length_stats(mask):
+    """
+    各行のTrue連続区間の統計（ランレングス符号化）
+
+    Args:
+        mask (np.ndarray): bool行列（系列数 × 月数）
+
+    Returns:
+        dict: 系列ごとの配列
+            - count: 区間数
+            - mean: 区間の平均長（区間なしは0）
+            - max: 最長区間（区間なしは0）
+    """
+    mask = np.asarray(mask, dtype=bool)
+    padded = np.zeros((mask.shape[0], mask.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    edges = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    lengths = ends - starts
+
+    n_rows = mask.shape[0]
+    count = np.bincount(rows, minlength=n_rows)
+    total = np.bincount(rows, weights=lengths, minlength=n_rows)
+    longest = np.zeros(n_rows, dtype=np.int64)
+    np.maximum.at(longest, rows, lengths)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.where(count > 0, total / count, 0.0)
+    return {'count': count, 'mean': mean, 'max': longest}
+
+
+def tail_metrics(returns):
+    """
+    テールリスク指標（calc_tail_metricsの行列版）
+
+    Args:
+        returns (np.ndarray): 月次リターン（系列数 × 月数、月数 >= 12）
+
+    Returns:
+        dict: 系列ごとの配列
+            - cvar_5: 5%CVaR（5パーセンタイル以下のリターンの平均）
+            - worst_12m / worst_3m: 最悪12ヶ月 / 3ヶ月の複利リターン
+            - avg_dd_duration / max_dd_duration: ドローダウン滞在期間の平均 / 最大（月）
+            - max_losing_streak: 最大連敗月数
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+
+    var_5 = np.percentile(returns, 5, axis=1, keepdims=True)
+    tail = returns <= var_5
+    cvar_5 = np.where(tail, returns, 0.0).sum(axis=1) / tail.sum(axis=1)
+
+    growth = np.cumprod(1 + returns, axis=1)
+    in_dd = growth < np.maximum.accumulate(growth, axis=1)
+    drawdowns = run_length_stats(in_dd)
+    losing = run_length_stats(returns < 0)
+
+    return {
+        'cvar_5': cvar_5,
+        'worst_12m': rolling_compound_matrix(returns, 12).min(axis=1),
+        'worst_3m': rolling_compound_matrix(returns, 3).min(axis=1),
+        'avg_dd_duration': drawdowns['mean'],
+        'max_dd_duration': drawdowns['max'],
+        'max_losing_streak': losing['max'],
+    }
@@ -0,0 +1,231 @@
+"""
+ベクトル化実装・Numbaカーネルと元実装（要素ごとのループ）の等価性テスト
+
+概要:
+    銘柄選択・コスト・テール分析をベクトル化する前の関数
+    （calc_momentum / calc_volatility_improved / 選択時のリスク逆数ウェイト /
+    calc_turnover / calc_tail_metrics）を参照実装としてそのまま残し、
+    現在の実装と全要素で比較する。
+
+    各テストは kernels.ENABLED = False（NumPy実装）と True（カーネル）の
+    両方で実行する。Numba未インストールの場合、カーネルはPythonのまま実行される。
+
+許容誤差:
+    - 値: np.testing.assert_allclose(rtol=RTOL)
+    - NaNの位置: np.testing.assert_array_equal（完全一致）
+
+実行:
+    $ python -m pytest test_kernels.py
+"""
+
+import numpy as np
+import pytest
+
+import engine
+import kernels
+import selection
+import signals
+import tail
+
+# 値の相対許容誤差（累積和の差分・加算順序の違いによる丸め誤差のみを許容）
+RTOL = 1e-12
+
+# 改善版Volのパラメータ（grail.py / robust.pyと同じ値）
+VOL_SHORT_PERIOD = 21
+VOL_LONG_PERIOD = 60
+VOL_SHORT_WEIGHT = 0.7
+VOL_LONG_WEIGHT = 0.3
+VOL_FLOOR = 0.05
+WEIGHT_CAP = 0.40
+
+
+@pytest.fixture(params=[False, True], ids=['numpy', 'kernels'])
+def kernels_enabled(request, monkeypatch):
+    """kernels.ENABLEDを切り替えて実行"""
+    monkeypatch.setattr(kernels, 'ENABLED', request.param)
+    return request.param
+
+
+@pytest.fixture(scope='module')
+def close():
+    """
+    合成終値（欠損・0以下の価格・上場前の空白期間を含む）
+
+    Returns:
+        np.ndarray: 終値行列（240日 × 8銘柄）
+    """
+    rng = np.random.default_rng(0)
+    close = 100 * np.cumprod(1 + rng.normal(0.0005, 0.02, (240, 8)), axis=0)
+    close[rng.random(close.shape) < 0.03] = np.nan
+    close[:40, 0] = np.nan
+    close[100:110, 1] = 0.0
+    close[150:155, 2] = close[150, 2]
+    return close
+
+
+def assert_equivalent(actual, expected):
+    """NaNの位置が完全一致し、残りがRTOL以内で一致すること"""
+    actual = np.asarray(actual, dtype=np.float64)
+    expected = np.asarray(expected, dtype=np.float64)
+    assert actual.shape == expected.shape
+    np.testing.assert_array_equal(np.isnan(actual), np.isnan(expected))
+    valid = ~np.isnan(expected)
+    np.testing.assert_allclose(actual[valid], expected[valid], rtol=RTOL, atol=0)
+
+
+# =============================================================================
+# 参照実装（ベクトル化前の元実装、1銘柄・1日ずつ）
+# =============================================================================
+
+def reference_momentum(prices, idx, period):
+    """元のcalc_momentum（1銘柄の終値系列）"""
+    if idx < period:
+        return np.nan
+    current = prices[idx]
+    past = prices[idx - period]
+    if np.isnan(current) or np.isnan(past) or past <= 0:
+        return np.nan
+    return (current / past) - 1
+
+
+def reference_volatility(prices, idx):
+    """元のcalc_volatility_improved（1銘柄の終値系列）"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if idx >= VOL_SHORT_PERIOD:
+            short_prices = prices[idx - VOL_SHORT_PERIOD:idx + 1]
+            short_returns = np.diff(short_prices) / short_prices[:-1]
+            short_returns = short_returns[~np.isnan(short_returns)]
+            short_vol = np.std(short_returns) * np.sqrt(252) if len(short_returns) >= 10 else np.nan
+        else:
+            short_vol = np.nan
+
+        if idx >= VOL_LONG_PERIOD:
+            long_prices = prices[idx - VOL_LONG_PERIOD:idx + 1]
+            long_returns = np.diff(long_prices) / long_prices[:-1]
+            long_returns = long_returns[~np.isnan(long_returns)]
+            long_vol = np.std(long_returns) * np.sqrt(252) if len(long_returns) >= 20 else np.nan
+        else:
+            long_vol = np.nan
+
+    if not np.isnan(short_vol) and not np.isnan(long_vol):
+        vol = VOL_SHORT_WEIGHT * short_vol + VOL_LONG_WEIGHT * long_vol
+    elif not np.isnan(short_vol):
+        vol = short_vol
+    elif not np.isnan(long_vol):
+        vol = long_vol
+    else:
+        vol = 0.20
+    return max(vol, VOL_FLOOR)
+
+
+def reference_inverse_vol_weights(vols):
+    """元の選択関数のリスク逆数ウェイト（上限適用後に再正規化）"""
+    inv_vols = [1 / vol for vol in vols]
+    total_inv = sum(inv_vols)
+    weights = [min(iv / total_inv, WEIGHT_CAP) for iv in inv_vols]
+    total_weight = sum(weights)
+    return [w / total_weight for w in weights]
+
+
+def reference_tail_metrics(returns):
+    """元のcalc_tail_metrics（1系列）"""
+    returns = np.array(returns)
+    sorted_returns = np.sort(returns)
+    var_5 = np.percentile(returns, 5)
+    cvar_5 = np.mean(sorted_returns[sorted_returns <= var_5])
+
+    worst_12m = min(np.prod(1 + returns[i:i + 12]) - 1 for i in range(len(returns) - 11))
+    worst_3m = min(np.prod(1 + returns[i:i + 3]) - 1 for i in range(len(returns) - 2))
+
+    cum_returns = np.cumprod(1 + returns)
+    in_dd = cum_returns < np.maximum.accumulate(cum_returns)
+    dd_durations = []
+    current_duration = 0
+    for is_in_dd in in_dd:
+        if is_in_dd:
+            current_duration += 1
+        else:
+            if current_duration > 0:
+                dd_durations.append(current_duration)
+            current_duration = 0
+    if current_duration > 0:
+        dd_durations.append(current_duration)
+
+    max_losing_streak = 0
+    current_streak = 0
+    for r in returns:
+        if r < 0:
+            current_streak += 1
+            max_losing_streak = max(max_losing_streak, current_streak)
+        else:
+            current_streak = 0
+
+    return {
+        'cvar_5': cvar_5,
+        'worst_12m': worst_12m,
+        'worst_3m': worst_3m,
+        'avg_dd_duration': np.mean(dd_durations) if dd_durations else 0,
+        'max_dd_duration': max(dd_durations) if dd_durations else 0,
+        'max_losing_streak': max_losing_streak,
+    }
+
+
+# =============================================================================
+# テスト
+# =============================================================================
+
+@pytest.mark.parametrize('period', [21, 126])
+def test_momentum(close, kernels_enabled, period):
+    expected = np.array([
+        [reference_momentum(close[:, j], idx, period) for j in range(close.shape[1])]
+        for idx in range(close.shape[0])
+    ])
+    assert_equivalent(signals.momentum_cube(close, [period])[0], expected)
+    assert_equivalent(signals.MomentumCube(close, [period]).get(period), expected)
+
+
+def test_rolling_volatility(close, kernels_enabled):
+    expected = np.array([
+        [reference_volatility(close[:, j], idx) for j in range(close.shape[1])]
+        for idx in range(close.shape[0])
+    ])
+    actual = signals.rolling_volatility(
+        close, VOL_SHORT_PERIOD, VOL_LONG_PERIOD, VOL_SHORT_WEIGHT, VOL_LONG_WEIGHT, floor=VOL_FLOOR
+    )
+    assert_equivalent(actual, expected)
+
+
+def test_inverse_vol_weight_matrix(kernels_enabled):
+    rng = np.random.default_rng(1)
+    vols = np.maximum(rng.lognormal(-1.6, 0.8, (60, 5)), VOL_FLOOR)
+    vols[:10, 0] = VOL_FLOOR  # 上限（WEIGHT_CAP）にかかる行
+    expected = np.array([reference_inverse_vol_weights(row) for row in vols])
+    assert_equivalent(selection.inverse_vol_weight_matrix(vols, WEIGHT_CAP), expected)
+
+
+def test_turnover_matrix(kernels_enabled):
+    rng = np.random.default_rng(2)
+    weights = rng.random((60, 10)) * (rng.random((60, 10)) < 0.4)
+    weights[20] = weights[19]  # 入れ替えなしの月
+    symbols = [f'S{j}' for j in range(weights.shape[1])]
+
+    def as_dict(row):
+        return {symbol: w for symbol, w in zip(symbols, row) if w > 0}
+
+    expected = [engine.calc_turnover({}, as_dict(weights[0]))] + [
+        engine.calc_turnover(as_dict(weights[m - 1]), as_dict(weights[m])) for m in range(1, len(weights))
+    ]
+    assert_equivalent(engine.turnover_matrix(weights), expected)
+
+
+def test_tail_metrics():
+    rng = np.random.default_rng(3)
+    returns = rng.normal(0.008, 0.05, (4, 120))
+    returns[1, 60:66] = -0.02   # 6ヶ月連敗
+    returns[2, 30] = -1.0       # 全損月（対数累積和が使えない系列）
+    returns[3, :] = np.abs(returns[3, :])  # ドローダウン・負け月なし
+
+    actual = tail.tail_metrics(returns)
+    for i, row in enumerate(returns):
+        for key, value in reference_tail_metrics(row).items():
+            assert_equivalent(actual[key][i], value)
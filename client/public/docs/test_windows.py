@@ -0,0 +1,108 @@
+"""
+窓統計（windows.py / pbo.py）と元実装（窓ごとの np.mean / np.std）の等価性テスト
+
+許容誤差:
+    - Sharpe: np.testing.assert_allclose(rtol=RTOL)
+    - 一定リターンの窓: Sharpe = 0（元実装の np.std(...) > 0 と同じ）
+
+実行:
+    $ python -m pytest test_windows.py
+"""
+
+import numpy as np
+import pytest
+
+from pbo import block_statistics, cscv_split_matrix, split_sharpes
+from windows import PrefixMoments, walk_forward_optimize
+
+# 値の相対許容誤差（累積和の差分による丸め誤差のみを許容）
+RTOL = 1e-9
+
+
+def reference_sharpe(returns):
+    """元実装の窓Sharpe（年率、不偏標準偏差、標準偏差0は0）"""
+    std = np.std(returns, ddof=1)
+    return np.mean(returns) * 12 / (std * np.sqrt(12)) if np.std(returns) > 0 else 0.0
+
+
+@pytest.mark.parametrize('level', [-0.05, -0.01, 0.0, 0.003, 0.02, 0.1])
+def test_constant_window_sharpe_is_zero(level):
+    for seed in range(50):
+        rng = np.random.default_rng(seed)
+        returns = rng.normal(0.01, 0.04, 240)
+        start = int(rng.integers(0, 228))
+        returns[start:start + 12] = level
+        moments = PrefixMoments(returns)
+        assert moments.sharpe(np.array([start]), np.array([start + 12]))[0, 0] == 0.0
+
+
+@pytest.mark.parametrize('level', [-0.03, 0.0, 0.007, 0.05])
+def test_constant_split_sharpe_is_zero(level):
+    for seed in range(50):
+        rng = np.random.default_rng(seed)
+        returns = rng.normal(0.01, 0.04, 160)
+        returns[:80] = level
+        split = np.zeros((1, 16))
+        split[0, :8] = 1.0
+        assert split_sharpes(split, *block_statistics(returns, 16))[0] == 0.0
+
+
+def test_window_sharpe_matches_reference():
+    rng = np.random.default_rng(0)
+    returns = rng.normal(0.01, 0.04, (3, 240))
+    starts = np.arange(0, 228, 6)
+    actual = PrefixMoments(returns).sharpe(starts, starts + 12)
+    expected = [[reference_sharpe(row[start:start + 12]) for start in starts] for row in returns]
+    np.testing.assert_allclose(actual, expected, rtol=RTOL)
+
+
+def test_split_sharpe_matches_window_sharpe():
+    """CSCVの分割と同じ月の窓でSharpeが一致（早い窓・遅い窓とも同じ規則）"""
+    rng = np.random.default_rng(1)
+    returns = rng.normal(0.01, 0.04, 160)
+    split = cscv_split_matrix(4)
+    actual = split_sharpes(split, *block_statistics(returns, 4))
+    blocks = np.split(returns, 4)
+    expected = [reference_sharpe(np.concatenate([b for b, used in zip(blocks, row) if used])) for row in split]
+    np.testing.assert_allclose(actual, expected, rtol=RTOL)
+
+
+def test_window_sharpe_independent_of_history():
+    """同じ窓は系列の先頭・長い履歴の後のどちらに置いても同じSharpe（ゼロ判定も窓自身で決まる）"""
+    rng = np.random.default_rng(2)
+    window = 0.05 + rng.normal(0, 5e-4, 12)          # ほぼ一定だが標準偏差 > 0
+    history = rng.normal(0, 0.3, 1000)
+    early = PrefixMoments(np.concatenate([window, history])).sharpe(np.array([0]), np.array([12]))
+    late = PrefixMoments(np.concatenate([history, window])).sharpe(np.array([1000]), np.array([1012]))
+    assert early[0, 0] != 0.0
+    np.testing.assert_allclose(late, early, rtol=1e-6)
+
+
+@pytest.mark.parametrize('anchored', [True, False])
+def test_walk_forward_optimize_with_leftover_months(anchored):
+    """末尾にテスト期間に満たない余りの月がある場合、OOS系列はテスト窓の月のみ"""
+    rng = np.random.default_rng(3)
+    train_months, test_months = 36, 6
+    returns = rng.normal(0.01, 0.04, (5, train_months + 3 * test_months + 4))  # 余り4ヶ月
+    wfo = walk_forward_optimize(returns, train_months, test_months, anchored=anchored)
+
+    test_starts = wfo['test_starts']
+    np.testing.assert_array_equal(test_starts, [36, 42, 48])
+    oos_end = test_starts[-1] + test_months
+    assert oos_end == returns.shape[1] - 4
+    assert len(wfo['oos_returns']) == oos_end - test_starts[0]
+
+    expected_returns = []
+    for k, start in enumerate(test_starts):
+        train_start = 0 if anchored else start - train_months
+        best = int(np.argmax([reference_sharpe(row[train_start:start]) for row in returns]))
+        assert wfo['selected'][k] == best
+        expected_returns.extend(returns[best, start:start + test_months])
+    np.testing.assert_array_equal(wfo['oos_returns'], expected_returns)
+
+    # 固定設定で比較する場合も同じ月（returns[:, test_starts[0]:oos_end]）
+    fixed = np.tile(returns[:1], (2, 1))
+    np.testing.assert_array_equal(
+        walk_forward_optimize(fixed, train_months, test_months, anchored=anchored)['oos_returns'],
+        returns[0, test_starts[0]:oos_end],
+    )
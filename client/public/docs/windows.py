@@ -0,0 +1,277 @@
+"""
+ローリング窓統計（Walk-Forward・ホールドアウトの一括計算）
+
+概要:
+    月次リターンとその二乗の累積和（prefix sum）を1回だけ計算し、
+    任意の窓 [start, stop) の件数・平均・分散を O(1) の差分で求める。
+    Walk-Forward分析の訓練/テスト窓は (系列数 × 窓数) の配列として
+    全戦略・全期間を一度に評価し、訓練期間（3/5/7年）× テスト期間
+    （6/12/24ヶ月）のような複数の組み合わせもまとめて計算できる。
+
+    walk_forward_optimizeは (設定数 × 月数) のリターン行列に対し、
+    各訓練窓（拡大窓 / ローリング窓）で訓練Sharpe最大の設定を選び直し、
+    テスト期間をつないだアウトオブサンプル系列を作る。全窓 × 全設定の
+    訓練Sharpeは同じ累積和の差分で求めるため、再最適化はargmaxのみ。
+
+精度:
+    二乗和の桁落ちを避けるため、累積和は系列ごとの全期間平均を
+    引いた値で計算する（分散は平行移動に不変）。
+    差分で求めた分散には丸め誤差が残るため、窓自身の二乗平均
+    （窓の二乗和 / 月数）に対して VARIANCE_RTOL 以下の分散は0とみなす
+    （一定リターンの窓で np.std(...) > 0 と同じくSharpe = 0 にするため）。
+    pbo.split_sharpesも同じ規則（sharpe_from_sums）を使う。
+
+使用例:
+    >>> wfa = walk_forward_matrix(returns_matrix, train_months=60, test_months=12)
+    >>> wfa['consistency']  # 系列ごと
+    >>> walk_forward_grid(returns_matrix, [36, 60, 84], [6, 12, 24])
+    >>> walk_forward_optimize(config_matrix, 36, 6, anchored=True)['oos_returns']
+"""
+
+import numpy as np
+from scipy import stats
+
+from resampling import metrics_matrix
+
+# 差分で求めた分散を0とみなす相対許容誤差（窓自身の二乗平均に対する比）
+# 一定リターンの窓に残る丸め誤差は1e-8程度、実際の月次リターンの窓は0.1以上
+VARIANCE_RTOL = 1e-6
+
+
+def sharpe_from_sums(total, squares, n, shift):
+    """
+    窓の合計・二乗和からSharpe比（年率、不偏標準偏差）
+
+    Args:
+        total (np.ndarray): 窓内の (リターン - shift) の合計
+        squares (np.ndarray): 窓内の (リターン - shift)² の合計
+        n (np.ndarray): 窓の月数（totalにブロードキャスト可能）
+        shift (np.ndarray): 平行移動量（totalにブロードキャスト可能）
+
+    Returns:
+        np.ndarray: Sharpe（totalと同じ形状、標準偏差0の窓は0）
+
+    Note:
+        分散が丸め誤差の範囲（VARIANCE_RTOL × squares / n 以下）の窓も標準偏差0として扱う
+    """
+    mean = total / n
+    second_moment = squares / n
+    var = second_moment - mean * mean
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = ((mean + shift) * 12) / (np.sqrt(var * n / (n - 1)) * np.sqrt(12))
+    return np.where(var > VARIANCE_RTOL * second_moment, sharpe, 0.0)
+
+
+class PrefixMoments:
+    """
+    月次リターンの累積和（窓統計用）
+
+    Attributes:
+        shift (np.ndarray): 系列ごとの全期間平均（系列数）
+        sums (np.ndarray): (リターン - shift) の累積和（系列数 × (n+1)、先頭列は0）
+        squares (np.ndarray): (リターン - shift)² の累積和（系列数 × (n+1)）
+        n_months (int): 月数n
+    """
+
+    def __init__(self, returns):
+        returns = np.atleast_2d(np.asarray(returns, dtype=np.float64))
+        self.n_months = returns.shape[1]
+        self.shift = np.mean(returns, axis=1)
+        centered = returns - self.shift[:, None]
+        self.sums = np.zeros((len(returns), self.n_months + 1))
+        self.squares = np.zeros((len(returns), self.n_months + 1))
+        np.cumsum(centered, axis=1, out=self.sums[:, 1:])
+        np.cumsum(centered * centered, axis=1, out=self.squares[:, 1:])
+
+    def sharpe(self, start, stop):
+        """
+        窓ごとのSharpe比（年率、不偏標準偏差）
+
+        Args:
+            start (np.ndarray): 窓の開始月（窓数）
+            stop (np.ndarray): 窓の終了月（窓数、この月を含まない）
+
+        Returns:
+            np.ndarray: Sharpe（系列数 × 窓数、標準偏差0の窓は0、sharpe_from_sums）
+        """
+        start = np.asarray(start)
+        stop = np.asarray(stop)
+        return sharpe_from_sums(
+            self.sums[:, stop] - self.sums[:, start],
+            self.squares[:, stop] - self.squares[:, start],
+            (stop - start).astype(np.float64),
+            self.shift[:, None],
+        )
+
+
+def walk_forward_starts(n_months, train_months, test_months, step_months):
+    """
+    Walk-Forwardの各期間の開始月
+
+    Args:
+        n_months (int): 月数
+        train_months (int): 訓練期間（月数）
+        test_months (int): テスト期間（月数）
+        step_months (int): ステップ（月数）
+
+    Returns:
+        np.ndarray: 開始月（start + train + test <= n_months を満たすもの）
+    """
+    return np.arange(0, max(n_months - train_months - test_months, -1) + 1, step_months)
+
+
+def walk_forward_matrix(returns, train_months=60, test_months=12, step_months=None, moments=None):
+    """
+    Walk-Forward分析（全系列・全期間の一括計算）
+
+    Args:
+        returns (np.ndarray): 月次リターン（系列数 × 月数）
+        train_months (int): 訓練期間（月数）
+        test_months (int): テスト期間（月数）
+        step_months (int): ステップ（月数、Noneの場合はtest_months）
+        moments (PrefixMoments): 計算済みの累積和（同じ系列で複数の窓を評価する場合）
+
+    Returns:
+        dict: 期間がない場合はNone
+            - starts: 各期間の開始月（期間数）
+            - train_sharpe / test_sharpe / degradation: 系列数 × 期間数
+            - n_periods: 期間数
+            - avg_degradation / consistency: 系列ごと（劣化率の平均 / テストSharpe > 0 の割合）
+
+    Note:
+        劣化率 = (テストSharpe - 訓練Sharpe) / |訓練Sharpe|（訓練Sharpe = 0 の場合は0）
+    """
+    moments = moments if moments is not None else PrefixMoments(returns)
+    step_months = step_months or test_months
+    starts = walk_forward_starts(moments.n_months, train_months, test_months, step_months)
+    if len(starts) == 0:
+        return None
+
+    train_sharpe = moments.sharpe(starts, starts + train_months)
+    test_sharpe = moments.sharpe(starts + train_months, starts + train_months + test_months)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        degradation = np.where(
+            train_sharpe != 0, (test_sharpe - train_sharpe) / np.abs(train_sharpe), 0.0
+        )
+    return {
+        'starts': starts,
+        'train_sharpe': train_sharpe,
+        'test_sharpe': test_sharpe,
+        'degradation': degradation,
+        'n_periods': len(starts),
+        'avg_degradation': np.mean(degradation, axis=1),
+        'consistency': np.mean(test_sharpe > 0, axis=1),
+    }
+
+
+def walk_forward_grid(returns, train_months_list, test_months_list):
+    """
+    複数の訓練期間 × テスト期間の組み合わせでWalk-Forward分析
+
+    Args:
+        returns (np.ndarray): 月次リターン（系列数 × 月数）
+        train_months_list (list): 訓練期間（月数）のリスト
+        test_months_list (list): テスト期間（月数）のリスト（ステップ = テスト期間）
+
+    Returns:
+        dict: {(訓練月数, テスト月数): walk_forward_matrixの結果}（期間がない組み合わせは除外）
+    """
+    moments = PrefixMoments(returns)
+    grid = {}
+    for train_months in train_months_list:
+        for test_months in test_months_list:
+            result = walk_forward_matrix(returns, train_months, test_months, moments=moments)
+            if result is not None:
+                grid[(train_months, test_months)] = result
+    return grid
+
+
+def holdout_matrix(returns, train_ratio=0.8):
+    """
+    ホールドアウト検証（全系列の一括計算）
+
+    Args:
+        returns (np.ndarray): 月次リターン（系列数 × 月数）
+        train_ratio (float): 訓練データの割合（先頭から）
+
+    Returns:
+        dict: 系列ごとの配列（train_monthsとtest_monthsはint）
+            - train_months / test_months
+            - train_sharpe / test_sharpe / sharpe_degradation
+            - train_cagr / test_cagr / cagr_degradation
+            - test_p_value: テスト期間の平均 = 0 のt検定p値
+
+    Note:
+        Sharpe・CAGRはcalc_metricsと同じ定義（resampling.metrics_matrix）
+    """
+    returns = np.atleast_2d(np.asarray(returns, dtype=np.float64))
+    split = int(returns.shape[1] * train_ratio)
+    train = metrics_matrix(returns[:, :split])
+    test = metrics_matrix(returns[:, split:])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe_degradation = np.where(
+            train['sharpe'] != 0, (test['sharpe'] - train['sharpe']) / np.abs(train['sharpe']), 0.0
+        )
+        cagr_degradation = np.where(
+            train['cagr'] != 0, (test['cagr'] - train['cagr']) / np.abs(train['cagr']), 0.0
+        )
+    _, p_value = stats.ttest_1samp(returns[:, split:], 0, axis=1)
+    return {
+        'train_months': split,
+        'test_months': returns.shape[1] - split,
+        'train_sharpe': train['sharpe'],
+        'test_sharpe': test['sharpe'],
+        'sharpe_degradation': sharpe_degradation,
+        'train_cagr': train['cagr'],
+        'test_cagr': test['cagr'],
+        'cagr_degradation': cagr_degradation,
+        'test_p_value': p_value,
+    }
+
+
+def walk_forward_optimize(returns, train_months=36, test_months=6, anchored=False):
+    """
+    Walk-Forward最適化（訓練窓ごとに最良の設定を選び直す）
+
+    Args:
+        returns (np.ndarray): 月次リターン（設定数 × 月数、同じ月に揃えたもの）
+        train_months (int): 訓練期間（月数、anchoredの場合は最初の訓練期間）
+        test_months (int): テスト期間（月数、ステップも同じ）
+        anchored (bool): Trueの場合は訓練期間の開始を先頭に固定（拡大窓）、
+            Falseの場合は訓練期間を固定長でずらす（ローリング窓）
+
+    Returns:
+        dict: 窓がない場合はNone
+            - test_starts: 各窓のテスト開始月（窓数）
+            - selected: 各窓で訓練Sharpe最大の設定（窓数）
+            - train_sharpe / test_sharpe: 選ばれた設定の訓練 / テストSharpe（窓数）
+            - oos_returns: 各窓のテスト期間を選ばれた設定でつないだ月次リターン
+              （月数 = 窓数 × test_months、returns[:, test_starts[0]:test_starts[-1] + test_months]
+              と同じ月。末尾のtest_months未満の余りの月は含まない）
+            - selection_frequency: 各設定が選ばれた割合（設定の順）
+
+    Note:
+        累積和を1回だけ計算し、全窓 × 全設定の訓練Sharpeを差分で求めるため、
+        窓ごとの再最適化は設定方向のargmaxのみ（訓練Sharpeの同値は先頭の設定を選ぶ）
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    moments = PrefixMoments(returns)
+    test_starts = np.arange(train_months, moments.n_months - test_months + 1, test_months)
+    if len(test_starts) == 0:
+        return None
+
+    train_starts = np.zeros_like(test_starts) if anchored else test_starts - train_months
+    train_sharpe = moments.sharpe(train_starts, test_starts)              # 設定 × 窓
+    test_sharpe = moments.sharpe(test_starts, test_starts + test_months)
+    selected = np.argmax(train_sharpe, axis=0)
+    windows = np.arange(len(test_starts))
+
+    months = test_starts[:, None] + np.arange(test_months)
+    return {
+        'test_starts': test_starts,
+        'selected': selected,
+        'train_sharpe': train_sharpe[selected, windows],
+        'test_sharpe': test_sharpe[selected, windows],
+        'oos_returns': returns[selected[:, None], months].ravel(),
+        'selection_frequency': np.bincount(selected, minlength=len(returns)) / len(test_starts),
+    }